@@ -1 +1,6 @@
 from gym_xiangqi.agents.random_agent import RandomAgent  # NOQA
+from gym_xiangqi.agents.alphabeta_agent import AlphaBetaAgent  # NOQA
+from gym_xiangqi.agents.mcts_agent import MCTSAgent  # NOQA
+from gym_xiangqi.agents.parallel import (  # NOQA
+    ParallelAlphaBetaAgent, ParallelMCTSAgent, PoolEvaluator,
+)
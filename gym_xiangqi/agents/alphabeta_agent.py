@@ -0,0 +1,379 @@
+import time
+
+from gym_xiangqi.agents.transposition import (
+    TranspositionTable, DEFAULT_TT_SIZE,
+    EXACT, LOWER, UPPER,
+)
+from gym_xiangqi.evaluation import PIECE_SQUARE_VALUES
+from gym_xiangqi.rules import (
+    ACTIONS_PER_PIECE, ZOBRIST, ZOBRIST_SIDE,
+    generate_actions, generate_captures, position_key, static_exchange,
+    to_cells,
+)
+from gym_xiangqi.constants import (
+    TOTAL_POS, PIECE_CNT, PIECE_POINTS,
+    EMPTY, GENERAL,
+)
+
+DEFAULT_MAX_DEPTH = 64
+DEFAULT_TIME_LIMIT_MS = 1000
+
+# Scores are in hundredths of PIECE_POINTS
+WIN_SCORE = 1000000
+MATE_BOUND = WIN_SCORE - 1000
+INFINITY = WIN_SCORE + 1
+
+MAX_PLY = 128
+TIME_CHECK_MASK = 1023      # check the clock every 1024 nodes
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+# Material and piece-square values of gym_xiangqi.evaluation in integers,
+# indexed by [piece_id + PIECE_CNT][square]
+PIECE_VALUES = [[int(round(value * 100)) for value in row]
+                for row in PIECE_SQUARE_VALUES.tolist()]
+
+# Piece values used for MVV-LVA ordering, indexed by absolute piece ID
+ORDER_VALUES = [int(points) for points in PIECE_POINTS]
+
+
+def _score_to_tt(score, ply):
+    """
+    Store win scores relative to the stored position instead of the root.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class AlphaBetaAgent:
+    """
+    This agent searches the game tree with alpha-beta pruning to choose
+    its move. It can be used as a strong and fast CPU baseline to evaluate
+    other agents against.
+
+    - Iterative deepening until the maximum depth or the time budget per
+      move is reached
+    - Transposition table keyed by Zobrist position keys
+    - Move ordering: transposition table move, captures by MVV-LVA
+      (most valuable victim, least valuable attacker), killer moves and
+      the history heuristic
+    - Quiescence search of captures at the leaves, skipping captures that
+      lose material by static exchange evaluation
+    - Material and piece-square evaluation of gym_xiangqi.evaluation
+
+    The search plays by the environment's rules (see gym_xiangqi.rules):
+    capturing the general wins and a side without legal moves loses.
+    Perpetual check is not taken into account.
+
+    A transposition table can be given with `tt`, e.g. a
+    SharedTranspositionTable shared with other workers; otherwise a private
+    TranspositionTable of `tt_size` slots is created.
+
+    Attributes:
+        stats (dict): statistics of the last search with the reached
+            depth, score, searched nodes, time in ms, nodes per second,
+            the (depth, move, score) result of every completed iteration
+            and whether the time budget ran out
+    """
+
+    def __init__(self, max_depth=DEFAULT_MAX_DEPTH,
+                 time_limit_ms=DEFAULT_TIME_LIMIT_MS,
+                 tt_size=DEFAULT_TT_SIZE, tt=None):
+        self.max_depth = max_depth
+        self.time_limit_ms = time_limit_ms
+        self.tt = TranspositionTable(tt_size) if tt is None else tt
+        self.stats = {}
+        self.nodes = 0
+
+        self._cells = None
+        self._side = None
+        self._key = None
+        self._eval = 0
+        self._deadline = None
+        self._root_best = None
+        self._root_score = None
+        self._root_moves = None
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = [0] * (PIECE_CNT * ACTIONS_PER_PIECE)
+
+    def move(self, env):
+        """
+        Search the best move for the player whose turn it is.
+        """
+        return self.search(env.state, env.turn)
+
+    def search(self, board, side, root_moves=None, new_search=True):
+        """
+        Search the best move of a position.
+
+        Parameters:
+            board (np.array): 10 x 9 board of signed piece IDs
+            side (int): side to move, ALLY (1) or ENEMY (-1)
+            root_moves (list): only consider these root moves if given,
+                used to split the root between parallel workers
+            new_search (bool): start a new generation of the transposition
+                table; workers sharing a table leave this to their parent
+        Return:
+            int: best action ID, or None if there is no legal move
+        """
+        self._setup(board, side, new_search)
+        self._root_moves = None if root_moves is None else set(root_moves)
+        start = time.perf_counter()
+        if self.time_limit_ms is not None:
+            self._deadline = start + self.time_limit_ms / 1000
+        else:
+            self._deadline = None
+
+        # Played if the time runs out before any root move is searched
+        fallback = self._ordered_root_moves()[:1]
+        best_move = None
+        best_score = 0
+        iterations = []
+        timeout = False
+        depth = 0
+        for depth in range(1, self.max_depth + 1):
+            self._root_best = None
+            try:
+                score = self._search(depth, -INFINITY, INFINITY, 0)
+            except _SearchTimeout:
+                # Moves of an unfinished iteration are only kept when they
+                # beat the previous best move, which is searched first
+                if self._root_best is not None:
+                    best_move = self._root_best
+                    best_score = self._root_score
+                elif best_move is None and fallback:
+                    best_move = fallback[0]
+                depth -= 1
+                timeout = True
+                break
+            best_move = self._root_best
+            best_score = score
+            iterations.append((depth, best_move, best_score))
+            # No need to search deeper once the game outcome is known
+            if best_move is None or abs(score) >= MATE_BOUND:
+                break
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "depth": depth,
+            "score": best_score,
+            "nodes": self.nodes,
+            "time_ms": elapsed * 1000,
+            "nps": self.nodes / elapsed if elapsed > 0 else 0.0,
+            "iterations": iterations,
+            "timeout": timeout,
+        }
+        return best_move
+
+    def _setup(self, board, side, new_search=True):
+        """
+        Prepare the search state for a new root position.
+        """
+        self._cells = to_cells(board)
+        self._side = side
+        self._key = position_key(self._cells, side)
+        self._eval = sum(PIECE_VALUES[piece_id + PIECE_CNT][sq]
+                         for sq, piece_id in enumerate(self._cells))
+        self.nodes = 0
+        if new_search:
+            self.tt.new_search()
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        # Age history scores so recent cutoffs weigh more
+        self._history = [score >> 1 for score in self._history]
+
+    def _ordered_root_moves(self):
+        """
+        Legal root moves in the search order of the first iteration.
+        """
+        moves = generate_actions(self._cells, self._side)
+        if self._root_moves is not None:
+            moves = [action for action in moves if action in self._root_moves]
+        entry = self.tt.probe(self._key)
+        return self._order(moves, None if entry is None else entry[3], 0)
+
+    def _make(self, action):
+        """
+        Make a move on the search board, updating key and evaluation.
+        """
+        start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+        cells = self._cells
+        piece_id = cells[start]
+        captured = cells[end]
+        cells[end] = piece_id
+        cells[start] = EMPTY
+
+        undo = (self._key, self._eval)
+        values = PIECE_VALUES[piece_id + PIECE_CNT]
+        zobrist = ZOBRIST[piece_id + PIECE_CNT]
+        self._eval += (values[end] - values[start]
+                       - PIECE_VALUES[captured + PIECE_CNT][end])
+        self._key ^= (zobrist[start] ^ zobrist[end] ^ ZOBRIST_SIDE
+                      ^ ZOBRIST[captured + PIECE_CNT][end])
+        self._side = -self._side
+        return captured, undo
+
+    def _unmake(self, action, captured, undo):
+        start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+        cells = self._cells
+        cells[start] = cells[end]
+        cells[end] = captured
+        self._key, self._eval = undo
+        self._side = -self._side
+
+    def _check_time(self):
+        if (self._deadline is not None
+                and time.perf_counter() >= self._deadline):
+            raise _SearchTimeout()
+
+    def _order(self, moves, tt_move, ply):
+        """
+        Sort moves in place from most to least promising.
+        """
+        cells = self._cells
+        killers = self._killers[ply] if ply < MAX_PLY else (None, None)
+        history = self._history
+
+        def priority(action):
+            if action == tt_move:
+                return 1 << 40
+            victim = cells[action % TOTAL_POS]
+            if victim != EMPTY:
+                attacker = action // ACTIONS_PER_PIECE + 1
+                return ((1 << 36) + ORDER_VALUES[abs(victim)] * 64
+                        - ORDER_VALUES[attacker])
+            if action == killers[0]:
+                return 1 << 35
+            if action == killers[1]:
+                return (1 << 35) - 1
+            return history[action]
+
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+    def _search(self, depth, alpha, beta, ply):
+        """
+        Negamax alpha-beta search from the side to move's point of view.
+        """
+        self.nodes += 1
+        if not self.nodes & TIME_CHECK_MASK:
+            self._check_time()
+
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+
+        key = self._key
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, tt_score, bound, tt_move = entry
+            if tt_depth >= depth and ply > 0:
+                tt_score = _score_from_tt(tt_score, ply)
+                if (bound == EXACT
+                        or (bound == LOWER and tt_score >= beta)
+                        or (bound == UPPER and tt_score <= alpha)):
+                    return tt_score
+
+        moves = generate_actions(self._cells, self._side)
+        if ply == 0 and self._root_moves is not None:
+            moves = [action for action in moves if action in self._root_moves]
+        if not moves:
+            return -WIN_SCORE + ply
+        self._order(moves, tt_move, ply)
+
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_move = None
+        for action in moves:
+            captured, undo = self._make(action)
+            if abs(captured) == GENERAL:
+                score = WIN_SCORE - ply - 1
+            else:
+                score = -self._search(depth - 1, -beta, -alpha, ply + 1)
+            self._unmake(action, captured, undo)
+
+            if score > best_score:
+                best_score = score
+                best_move = action
+                if ply == 0:
+                    self._root_best = action
+                    self._root_score = score
+                if score > alpha:
+                    alpha = score
+            if alpha >= beta:
+                if captured == EMPTY:
+                    self._update_quiet(action, depth, ply)
+                break
+
+        if best_score <= alpha_orig:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, _score_to_tt(best_score, ply), bound,
+                      best_move)
+        return best_score
+
+    def _update_quiet(self, action, depth, ply):
+        """
+        Remember a quiet move causing a beta cutoff for move ordering.
+        """
+        self._history[action] += depth * depth
+        if ply < MAX_PLY:
+            killers = self._killers[ply]
+            if killers[0] != action:
+                killers[1] = killers[0]
+                killers[0] = action
+
+    def _quiesce(self, alpha, beta, ply):
+        """
+        Search captures only until the position is quiet.
+        """
+        self.nodes += 1
+        if not self.nodes & TIME_CHECK_MASK:
+            self._check_time()
+
+        stand_pat = self._eval * self._side
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        # Captures by MVV-LVA, leaving out the ones losing material by
+        # static exchange evaluation since they cannot beat stand pat
+        cells = self._cells
+        captures = []
+        for action in generate_captures(cells, self._side):
+            victim = ORDER_VALUES[abs(cells[action % TOTAL_POS])]
+            attacker = ORDER_VALUES[action // ACTIONS_PER_PIECE + 1]
+            if attacker <= victim or static_exchange(cells, action) >= 0:
+                captures.append((victim * 64 - attacker, action))
+        captures.sort(reverse=True)
+
+        for _, action in captures:
+            captured, undo = self._make(action)
+            if abs(captured) == GENERAL:
+                score = WIN_SCORE - ply - 1
+            else:
+                score = -self._quiesce(-beta, -alpha, ply + 1)
+            self._unmake(action, captured, undo)
+
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
@@ -0,0 +1,72 @@
+import pytest
+
+from gym_xiangqi.agents import AlphaBetaAgent, alphabeta_agent
+from gym_xiangqi.envs import XiangQiEnv
+
+
+@pytest.fixture
+def env():
+    return XiangQiEnv()
+
+
+def test_make_legal_move(env):
+    agent = AlphaBetaAgent(max_depth=2, time_limit_ms=None)
+    action = agent.move(env)
+    assert env.ally_actions[action] == 1
+    assert agent.stats["depth"] == 2
+    assert agent.stats["nodes"] > 0
+    assert agent.stats["nps"] > 0
+
+
+def test_capture_general(env):
+    """
+    78727: Ally CANNON_1 (7, 1) -> (7, 4)
+    75172: Enemy CANNON_1 (2, 7) -> (2, 4)
+    78961: Ally CANNON_1 (7, 4) -> (3, 4)
+    123966: Enemy SOLDIER_5 (3, 0) -> (4, 0)
+    75694: Ally CANNON_1 (3, 4) -> (0, 4) -- takes black general
+    """
+    for action in [78727, 75172, 78961, 123966]:
+        env.step(action)
+
+    agent = AlphaBetaAgent(max_depth=3)
+    assert agent.move(env) == 75694
+
+
+def test_defend_general(env):
+    """
+    After 78727, 75172 and 78961 the black general is attacked by the red
+    cannon; every move that does not deal with it loses the general.
+    """
+    for action in [78727, 75172, 78961]:
+        env.step(action)
+
+    agent = AlphaBetaAgent(max_depth=2)
+    action = agent.move(env)
+    _, _, done, _ = env.step(action)
+    assert not done
+
+    agent = AlphaBetaAgent(max_depth=1)
+    _, _, done, _ = env.step(agent.move(env))
+    assert not done
+
+
+def test_time_budget(env):
+    agent = AlphaBetaAgent(time_limit_ms=50)
+    action = agent.move(env)
+    assert env.ally_actions[action] == 1
+    assert agent.stats["time_ms"] < 500
+    assert agent.tt.stats()["stores"] > 0
+
+
+def test_timeout_before_first_root_move(env, monkeypatch):
+    """
+    A budget running out before any root move is searched still returns the
+    first root move in search order.
+    """
+    monkeypatch.setattr(alphabeta_agent, "TIME_CHECK_MASK", 0)
+    agent = AlphaBetaAgent(time_limit_ms=0)
+    action = agent.move(env)
+    assert agent.stats["timeout"]
+    assert agent.stats["iterations"] == []
+    assert env.ally_actions[action] == 1
@@ -0,0 +1,427 @@
+import math
+
+import numpy as np
+
+from gym_xiangqi.rules import (
+    ACTIONS_PER_PIECE,
+    generate_actions, make_move, unmake_move,
+    position_key, update_key, to_cells,
+)
+from gym_xiangqi.evaluation import evaluate_many
+from gym_xiangqi.constants import (
+    BOARD_ROWS, BOARD_COLS, TOTAL_POS,
+    GENERAL,
+)
+
+DEFAULT_NUM_SIMULATIONS = 800
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_NODES = 1 << 20
+DEFAULT_C_PUCT = 1.5
+
+# Node states
+UNEXPANDED = 0
+EXPANDED = 1
+PENDING = 2         # waiting for evaluation in the current batch
+TERMINAL = 3        # the move into the node won the game
+
+# Material difference of one chariot maps to a value of about 0.45
+MATERIAL_SCALE = 20.
+
+
+def material_evaluator(boards, sides, legal_actions):
+    """
+    Default leaf evaluator: uniform priors and a value squashed from the
+    material and piece-square score of gym_xiangqi.evaluation.
+
+    Parameters:
+        boards (np.array): (B, 10, 9) boards of signed piece IDs
+        sides (np.array): (B, ) side to move of each board
+        legal_actions (list): B arrays of legal action IDs
+    Return:
+        tuple: values of shape (B, ) in [-1, 1] from the side to move's
+        perspective, and priors (None for uniform priors)
+    """
+    return np.tanh(evaluate_many(boards, sides) / MATERIAL_SCALE), None
+
+
+class MCTSAgent:
+    """
+    This agent chooses moves with Monte Carlo Tree Search guided by an
+    evaluator, in the style of AlphaZero.
+
+    - PUCT selection: Q + c_puct * P * sqrt(N_parent) / (1 + N)
+    - Leaves are collected and sent to the evaluator in batches of
+      `batch_size`; virtual loss keeps simulations of a batch apart
+    - The subtree of the new position is reused between moves
+    - Nodes are stored in preallocated NumPy arrays (29 bytes per
+      node) with the children of a node in one contiguous block, so large
+      trees fit in memory and selection is vectorized
+
+    The evaluator is a callable `evaluator(boards, sides, legal_actions)`
+    returning `(values, priors)`, see `material_evaluator` for the exact
+    signature. `priors` is a list of arrays aligned with `legal_actions`
+    (they are normalized) or None for uniform priors. Boards are given in
+    the environment's frame; use `gym_xiangqi.symmetry` to present them
+    from the side to move's perspective to a shared network.
+
+    Attributes:
+        policy (tuple): actions and visit probabilities at the root after
+            the last search, usable as a training target
+        stats (dict): statistics of the last search
+    """
+
+    def __init__(self, evaluator=material_evaluator,
+                 num_simulations=DEFAULT_NUM_SIMULATIONS,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 c_puct=DEFAULT_C_PUCT,
+                 virtual_loss=1,
+                 max_nodes=DEFAULT_MAX_NODES,
+                 temperature=0.,
+                 dirichlet_alpha=None,
+                 dirichlet_epsilon=0.25,
+                 reuse_tree=True,
+                 seed=None):
+        self.evaluator = evaluator
+        self.num_simulations = num_simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.max_nodes = max_nodes
+        self.temperature = temperature
+        self.dirichlet_alpha = dirichlet_alpha
+        self.dirichlet_epsilon = dirichlet_epsilon
+        self.reuse_tree = reuse_tree
+        self.rng = np.random.default_rng(seed)
+
+        self.policy = None
+        self.stats = {}
+
+        # Array-backed tree
+        self.parent = np.full(max_nodes, -1, dtype=np.int32)
+        self.action = np.zeros(max_nodes, dtype=np.int32)
+        self.first_child = np.zeros(max_nodes, dtype=np.int32)
+        self.num_children = np.zeros(max_nodes, dtype=np.int32)
+        self.visits = np.zeros(max_nodes, dtype=np.float32)
+        self.value_sum = np.zeros(max_nodes, dtype=np.float32)
+        self.prior = np.zeros(max_nodes, dtype=np.float32)
+        self.node_state = np.zeros(max_nodes, dtype=np.int8)
+        self.size = 0
+        self.root = None
+
+        self._root_cells = None
+        self._root_side = None
+        self._root_key = None
+
+    def move(self, env):
+        """
+        Search the position of the environment and choose a move for the
+        player whose turn it is.
+        """
+        return self.search(env.state, env.turn)
+
+    def search(self, board, side):
+        """
+        Run the configured number of simulations from a position and choose
+        a move.
+
+        Parameters:
+            board (np.array): 10 x 9 board of signed piece IDs
+            side (int): side to move, ALLY (1) or ENEMY (-1)
+        Return:
+            int: chosen action ID, or None if there is no legal move
+        """
+        cells = to_cells(board)
+        self._set_root(cells, side)
+        reused = int(self.visits[self.root])
+
+        simulations = 0
+        evaluated = 0
+        while simulations < self.num_simulations:
+            done, count = self._run_batch(
+                min(self.batch_size, self.num_simulations - simulations))
+            simulations += done
+            evaluated += count
+            if done == 0:
+                break   # tree is full or the root is terminal
+
+        self.stats = {
+            "simulations": simulations,
+            "evaluated": evaluated,
+            "reused_visits": reused,
+            "tree_size": self.size,
+        }
+        return self._choose()
+
+    def root_children(self):
+        """
+        Statistics of the root moves after a search.
+
+        Return:
+            tuple: arrays of action IDs, visit counts and value sums from
+            the side to move's perspective
+        """
+        if self.root is None or self.node_state[self.root] != EXPANDED:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty, empty
+        start = self.first_child[self.root]
+        children = slice(start, start + self.num_children[self.root])
+        return (self.action[children].astype(np.int64),
+                self.visits[children].astype(np.float64),
+                self.value_sum[children].astype(np.float64))
+
+    def reset(self):
+        """
+        Drop the whole search tree.
+        """
+        self.size = 0
+        self.root = None
+        self._root_cells = None
+
+    def _allocate(self, count):
+        """
+        Reserve `count` contiguous nodes, or return None if the tree is full.
+        """
+        start = self.size
+        if start + count > self.max_nodes:
+            return None
+        end = start + count
+        self.parent[start:end] = -1
+        self.first_child[start:end] = 0
+        self.num_children[start:end] = 0
+        self.visits[start:end] = 0
+        self.value_sum[start:end] = 0
+        self.node_state[start:end] = UNEXPANDED
+        self.size = end
+        return start
+
+    def _set_root(self, cells, side):
+        """
+        Move the root to the given position, reusing the subtree if the
+        position was reached from the previous root within two plies.
+        """
+        key = position_key(cells, side)
+        root = None
+        if self.reuse_tree and self._root_cells is not None:
+            root = self._find_descendant(key)
+
+        if root is None:
+            self.size = 0
+            root = self._allocate(1)
+        elif self.size > self.max_nodes // 2:
+            root = self._compact(root)
+
+        self.root = root
+        self.parent[root] = -1
+        self._root_cells = list(cells)
+        self._root_side = side
+        self._root_key = key
+
+        if self.node_state[root] == EXPANDED and self.dirichlet_alpha:
+            self._add_noise(root)
+
+    def _children(self, node):
+        start = self.first_child[node]
+        return range(start, start + self.num_children[node])
+
+    def _find_descendant(self, key):
+        """
+        Find the child or grandchild of the root matching a position key.
+        """
+        cells = self._root_cells
+        root_key = self._root_key
+        for child in self._children(self.root):
+            action = int(self.action[child])
+            piece_id = cells[action % ACTIONS_PER_PIECE // TOTAL_POS]
+            captured = make_move(cells, action)
+            child_key = update_key(root_key, action, piece_id, captured)
+            found = None
+            if child_key == key:
+                found = child
+            elif self.node_state[child] == EXPANDED:
+                for grandchild in self._children(child):
+                    reply = int(self.action[grandchild])
+                    reply_piece = cells[reply % ACTIONS_PER_PIECE // TOTAL_POS]
+                    reply_captured = cells[reply % TOTAL_POS]
+                    if update_key(child_key, reply, reply_piece,
+                                  reply_captured) == key:
+                        found = grandchild
+                        break
+            unmake_move(cells, action, captured)
+            if found is not None:
+                return found
+        return None
+
+    def _compact(self, root):
+        """
+        Copy the subtree of `root` to the front of the node arrays in
+        breadth-first order, keeping children blocks contiguous, and
+        return the new root index.
+        """
+        levels = [np.array([root])]
+        frontier = levels[0]
+        while frontier.size:
+            parents = frontier[self.node_state[frontier] == EXPANDED]
+            counts = self.num_children[parents]
+            total = int(counts.sum())
+            if total == 0:
+                break
+            offsets = np.cumsum(counts) - counts
+            frontier = (np.repeat(self.first_child[parents], counts)
+                        + np.arange(total) - np.repeat(offsets, counts))
+            levels.append(frontier)
+        old = np.concatenate(levels)
+        count = old.size
+
+        new_index = np.full(self.max_nodes, -1, dtype=np.int32)
+        new_index[old] = np.arange(count, dtype=np.int32)
+
+        for array in (self.action, self.num_children, self.visits,
+                      self.value_sum, self.prior, self.node_state):
+            array[:count] = array[old]
+        self.parent[:count] = np.where(self.parent[old] >= 0,
+                                       new_index[self.parent[old]], -1)
+        self.first_child[:count] = np.where(
+            self.num_children[:count] > 0,
+            new_index[self.first_child[old]], 0)
+        self.size = count
+        return 0
+
+    def _add_noise(self, node):
+        children = slice(self.first_child[node],
+                         self.first_child[node] + self.num_children[node])
+        noise = self.rng.dirichlet(
+            [self.dirichlet_alpha] * int(self.num_children[node]))
+        self.prior[children] = ((1 - self.dirichlet_epsilon)
+                                * self.prior[children]
+                                + self.dirichlet_epsilon * noise)
+
+    def _select_child(self, node):
+        start = self.first_child[node]
+        children = slice(start, start + self.num_children[node])
+        visits = self.visits[children]
+        q = np.divide(self.value_sum[children], visits,
+                      out=np.zeros_like(visits), where=visits > 0)
+        u = (self.c_puct * self.prior[children]
+             * math.sqrt(max(self.visits[node], 1.)) / (1 + visits))
+        return start + int(np.argmax(q + u))
+
+    def _run_batch(self, batch_size):
+        """
+        Run up to `batch_size` simulations, evaluate their leaves with a
+        single evaluator call and back up the results.
+
+        Return:
+            tuple: number of finished simulations and evaluated leaves
+        """
+        vl = self.virtual_loss
+        leaves = []
+        done = 0
+
+        while len(leaves) + done < batch_size:
+            node = self.root
+            path = [node]
+            cells = list(self._root_cells)
+            side = self._root_side
+            captured = 0
+
+            while self.node_state[node] == EXPANDED:
+                node = self._select_child(node)
+                path.append(node)
+                captured = make_move(cells, int(self.action[node]))
+                side = -side
+
+            state = self.node_state[node]
+            if state == PENDING:
+                break   # collected all distinct leaves virtual loss allows
+
+            for visited in path:
+                self.visits[visited] += vl
+                self.value_sum[visited] -= vl
+
+            if state == UNEXPANDED and abs(captured) == GENERAL:
+                self.node_state[node] = state = TERMINAL
+            if state == UNEXPANDED:
+                legal = generate_actions(cells, side)
+                if legal:
+                    legal.sort()
+                    self.node_state[node] = PENDING
+                    leaves.append((path, cells, side, legal))
+                    continue
+                # No legal move left: the side to move loses
+                self.node_state[node] = state = TERMINAL
+
+            if node == self.root:
+                self._backup(path, 0.)
+                return 0, 0     # game already over, nothing to search
+            # Terminal node: the player who moved into it won
+            self._backup(path, 1.)
+            done += 1
+
+        if not leaves:
+            return done, 0
+
+        boards = np.array([cells for _, cells, _, _ in leaves],
+                          dtype=np.int8).reshape(-1, BOARD_ROWS, BOARD_COLS)
+        sides = np.array([side for _, _, side, _ in leaves])
+        legal = [np.array(actions) for _, _, _, actions in leaves]
+        values, priors = self.evaluator(boards, sides, legal)
+
+        for i, (path, _, _, actions) in enumerate(leaves):
+            node = path[-1]
+            start = self._allocate(len(actions))
+            if start is None:
+                self.node_state[node] = UNEXPANDED
+            else:
+                end = start + len(actions)
+                self.parent[start:end] = node
+                self.action[start:end] = actions
+                if priors is None or priors[i] is None:
+                    self.prior[start:end] = 1. / len(actions)
+                else:
+                    p = np.asarray(priors[i], dtype=np.float32)
+                    total = p.sum()
+                    self.prior[start:end] = (p / total if total > 0
+                                             else 1. / len(actions))
+                self.first_child[node] = start
+                self.num_children[node] = len(actions)
+                self.node_state[node] = EXPANDED
+                if node == self.root and self.dirichlet_alpha:
+                    self._add_noise(node)
+            # Values are from the side to move at the leaf
+            self._backup(path, -float(values[i]))
+
+        return done + len(leaves), len(leaves)
+
+    def _backup(self, path, value):
+        """
+        Add a simulation result to every node of the path and remove the
+        virtual loss. `value` is from the perspective of the player who
+        moved into the last node of the path.
+        """
+        vl = self.virtual_loss
+        for node in reversed(path):
+            self.visits[node] += 1 - vl
+            self.value_sum[node] += value + vl
+            value = -value
+
+    def _choose(self):
+        """
+        Choose the root move from visit counts and record the root policy.
+        """
+        root = self.root
+        if self.node_state[root] != EXPANDED:
+            self.policy = None
+            return None
+
+        children = slice(self.first_child[root],
+                         self.first_child[root] + self.num_children[root])
+        actions = self.action[children].astype(np.int64)
+        visits = self.visits[children].astype(np.float64)
+        if visits.sum() == 0:
+            visits = self.prior[children].astype(np.float64)
+        self.policy = (actions, visits / visits.sum())
+
+        if self.temperature > 0:
+            weights = visits ** (1. / self.temperature)
+            return int(self.rng.choice(actions, p=weights / weights.sum()))
+        return int(actions[int(np.argmax(visits))])
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from gym_xiangqi.agents import MCTSAgent
+from gym_xiangqi.agents.mcts_agent import EXPANDED
+from gym_xiangqi.envs import XiangQiEnv
+
+
+@pytest.fixture
+def env():
+    return XiangQiEnv()
+
+
+def test_make_legal_move(env):
+    agent = MCTSAgent(num_simulations=64, max_nodes=1 << 16)
+    action = agent.move(env)
+    assert env.ally_actions[action] == 1
+    assert agent.stats["simulations"] == 64
+
+    actions, probs = agent.policy
+    assert action in actions
+    assert np.isclose(probs.sum(), 1)
+    assert np.all(env.ally_actions[actions] == 1)
+
+
+def test_node_bytes():
+    agent = MCTSAgent(max_nodes=1000)
+    arrays = [agent.parent, agent.action, agent.first_child,
+              agent.num_children, agent.visits, agent.value_sum, agent.prior,
+              agent.node_state]
+    assert sum(array.nbytes for array in arrays) == 29 * 1000
+
+
+def test_capture_general(env):
+    """
+    Same position as the alpha-beta test: 75694 takes the black general.
+    """
+    for action in [78727, 75172, 78961, 123966]:
+        env.step(action)
+
+    agent = MCTSAgent(num_simulations=200, max_nodes=1 << 16)
+    assert agent.move(env) == 75694
+
+
+def test_batched_evaluator(env):
+    batch_sizes = []
+
+    def evaluator(boards, sides, legal_actions):
+        batch_sizes.append(len(boards))
+        assert boards.shape[1:] == (10, 9)
+        assert len(sides) == len(legal_actions) == len(boards)
+        priors = [np.arange(1, len(legal) + 1) for legal in legal_actions]
+        return np.zeros(len(boards)), priors
+
+    agent = MCTSAgent(evaluator=evaluator, num_simulations=64,
+                      batch_size=16, max_nodes=1 << 16)
+    agent.move(env)
+    assert max(batch_sizes) > 1
+    assert sum(batch_sizes) == agent.stats["evaluated"]
+
+
+def test_tree_reuse(env):
+    agent = MCTSAgent(num_simulations=200, max_nodes=12000)
+    env.step(agent.move(env))
+    size = agent.size
+    assert size > agent.max_nodes // 2
+
+    # Playing both sides: the new root is the most visited child
+    env.step(agent.move(env))
+    assert agent.stats["reused_visits"] > 0
+    assert agent.root == 0
+
+    # The compacted tree keeps children blocks consistent
+    for node in range(agent.size):
+        if agent.node_state[node] == EXPANDED:
+            start = agent.first_child[node]
+            children = slice(start, start + agent.num_children[node])
+            assert np.all(agent.parent[children] == node)
@@ -0,0 +1,416 @@
+"""
+Parallel search across a pool of worker processes.
+
+- `ParallelAlphaBetaAgent`: root parallelism, the root moves are split
+  between workers which search their share with iterative deepening
+- `ParallelMCTSAgent`: root parallelism for MCTS, every worker grows an
+  independent tree from its own seed and writes its root statistics to a
+  shared memory array where they are summed
+- `PoolEvaluator`: leaf parallelism, the leaves of a batch are evaluated by
+  the workers, with boards and values exchanged through shared memory
+
+Results only depend on the seed and the number of workers, not on the
+scheduling of the processes, as long as no time budget cuts searches short.
+
+MCTS workers deliberately do not share one tree's statistics through shared
+memory: concurrent updates to a shared tree would make the result depend
+on the scheduling of the processes, so the trees are independent and only
+their root statistics are combined, while `PoolEvaluator` provides leaf
+parallelism for the evaluation of a single tree.
+Workers are started lazily and kept until `close()` is called; the agents
+can also be used as context managers. Evaluators must be picklable, e.g.
+module-level functions.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gym_xiangqi.agents.alphabeta_agent import (
+    AlphaBetaAgent, DEFAULT_MAX_DEPTH, DEFAULT_TIME_LIMIT_MS,
+)
+from gym_xiangqi.agents.mcts_agent import (
+    MCTSAgent, DEFAULT_NUM_SIMULATIONS, material_evaluator,
+)
+from gym_xiangqi.agents.shared import create_shared_array, attach_shared_array
+from gym_xiangqi.agents.transposition import (
+    DEFAULT_TT_SIZE, SharedTranspositionTable,
+)
+from gym_xiangqi.constants import BOARD_ROWS, BOARD_COLS
+from gym_xiangqi.rules import generate_actions, to_cells
+
+DEFAULT_MAX_BATCH = 256
+
+
+def _alphabeta_worker(board, side, moves, max_depth, time_limit_ms, tt_size,
+                      tt):
+    agent = AlphaBetaAgent(max_depth, time_limit_ms, tt_size, tt)
+    # The generation of a shared table is advanced once by the parent
+    move = agent.search(board, side, root_moves=moves,
+                        new_search=tt is None)
+    tt_stats = None
+    if tt is not None:
+        tt_stats = tt.stats()
+        tt.close()
+    stats = agent.stats
+    return stats["iterations"], move, stats["nodes"], tt_stats
+
+
+def _merge_root_results(results):
+    """
+    Choose the move of a root-parallel alpha-beta search from the results of
+    its workers.
+
+    Parameters:
+        results (list): (iterations, move, nodes, tt_stats) of every worker
+    Return:
+        tuple: (best move, its score, depth of the shallowest contributing
+        iteration)
+    """
+    # Every worker contributes the move of its deepest completed iteration;
+    # workers that completed none are left out
+    best_move, best_score, reached = None, None, None
+    for iterations, _, _, _ in results:
+        if not iterations:
+            continue
+        depth, move, score = iterations[-1]
+        reached = depth if reached is None else min(reached, depth)
+        if move is not None and (best_score is None or score > best_score):
+            best_move, best_score = move, score
+    if best_move is None:
+        # No iteration finished in time: the first move in search order of
+        # the first worker
+        best_move = results[0][1]
+    return best_move, best_score, reached or 0
+
+
+def _mcts_worker(board, side, root_actions, num_simulations, seed, options,
+                 stats_name, stats_shape, index):
+    agent = MCTSAgent(num_simulations=num_simulations, seed=seed,
+                      reuse_tree=False, **options)
+    agent.search(board, side)
+    actions, visits, value_sums = agent.root_children()
+
+    shm, stats = attach_shared_array(stats_name, stats_shape, np.float64)
+    columns = np.searchsorted(root_actions, actions)
+    stats[index, 0, columns] = visits
+    stats[index, 1, columns] = value_sums
+    del stats
+    shm.close()
+    return agent.stats["simulations"]
+
+
+class _PoolMixin:
+    """
+    Lazily started process pool shared by the parallel agents.
+    """
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    def close(self):
+        """
+        Shut the worker processes down.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParallelAlphaBetaAgent(_PoolMixin):
+    """
+    Alpha-beta search with the root moves split between worker processes.
+
+    Root moves are dealt round-robin to the workers, which search them with
+    iterative deepening. Every worker proposes the best move of its deepest
+    completed iteration and the best scored proposal is played, ties going
+    to the lowest worker index; the reported depth is the lowest of these
+    iterations. A worker running out of time before completing any
+    iteration makes no proposal.
+
+    With `shared_tt` the workers share one SharedTranspositionTable, kept
+    between moves, instead of each building its own. This avoids searching
+    the same positions several times but makes results depend on the
+    timing of the workers; without it the result is deterministic when
+    `time_limit_ms` is None.
+
+    Attributes:
+        tt (SharedTranspositionTable): the shared table, or None
+        stats (dict): depth, score, total nodes, time in ms and nodes per
+            second of the last search, and the shared table statistics
+    """
+
+    def __init__(self, workers=None, max_depth=DEFAULT_MAX_DEPTH,
+                 time_limit_ms=DEFAULT_TIME_LIMIT_MS,
+                 tt_size=DEFAULT_TT_SIZE, shared_tt=False):
+        self.workers = workers or os.cpu_count()
+        self.max_depth = max_depth
+        self.time_limit_ms = time_limit_ms
+        self.tt_size = tt_size
+        self.tt = SharedTranspositionTable(tt_size) if shared_tt else None
+        self.stats = {}
+        self._executor = None
+
+    def close(self):
+        """
+        Shut the worker processes down and free the shared table.
+        """
+        super().close()
+        if self.tt is not None:
+            self.tt.unlink()
+            self.tt = None
+
+    def move(self, env):
+        """
+        Search the best move for the player whose turn it is.
+        """
+        return self.search(env.state, env.turn)
+
+    def search(self, board, side):
+        """
+        Search the best move of a position.
+
+        Parameters:
+            board (np.array): 10 x 9 board of signed piece IDs
+            side (int): side to move, ALLY (1) or ENEMY (-1)
+        Return:
+            int: best action ID, or None if there is no legal move
+        """
+        start = time.perf_counter()
+        moves = sorted(generate_actions(to_cells(board), side))
+        if not moves:
+            return None
+        shares = [moves[i::self.workers]
+                  for i in range(min(self.workers, len(moves)))]
+        if self.tt is not None:
+            self.tt.new_search()
+        futures = [self._pool().submit(_alphabeta_worker, board, side, share,
+                                       self.max_depth, self.time_limit_ms,
+                                       self.tt_size, self.tt)
+                   for share in shares]
+        results = [future.result() for future in futures]
+
+        best_move, best_score, reached = _merge_root_results(results)
+
+        elapsed = time.perf_counter() - start
+        nodes = sum(result[2] for result in results)
+        self.stats = {
+            "depth": reached,
+            "score": best_score,
+            "nodes": nodes,
+            "time_ms": elapsed * 1000,
+            "nps": nodes / elapsed if elapsed > 0 else 0.0,
+        }
+        if self.tt is not None:
+            # Lookup counters are kept by every worker
+            tt_stats = self.tt.stats()
+            for counter in ("probes", "hits", "stores", "collisions", "torn"):
+                tt_stats[counter] = sum(result[3][counter]
+                                        for result in results)
+            self.stats["tt"] = tt_stats
+        return best_move
+
+
+class ParallelMCTSAgent(_PoolMixin):
+    """
+    MCTS with one independent tree per worker process (root parallelism).
+
+    The simulations are divided between the workers. Each worker searches
+    with a seed spawned from the agent's seed and writes the visit counts
+    and value sums of the root moves to a shared memory array; the summed
+    visits choose the move. Trees are not reused between moves.
+
+    Attributes:
+        policy (tuple): root actions and summed visit probabilities of the
+            last search
+        stats (dict): simulations and time in ms of the last search
+    """
+
+    def __init__(self, workers=None, evaluator=material_evaluator,
+                 num_simulations=DEFAULT_NUM_SIMULATIONS, temperature=0.,
+                 seed=None, **options):
+        """
+        Other keyword arguments are passed on to the MCTSAgent of every
+        worker.
+        """
+        self.workers = workers or os.cpu_count()
+        self.num_simulations = num_simulations
+        self.temperature = temperature
+        self.options = dict(options, evaluator=evaluator)
+        self.seeds = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seeds.spawn(1)[0])
+        self.policy = None
+        self.stats = {}
+        self._executor = None
+
+    def move(self, env):
+        """
+        Search the position of the environment and choose a move for the
+        player whose turn it is.
+        """
+        return self.search(env.state, env.turn)
+
+    def search(self, board, side):
+        """
+        Run the simulations on all workers and choose a move.
+
+        Parameters:
+            board (np.array): 10 x 9 board of signed piece IDs
+            side (int): side to move, ALLY (1) or ENEMY (-1)
+        Return:
+            int: chosen action ID, or None if there is no legal move
+        """
+        start = time.perf_counter()
+        root_actions = np.array(sorted(generate_actions(to_cells(board),
+                                                        side)),
+                                dtype=np.int64)
+        if root_actions.size == 0:
+            self.policy = None
+            return None
+
+        seeds = self.seeds.spawn(self.workers)
+        shares = [self.num_simulations // self.workers
+                  + (i < self.num_simulations % self.workers)
+                  for i in range(self.workers)]
+        shm, stats = create_shared_array((self.workers, 2, root_actions.size),
+                                         np.float64)
+        try:
+            futures = [self._pool().submit(_mcts_worker, board, side,
+                                           root_actions, shares[i], seeds[i],
+                                           self.options, shm.name,
+                                           stats.shape, i)
+                       for i in range(self.workers) if shares[i]]
+            simulations = sum(future.result() for future in futures)
+            visits = stats[:, 0].sum(axis=0)
+        finally:
+            del stats
+            shm.close()
+            shm.unlink()
+
+        if visits.sum() == 0:
+            visits = np.ones(root_actions.size)
+        self.policy = (root_actions, visits / visits.sum())
+        self.stats = {
+            "simulations": simulations,
+            "time_ms": (time.perf_counter() - start) * 1000,
+        }
+        if self.temperature > 0:
+            weights = visits ** (1. / self.temperature)
+            return int(self.rng.choice(root_actions,
+                                       p=weights / weights.sum()))
+        return int(root_actions[int(np.argmax(visits))])
+
+
+_evaluator_state = {}
+
+
+def _init_evaluator_worker(evaluator, boards_name, values_name, max_batch):
+    _evaluator_state["evaluator"] = evaluator
+    _evaluator_state["boards"] = attach_shared_array(
+        boards_name, (max_batch, BOARD_ROWS, BOARD_COLS), np.int8)
+    _evaluator_state["values"] = attach_shared_array(
+        values_name, (max_batch, ), np.float64)
+
+
+def _evaluate_leaves(start, end, sides, legal_actions):
+    _, boards = _evaluator_state["boards"]
+    _, values = _evaluator_state["values"]
+    chunk_values, priors = _evaluator_state["evaluator"](
+        boards[start:end], sides, legal_actions)
+    values[start:end] = chunk_values
+    return priors
+
+
+class PoolEvaluator:
+    """
+    Evaluator splitting every batch of leaves between worker processes,
+    for expensive evaluators such as rollouts or CPU networks. It is used
+    in place of the wrapped evaluator:
+
+        MCTSAgent(evaluator=PoolEvaluator(my_evaluator, workers=8),
+                  batch_size=64)
+
+    Boards and values are passed through shared memory; legal actions and
+    priors are sent along with the tasks. A batch is split into the same
+    chunks every time, so results are deterministic when the wrapped
+    evaluator is.
+    """
+
+    def __init__(self, evaluator=material_evaluator, workers=None,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.evaluator = evaluator
+        self.workers = workers or os.cpu_count()
+        self.max_batch = max_batch
+        self._boards_shm, self._boards = create_shared_array(
+            (max_batch, BOARD_ROWS, BOARD_COLS), np.int8)
+        self._values_shm, self._values = create_shared_array(
+            (max_batch, ), np.float64)
+        self._executor = None
+
+    def __call__(self, boards, sides, legal_actions):
+        count = len(boards)
+        values = np.zeros(count)
+        priors = []
+        for start in range(0, count, self.max_batch):
+            end = min(start + self.max_batch, count)
+            block_values, block_priors = self._evaluate_block(
+                boards[start:end], sides[start:end],
+                legal_actions[start:end])
+            values[start:end] = block_values
+            priors.extend(block_priors)
+        if all(prior is None for prior in priors):
+            priors = None
+        return values, priors
+
+    def _evaluate_block(self, boards, sides, legal_actions):
+        count = len(boards)
+        self._boards[:count] = boards
+        bounds = np.linspace(0, count, min(self.workers, count) + 1,
+                             dtype=int)
+        futures = [self._pool().submit(_evaluate_leaves, start, end,
+                                       sides[start:end],
+                                       legal_actions[start:end])
+                   for start, end in zip(bounds[:-1], bounds[1:])]
+        priors = []
+        for (start, end), future in zip(zip(bounds[:-1], bounds[1:]),
+                                        futures):
+            chunk = future.result()
+            priors.extend([None] * (end - start) if chunk is None else chunk)
+        return self._values[:count].copy(), priors
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.workers, initializer=_init_evaluator_worker,
+                initargs=(self.evaluator, self._boards_shm.name,
+                          self._values_shm.name, self.max_batch))
+        return self._executor
+
+    def close(self):
+        """
+        Shut the worker processes down and free the shared memory.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._boards_shm is not None:
+            del self._boards, self._values
+            for shm in (self._boards_shm, self._values_shm):
+                shm.close()
+                shm.unlink()
+            self._boards_shm = self._values_shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
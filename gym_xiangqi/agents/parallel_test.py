@@ -0,0 +1,102 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from gym_xiangqi.agents import (
+    AlphaBetaAgent, MCTSAgent,
+    ParallelAlphaBetaAgent, ParallelMCTSAgent, PoolEvaluator,
+)
+from gym_xiangqi.agents.parallel import _merge_root_results
+from gym_xiangqi.envs import XiangQiEnv
+
+
+@pytest.fixture
+def env():
+    return XiangQiEnv()
+
+
+def test_import_without_shared_memory():
+    """
+    Importing the agents must not need multiprocessing.shared_memory, which
+    is missing before Python 3.8.
+    """
+    code = ("import sys, gym_xiangqi.agents; "
+            "sys.exit('multiprocessing.shared_memory' in sys.modules)")
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_root_parallel_alphabeta(env):
+    """
+    Splitting the root must find the same move and score as one process.
+    """
+    for action in [78727, 75172, 78961, 123966]:
+        env.step(action)
+
+    with ParallelAlphaBetaAgent(workers=2, max_depth=3,
+                                time_limit_ms=None) as agent:
+        assert agent.move(env) == 75694
+        env.reset()
+        action = agent.move(env)
+
+    serial = AlphaBetaAgent(max_depth=3, time_limit_ms=None)
+    serial.move(env)
+    assert agent.stats["score"] == serial.stats["score"]
+    assert env.ally_actions[action] == 1
+
+
+def test_merge_root_results():
+    """
+    A worker timing out early must not discard the others' results.
+    """
+    results = [
+        ([], 11, 900, None),
+        ([(1, 21, 5), (2, 22, 8), (3, 23, 4)], 23, 5000, None),
+        ([(1, 31, 7), (2, 32, 6)], 32, 3000, None),
+    ]
+    assert _merge_root_results(results) == (32, 6, 2)
+    assert _merge_root_results([([], 11, 0, None), ([], 12, 0, None)]) \
+        == (11, None, 0)
+
+
+def test_root_parallel_mcts_deterministic(env):
+    results = []
+    for _ in range(2):
+        with ParallelMCTSAgent(workers=2, num_simulations=64,
+                               seed=7) as agent:
+            results.append((agent.move(env), agent.policy[1]))
+            assert agent.stats["simulations"] == 64
+
+    assert results[0][0] == results[1][0]
+    assert np.array_equal(results[0][1], results[1][1])
+    assert env.ally_actions[results[0][0]] == 1
+
+
+def test_pool_evaluator(env):
+    """
+    Leaves evaluated by the pool give the same search as in process.
+    """
+    with PoolEvaluator(workers=2, max_batch=4) as evaluator:
+        pooled = MCTSAgent(evaluator=evaluator, num_simulations=64,
+                           batch_size=8, max_nodes=1 << 16)
+        action = pooled.move(env)
+
+    serial = MCTSAgent(num_simulations=64, batch_size=8, max_nodes=1 << 16)
+    assert serial.move(env) == action
+    assert np.allclose(serial.policy[1], pooled.policy[1])
+
+
+def test_shared_transposition_table(env):
+    with ParallelAlphaBetaAgent(workers=2, max_depth=3, time_limit_ms=None,
+                                shared_tt=True) as agent:
+        action = agent.move(env)
+        tt_stats = agent.stats["tt"]
+        assert tt_stats["stores"] > 0
+        assert tt_stats["fill_rate"] > 0
+        assert env.ally_actions[action] == 1
+        # One generation per move, however many workers share the table
+        assert agent.tt.generation == 1
+        agent.move(env)
+        assert agent.tt.generation == 2
+    assert agent.tt is None
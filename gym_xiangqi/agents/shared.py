@@ -0,0 +1,50 @@
+"""
+Helpers to share NumPy arrays between search worker processes through
+`multiprocessing.shared_memory`.
+
+The process creating an array owns its memory block and must `unlink()` it
+when done; worker processes of a pool it started only attach to it by name.
+
+`multiprocessing.shared_memory` needs Python 3.8. It is imported when an
+array is first created or attached, so that the agents package still imports
+on older versions where only the parallel agents are unavailable.
+"""
+import numpy as np
+
+
+def _shared_memory():
+    from multiprocessing import shared_memory
+    return shared_memory
+
+
+def create_shared_array(shape, dtype):
+    """
+    Allocate a zero-filled array in a new shared memory block.
+
+    Parameters:
+        shape (tuple): shape of the array
+        dtype (np.dtype): data type of the array
+    Return:
+        tuple: (SharedMemory block, np.array backed by the block)
+    """
+    dtype = np.dtype(dtype)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    shm = _shared_memory().SharedMemory(create=True, size=size)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.fill(0)
+    return shm, array
+
+
+def attach_shared_array(name, shape, dtype):
+    """
+    Attach to an array created by `create_shared_array` in another process.
+
+    Parameters:
+        name (str): name of the shared memory block
+        shape (tuple): shape of the array
+        dtype (np.dtype): data type of the array
+    Return:
+        tuple: (SharedMemory block, np.array backed by the block)
+    """
+    shm = _shared_memory().SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
@@ -0,0 +1,320 @@
+"""
+Transposition tables used by the search agents to remember results of
+positions already searched, keyed by Zobrist position keys
+(see `gym_xiangqi.rules.position_key`).
+"""
+import numpy as np
+
+from gym_xiangqi.agents.shared import create_shared_array, attach_shared_array
+
+# Bound types of stored scores
+EXACT = 0
+LOWER = 1       # score is a lower bound (search failed high)
+UPPER = 2       # score is an upper bound (search failed low)
+
+DEFAULT_TT_SIZE = 1 << 18
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results indexed by the low bits of the
+    position key. Each slot keeps one entry and the full key to detect
+    index collisions.
+
+    Replacement policy: an occupied slot is overwritten when the new entry
+    is for the same position, the stored entry comes from an older search
+    (see new_search()), or the new entry was searched at least as deep.
+
+    Attributes:
+        size (int): number of slots, rounded up to a power of two
+        probes (int): number of lookups
+        hits (int): number of lookups finding the position
+        stores (int): number of entries written
+        collisions (int): number of lookups and stores hitting a slot
+            occupied by a different position
+    """
+
+    def __init__(self, size=DEFAULT_TT_SIZE):
+        self.size = 1 << max(0, size - 1).bit_length()
+        self._mask = self.size - 1
+        self._slots = [None] * self.size
+        self._generation = 0
+        self._used = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def new_search(self):
+        """
+        Mark the start of a new search; entries of previous searches become
+        preferred candidates for replacement.
+        """
+        self._generation += 1
+
+    def clear(self):
+        """
+        Remove every entry and reset the statistics.
+        """
+        self._slots = [None] * self.size
+        self._used = 0
+        self.probes = self.hits = self.stores = self.collisions = 0
+
+    def probe(self, key):
+        """
+        Look up a position.
+
+        Parameters:
+            key (int): position key
+        Return:
+            tuple: (depth, score, bound, move) or None if not found
+        """
+        self.probes += 1
+        entry = self._slots[key & self._mask]
+        if entry is None:
+            return None
+        if entry[0] != key:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return entry[1:5]
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Store a search result following the replacement policy.
+
+        Parameters:
+            key (int): position key
+            depth (int): remaining search depth of the result
+            score (int): search score from the side to move's perspective
+            bound (int): EXACT, LOWER or UPPER
+            move (int): best action ID found, or None
+        """
+        index = key & self._mask
+        entry = self._slots[index]
+        if entry is None:
+            self._used += 1
+        elif entry[0] != key:
+            self.collisions += 1
+            if entry[5] == self._generation and entry[1] > depth:
+                return
+        elif move is None:
+            move = entry[4]
+        self._slots[index] = (key, depth, score, bound, move,
+                              self._generation)
+        self.stores += 1
+
+    def stats(self):
+        """
+        Return:
+            dict: size, fill rate, probe/hit counts and collisions
+        """
+        return {
+            "size": self.size,
+            "fill_rate": self._used / self.size,
+            "probes": self.probes,
+            "hits": self.hits,
+            "stores": self.stores,
+            "collisions": self.collisions,
+        }
+
+
+# Entry layout of SharedTranspositionTable. `key` holds the position key
+# XORed with the packed entry data, so that entries torn by concurrent
+# writes of several processes fail verification instead of being trusted.
+SHARED_ENTRY = np.dtype([
+    ("key", np.uint64),
+    ("depth", np.int16),
+    ("bound", np.int8),
+    ("generation", np.uint8),
+    ("score", np.int32),
+    ("move", np.int32),
+])
+
+NO_MOVE = -1
+
+
+def _pack(depth, score, bound, move, generation):
+    """
+    Pack the data of an entry into one 64 bit word for XOR verification.
+    """
+    return ((score & 0xFFFFFFFF)
+            | ((move & 0x1FFFF) << 32)
+            | ((depth & 0xFF) << 49)
+            | ((bound & 0x3) << 57)
+            | ((generation & 0x1F) << 59))
+
+
+class SharedTranspositionTable:
+    """
+    Transposition table living in shared memory so that the workers of a
+    parallel search share their results. It has the interface and the
+    replacement policy of TranspositionTable.
+
+    Entries are rows of a NumPy structured array (see SHARED_ENTRY) and are
+    written without locks. The stored key is XORed with the packed entry
+    data; a probe only accepts a row whose fields match the key again, which
+    rejects rows mixing two concurrent writes.
+
+    The process creating the table owns it and must call `unlink()` when
+    done. Instances can be pickled and sent to worker processes, which
+    attach to the same memory.
+
+    Attributes:
+        size (int): number of slots, rounded up to a power of two
+        probes (int): number of lookups by this process
+        hits (int): number of lookups finding the position
+        stores (int): number of entries written by this process
+        collisions (int): number of lookups and stores hitting a slot
+            occupied by a different position
+        torn (int): number of rows rejected by the XOR verification
+    """
+
+    def __init__(self, size=DEFAULT_TT_SIZE):
+        self.size = 1 << max(0, size - 1).bit_length()
+        self._table_shm, self._table = create_shared_array(
+            (self.size, ), SHARED_ENTRY)
+        self._header_shm, self._header = create_shared_array(
+            (1, ), np.uint32)
+        self._owner = True
+        self._init_local()
+
+    def _init_local(self):
+        self._mask = self.size - 1
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+        self.torn = 0
+
+    def __getstate__(self):
+        return (self.size, self._table_shm.name, self._header_shm.name)
+
+    def __setstate__(self, state):
+        self.size, table_name, header_name = state
+        self._table_shm, self._table = attach_shared_array(
+            table_name, (self.size, ), SHARED_ENTRY)
+        self._header_shm, self._header = attach_shared_array(
+            header_name, (1, ), np.uint32)
+        self._owner = False
+        self._init_local()
+
+    @property
+    def generation(self):
+        return int(self._header[0])
+
+    def new_search(self):
+        """
+        Mark the start of a new search for every process sharing the table.
+        """
+        self._header[0] += 1
+
+    def clear(self):
+        """
+        Remove every entry and reset the statistics of this process.
+        """
+        self._table.fill(0)
+        self.probes = self.hits = self.stores = self.collisions = 0
+        self.torn = 0
+
+    def _read(self, index, key):
+        """
+        Read a slot, returning (entry, status) where status is None for an
+        empty slot, False for another position and True for a match. Torn
+        rows are treated as empty slots.
+        """
+        check, depth, bound, generation, score, move = \
+            self._table[index].item()
+        if check == 0:
+            return None, None
+        stored_key = check ^ _pack(depth, score, bound, move, generation)
+        if stored_key == key:
+            return (depth, score, bound, move, generation), True
+        if stored_key & self._mask != index:
+            # A complete entry of this slot always has a key mapping to it,
+            # so the row mixes two concurrent writes
+            self.torn += 1
+            return None, None
+        return (depth, score, bound, move, generation), False
+
+    def probe(self, key):
+        """
+        Look up a position.
+
+        Parameters:
+            key (int): position key
+        Return:
+            tuple: (depth, score, bound, move) or None if not found
+        """
+        self.probes += 1
+        entry, found = self._read(key & self._mask, key)
+        if found is None:
+            return None
+        if not found:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        depth, score, bound, move, _ = entry
+        return depth, score, bound, None if move == NO_MOVE else move
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Store a search result following the replacement policy.
+
+        Parameters:
+            key (int): position key
+            depth (int): remaining search depth of the result
+            score (int): search score from the side to move's perspective
+            bound (int): EXACT, LOWER or UPPER
+            move (int): best action ID found, or None
+        """
+        index = key & self._mask
+        generation = self.generation & 0xFF
+        entry, found = self._read(index, key)
+        if found is False:
+            self.collisions += 1
+            if entry[4] == generation and entry[0] > depth:
+                return
+        elif found and move is None:
+            move = entry[3]
+        move = NO_MOVE if move is None else move
+        data = _pack(depth, score, bound, move, generation)
+        self._table[index] = (key ^ data, depth, bound, generation, score,
+                              move)
+        self.stores += 1
+
+    def stats(self):
+        """
+        Return:
+            dict: size, fill rate of the shared table, and probe/hit counts,
+            collisions and torn rows seen by this process
+        """
+        return {
+            "size": self.size,
+            "fill_rate": float(np.count_nonzero(self._table["key"])
+                               / self.size),
+            "probes": self.probes,
+            "hits": self.hits,
+            "stores": self.stores,
+            "collisions": self.collisions,
+            "torn": self.torn,
+        }
+
+    def close(self):
+        """
+        Detach this process from the shared memory.
+        """
+        if self._table_shm is not None:
+            del self._table, self._header
+            self._table_shm.close()
+            self._header_shm.close()
+
+    def unlink(self):
+        """
+        Free the shared memory; only called by the creating process.
+        """
+        self.close()
+        if self._owner and self._table_shm is not None:
+            self._table_shm.unlink()
+            self._header_shm.unlink()
+        self._table_shm = self._header_shm = None
@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from gym_xiangqi.agents.transposition import (
+    TranspositionTable, SharedTranspositionTable, EXACT, LOWER,
+)
+
+KEY = (1 << 61) + 12345
+
+
+@pytest.fixture(params=[TranspositionTable, SharedTranspositionTable])
+def table(request):
+    table = request.param(1000)
+    yield table
+    if isinstance(table, SharedTranspositionTable):
+        table.unlink()
+
+
+def _store_in_worker(table, key):
+    table.store(key, 7, 42, EXACT, 1234)
+    stats = table.stats()
+    table.close()
+    return stats
+
+
+def test_store_probe(table):
+    assert table.size == 1024
+    assert table.probe(KEY) is None
+
+    table.store(KEY, 3, -500, LOWER, None)
+    assert table.probe(KEY) == (3, -500, LOWER, None)
+    # Same slot, different position
+    assert table.probe(KEY + table.size) is None
+    assert table.stats()["collisions"] == 1
+
+    # The best move is kept when the new result has none
+    table.store(KEY, 4, 10, EXACT, 77)
+    table.store(KEY, 5, 11, EXACT, None)
+    assert table.probe(KEY) == (5, 11, EXACT, 77)
+
+
+def test_replacement(table):
+    table.new_search()
+    table.store(KEY, 6, 1, EXACT, 1)
+    table.store(KEY + table.size, 2, 2, EXACT, 2)
+    assert table.probe(KEY) == (6, 1, EXACT, 1)
+
+    # Entries of older searches are replaced
+    table.new_search()
+    table.store(KEY + table.size, 2, 2, EXACT, 2)
+    assert table.probe(KEY) is None
+    assert table.probe(KEY + table.size) == (2, 2, EXACT, 2)
+
+
+def test_shared_torn_entry():
+    table = SharedTranspositionTable(1024)
+    try:
+        table.store(KEY, 3, 100, EXACT, 5)
+        # Simulate another process overwriting only part of the row
+        table._table[KEY & 1023]["score"] = -7
+        assert table.probe(KEY) is None
+        assert table.stats()["torn"] == 1
+    finally:
+        table.unlink()
+
+
+def test_shared_between_processes():
+    table = SharedTranspositionTable(1024)
+    try:
+        with ProcessPoolExecutor(2) as pool:
+            stats = list(pool.map(_store_in_worker, [table] * 2,
+                                  [KEY, KEY + 1]))
+        assert [s["stores"] for s in stats] == [1, 1]
+        assert table.probe(KEY) == (7, 42, EXACT, 1234)
+        assert table.probe(KEY + 1) == (7, 42, EXACT, 1234)
+        assert table.stats()["fill_rate"] == 2 / 1024
+    finally:
+        table.unlink()
@@ -0,0 +1,13 @@
+"""
+Benchmarks of the environment and the rules engine.
+
+    python -m gym_xiangqi.benchmark --output results.json
+    python -m gym_xiangqi.benchmark --compare baseline.json --threshold 0.1
+
+The second command exits with a non-zero status if a scenario got slower
+than the baseline by more than the threshold.
+"""
+from gym_xiangqi.benchmark.scenarios import SCENARIOS  # NOQA
+from gym_xiangqi.benchmark.runner import (  # NOQA
+    run, compare, save_results, load_results,
+)
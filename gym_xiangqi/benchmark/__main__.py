@@ -0,0 +1,72 @@
+import argparse
+import sys
+
+from gym_xiangqi.benchmark.scenarios import SCENARIOS
+from gym_xiangqi.benchmark.runner import (
+    DEFAULT_REPEAT, DEFAULT_WARMUP, DEFAULT_THRESHOLD,
+    run, compare, save_results, load_results,
+)
+from gym_xiangqi.memory import ENV_MEMORY_BUDGET, memory_report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m gym_xiangqi.benchmark",
+        description="Benchmark the Xiangqi environment and compare the "
+                    "results against a baseline.")
+    parser.add_argument("-s", "--scenario", action="append",
+                        choices=list(SCENARIOS),
+                        help="scenario to run, may be repeated (default: "
+                             "all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="samples per scenario")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP,
+                        help="discarded samples per scenario")
+    parser.add_argument("--output", help="write the results to a JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="JSON results of a previous run to compare to")
+    parser.add_argument("--threshold", type=float,
+                        default=DEFAULT_THRESHOLD,
+                        help="tolerated relative slowdown (default: 0.1)")
+    parser.add_argument("--list", action="store_true",
+                        help="list the scenarios and exit")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="break down the memory held by an environment")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for scenario in SCENARIOS.values():
+            print(f"{scenario.name:<22} {scenario.unit:<9} "
+                  f"{scenario.description}")
+        return 0
+
+    results = run(args.scenario, args.repeat, args.warmup, log=print)
+    if args.memory_report:
+        report = memory_report()
+        results["memory"] = report
+        print()
+        for name, size in report.items():
+            if size is not None:
+                print(f"{name:<22} {size / 1024:>12.1f} KiB")
+        print(f"{'budget':<22} {ENV_MEMORY_BUDGET / 1024:>12.1f} KiB")
+    if args.output:
+        save_results(results, args.output)
+
+    if args.compare:
+        rows = compare(load_results(args.compare), results, args.threshold)
+        print()
+        regressions = 0
+        for name, before, after, change, regressed in rows:
+            status = "REGRESSION" if regressed else "ok"
+            print(f"{name:<22} {before:>12.1f} -> {after:>12.1f} "
+                  f"({change:+.1%}) {status}")
+            regressions += regressed
+        if regressions:
+            print(f"{regressions} scenario(s) regressed by more than "
+                  f"{args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Run benchmark scenarios, export their results as JSON and compare them
+against a saved baseline.
+"""
+import json
+import platform
+import statistics
+import time
+
+import numpy as np
+
+from gym_xiangqi.benchmark.scenarios import SCENARIOS, ScenarioSkipped
+
+DEFAULT_REPEAT = 10
+DEFAULT_WARMUP = 2
+
+# Relative slowdown of the median tolerated by compare()
+DEFAULT_THRESHOLD = 0.10
+
+
+def run(names=None, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP,
+        log=None):
+    """
+    Run benchmark scenarios.
+
+    Parameters:
+        names (list): names of the scenarios to run, all if None
+        repeat (int): number of samples collected per scenario
+        warmup (int): number of samples discarded before collecting, to
+            fill caches and let lazy initialization happen
+        log (callable): called with a line of text after every scenario
+    Return:
+        dict: JSON serializable results with a "meta" entry describing the
+        machine and a "results" entry with the statistics of every scenario
+    """
+    if names is None:
+        names = list(SCENARIOS)
+    results = {}
+    for name in names:
+        scenario = SCENARIOS[name]
+        try:
+            sample = scenario.setup()
+        except ScenarioSkipped as e:
+            results[name] = {"unit": scenario.unit, "skipped": str(e)}
+            if log is not None:
+                log(f"{name:<22} skipped: {e}")
+            continue
+
+        for _ in range(warmup):
+            sample()
+        samples = [sample() for _ in range(repeat)]
+        results[name] = {
+            "unit": scenario.unit,
+            "higher_is_better": scenario.higher_is_better,
+            "median": statistics.median(samples),
+            "mean": statistics.mean(samples),
+            "stdev": statistics.stdev(samples) if repeat > 1 else 0.,
+            "min": min(samples),
+            "max": max(samples),
+            "samples": samples,
+        }
+        if log is not None:
+            log(format_result(name, results[name]))
+
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "numpy": np.__version__,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+def format_result(name, result):
+    """
+    Format the statistics of a scenario as one line of text.
+    """
+    if "skipped" in result:
+        return f"{name:<22} skipped: {result['skipped']}"
+    return (f"{name:<22} {result['median']:>12.1f} {result['unit']:<9}"
+            f" (stdev {result['stdev']:.1f}, min {result['min']:.1f},"
+            f" max {result['max']:.1f})")
+
+
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the medians of two runs.
+
+    Parameters:
+        baseline (dict): results returned by `run` or `load_results`
+        current (dict): results to check against the baseline
+        threshold (float): tolerated relative slowdown, e.g. 0.1 for 10%
+    Return:
+        list: (name, baseline median, current median, relative change,
+        regressed) of every scenario measured in both runs, where a
+        positive change is an improvement
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or "skipped" in base or "skipped" in result:
+            continue
+        before, after = base["median"], result["median"]
+        if before == 0:
+            continue
+        change = (after - before) / before
+        if not result["higher_is_better"]:
+            change = -change
+        rows.append((name, before, after, change, change < -threshold))
+    return rows
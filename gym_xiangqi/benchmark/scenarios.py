@@ -0,0 +1,234 @@
+"""
+Benchmark scenarios. Each scenario builds its workload once and then
+returns one sample per call in its own unit: throughput (higher is better)
+or latency and memory (lower is better). Workloads are seeded so that every
+run measures the same games.
+"""
+import gc
+import random
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+from gym.vector import SyncVectorEnv
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.perft import perft
+from gym_xiangqi.playout import playout
+from gym_xiangqi.constants import INITIAL_BOARD, ALLY
+
+SEED = 20211005
+
+# Random moves played to reach the middlegame position of latency scenarios
+MIDDLEGAME_PLIES = 20
+
+VECTOR_ENVS = 8
+MEMORY_ENVS = 20
+PERFT_DEPTH = 3
+PLAYOUT_GAMES = 5
+
+
+class ScenarioSkipped(Exception):
+    """
+    Raised by a scenario that cannot run in the current environment,
+    e.g. rendering without a display.
+    """
+
+
+class Scenario:
+    """
+    A named benchmark measurement.
+
+    Attributes:
+        name (str): name used on the command line and in results
+        unit (str): unit of the samples
+        higher_is_better (bool): True for throughput, False for latency
+            and memory
+        description (str): what is measured
+    """
+
+    def __init__(self, name, unit, higher_is_better, description, setup):
+        self.name = name
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+        self.description = description
+        self._setup = setup
+
+    def setup(self):
+        """
+        Build the workload.
+
+        Return:
+            callable: function returning one sample per call
+        """
+        return self._setup()
+
+
+def _random_action(env, rng):
+    mask = env.ally_actions if env.turn == ALLY else env.enemy_actions
+    return int(rng.choice(np.flatnonzero(mask)))
+
+
+def _middlegame_env():
+    """
+    Environment after a few seeded random moves, so that latency is not
+    measured on the cached initial position.
+    """
+    rng = random.Random(SEED)
+    env = XiangQiEnv()
+    for _ in range(MIDDLEGAME_PLIES):
+        _, _, done, _ = env.step(_random_action(env, rng))
+        if done:
+            env.reset()
+    return env
+
+
+def _timed(run, number, per_second):
+    """
+    Turn a function doing `number` operations into a sampling function.
+    Garbage collection is disabled while timing, as in `timeit`.
+
+    Parameters:
+        run (callable): function doing `number` operations
+        number (int): operations per sample
+        per_second (bool): report operations per second instead of
+            microseconds per operation
+    """
+    def sample():
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        finally:
+            if enabled:
+                gc.enable()
+        if per_second:
+            return number / elapsed
+        return elapsed / number * 1e6
+    return sample
+
+
+def _random_playout():
+    number = 200
+    rng = random.Random(SEED)
+    env = XiangQiEnv()
+
+    def run():
+        for _ in range(number):
+            _, _, done, _ = env.step(_random_action(env, rng))
+            if done:
+                env.reset()
+    return _timed(run, number, per_second=True)
+
+
+def _get_possible_actions():
+    number = 200
+    env = _middlegame_env()
+    player = env.turn
+
+    def run():
+        for _ in range(number):
+            env.get_possible_actions(player)
+    return _timed(run, number, per_second=False)
+
+
+def _reset():
+    number = 200
+    env = XiangQiEnv()
+
+    def run():
+        for _ in range(number):
+            env.reset()
+    return _timed(run, number, per_second=False)
+
+
+def _vector_env():
+    batches = 25
+    rng = random.Random(SEED)
+    vector = SyncVectorEnv([XiangQiEnv] * VECTOR_ENVS)
+    vector.reset()
+
+    def run():
+        for _ in range(batches):
+            vector.step([_random_action(env, rng) for env in vector.envs])
+    return _timed(run, batches * VECTOR_ENVS, per_second=True)
+
+
+def _render():
+    number = 20
+    env = _middlegame_env()
+    try:
+        env.render()
+    except pygame.error as e:
+        raise ScenarioSkipped(f"rendering is not available: {e}")
+
+    def run():
+        for _ in range(number):
+            env.render()
+    return _timed(run, number, per_second=True)
+
+
+def _memory_per_env():
+    XiangQiEnv()    # build the shared initial position template first
+
+    def sample():
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            envs = [XiangQiEnv() for _ in range(MEMORY_ENVS)]
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del envs
+        return (after - before) / MEMORY_ENVS / 1024
+    return sample
+
+
+def _playout():
+    rng = random.Random(SEED)
+    board = np.array(INITIAL_BOARD)
+
+    def sample():
+        start = time.perf_counter()
+        plies = sum(playout(board, ALLY, rng)[1]
+                    for _ in range(PLAYOUT_GAMES))
+        return plies / (time.perf_counter() - start)
+    return sample
+
+
+def _perft():
+    board = np.array(INITIAL_BOARD)
+
+    def sample():
+        start = time.perf_counter()
+        nodes = perft(board, ALLY, PERFT_DEPTH)
+        return nodes / (time.perf_counter() - start)
+    return sample
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario("random-playout", "steps/s", True,
+             "env.step() with random legal actions, resetting finished "
+             "games", _random_playout),
+    Scenario("get-possible-actions", "us", False,
+             "env.get_possible_actions() in a middlegame position",
+             _get_possible_actions),
+    Scenario("reset", "us", False, "env.reset()", _reset),
+    Scenario("vector-env", "steps/s", True,
+             f"gym SyncVectorEnv of {VECTOR_ENVS} environments with random "
+             "legal actions", _vector_env),
+    Scenario("render", "frames/s", True,
+             "env.render() of a middlegame position", _render),
+    Scenario("memory-per-env", "KiB", False,
+             "Python memory allocated by XiangQiEnv()", _memory_per_env),
+    Scenario("playout", "plies/s", True,
+             f"{PLAYOUT_GAMES} random playouts from the initial position",
+             _playout),
+    Scenario("perft", "nodes/s", True,
+             f"perft({PERFT_DEPTH}) of the initial position", _perft),
+)}
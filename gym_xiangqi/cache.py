@@ -0,0 +1,167 @@
+"""
+Bounded LRU cache of legal move sets keyed by position hash.
+
+The same positions come up again and again in repetition-heavy self-play
+and in tree search. The cache maps a position key (see
+`rules.position_key`, which also encodes the side to move) to the compact
+array of legal action IDs and the check status of the side to move, so
+that move generation only runs once per distinct position.
+
+A single cache is shared by all environments of a process that opt in with
+`XiangQiEnv(legal_cache=True)`. A private `LegalMoveCache` instance can be
+passed instead to keep environments isolated.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from gym_xiangqi.rules import generate_actions, in_check
+
+DEFAULT_CACHE_SIZE = 65536
+
+# Position keys have 62 bits; this bit keeps entries of strict rules apart
+_STRICT_KEY = 1 << 62
+
+
+class LegalMoveCache:
+    """
+    Least recently used cache of (legal actions, check status) entries
+
+    Attributes:
+        capacity (int): maximum number of entries kept in the cache
+        hits (int): number of lookups served from the cache
+        misses (int): number of lookups that needed move generation
+        evictions (int): number of entries dropped to respect capacity
+    """
+
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE):
+        if capacity <= 0:
+            raise ValueError("cache capacity must be positive")
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def resize(self, capacity):
+        """
+        Change the capacity of the cache, evicting the least recently used
+        entries if the cache holds more than the new capacity.
+        """
+        if capacity <= 0:
+            raise ValueError("cache capacity must be positive")
+        self._capacity = capacity
+        self._evict()
+
+    def get(self, key):
+        """
+        Look up an entry without computing it on a miss.
+
+        Parameters:
+            key (int): position key including side to move
+        Return:
+            tuple: (legal actions, in check) or None if not cached
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, actions, check):
+        """
+        Store an entry, evicting the least recently used one when full.
+
+        Parameters:
+            key (int): position key including side to move
+            actions (np.array): sorted legal action IDs
+            check (bool): whether the side to move is in check
+        """
+        actions.flags.writeable = False     # entries are shared; keep intact
+        self._entries[key] = (actions, check)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def lookup(self, key, cells, side, strict=False):
+        """
+        Get the legal actions and check status of a position, generating
+        and caching them on a miss.
+
+        Parameters:
+            key (int): position key of cells with side to move
+            cells (list): flat board cells
+            side (int): side to move, ALLY (1) or ENEMY (-1)
+            strict (bool): generate actions with strict rules (see
+                `rules.generate_actions`)
+        Return:
+            tuple: (sorted legal action IDs as np.array, in check)
+        """
+        if strict:
+            key ^= _STRICT_KEY
+        entry = self.get(key)
+        if entry is None:
+            actions = generate_actions(cells, side, strict)
+            actions.sort()
+            actions = np.array(actions, dtype=np.int64)
+            entry = (actions, in_check(cells, side))
+            self.put(key, *entry)
+        return entry
+
+    def clear(self):
+        """
+        Drop every entry and reset the statistics.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Return:
+            dict: size, capacity, hits, misses, evictions and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "capacity": self._capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self):
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+_shared_cache = None
+
+
+def get_shared_cache():
+    """
+    Get the legal move cache shared by all environments of this process,
+    creating it with DEFAULT_CACHE_SIZE entries on first use. Its capacity
+    can be changed with `get_shared_cache().resize(capacity)`.
+
+    Return:
+        LegalMoveCache: the process-wide cache
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = LegalMoveCache()
+    return _shared_cache
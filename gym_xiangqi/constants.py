@@ -30,6 +30,7 @@ PIECE_POINTS = [
 ILLEGAL_MOVE = -10.
 WIN = PIECE_POINTS[1]
 LOSE = -PIECE_POINTS[1]
+DRAW = 0.
 
 """ PIECE """
 ALLY = 1
@@ -0,0 +1,316 @@
+"""
+Supervised learning datasets: convert game records into fixed-size NumPy
+arrays stored as memory-mapped .npy files, and read shuffled minibatches
+from them without loading the whole set into memory.
+
+`build_dataset` reads a game record file written by
+`gym_xiangqi.records.GameRecordWriter` and stores one row per position:
+
+- observations: the board as int8 piece IDs (N, 10, 9), or as uint8 planes
+  (N, 14, 10, 9) with one plane per piece kind of the side to move and then
+  of its opponent
+- actions: the move played as a compact move code `start * 90 + end`
+  (uint16, see `records.compact_move`)
+- legal: the legal moves as bits over the 8100 compact move codes, packed
+  (N, 1013) uint8, or as a (N, 8100) bool mask
+- outcomes: the result of the game for the side to move (int8, 1 win,
+  -1 loss, 0 draw or unknown)
+- sides: the side to move (int8)
+
+With `canonical` (default), positions with ENEMY to move are rotated with
+`symmetry.ROTATE` so that the side to move is always at the bottom with
+positive IDs, and actions and legal moves are rotated with them.
+
+Games are converted in chunks, in parallel on a process pool, each chunk
+writing its own rows of the arrays. Finished chunks are recorded in
+"chunks.npy", so an interrupted build resumes where it stopped when
+called again with the same options.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from gym_xiangqi.records import GameRecordReader
+from gym_xiangqi.rules import PIECE_KIND, generate_actions, make_move
+from gym_xiangqi.symmetry import ROTATE, transform_board, transform_actions
+from gym_xiangqi.constants import (
+    BOARD_ROWS, BOARD_COLS, TOTAL_POS, PIECE_CNT, ENEMY,
+)
+
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_GAMES = 1000
+DEFAULT_BATCH_SIZE = 256
+
+COMPACT_ACTIONS = TOTAL_POS * TOTAL_POS
+PIECE_KINDS = 7
+PLANES = 2 * PIECE_KINDS
+
+_META = "meta.json"
+_CHUNKS = "chunks.npy"
+
+# Plane of every signed piece ID, offset by PIECE_CNT; -1 for empty squares
+_PLANE_OF = np.array(
+    [PIECE_KIND[pid] - 1 if pid > 0
+     else PIECE_KINDS + PIECE_KIND[-pid] - 1 if pid < 0 else -1
+     for pid in range(-PIECE_CNT, PIECE_CNT + 1)], dtype=np.int8)
+
+
+def board_planes(boards):
+    """
+    Turn boards into one-hot planes.
+
+    Parameters:
+        boards (np.array): (..., 10, 9) boards of signed piece IDs
+    Return:
+        np.array: (..., 14, 10, 9) uint8 planes; planes 0-6 hold the
+        positive pieces by kind (general, advisor, elephant, horse,
+        chariot, cannon, soldier) and planes 7-13 the negative pieces
+    """
+    boards = np.asarray(boards)
+    planes = _PLANE_OF[boards + PIECE_CNT]
+    return (planes[..., None, :, :]
+            == np.arange(PLANES)[:, None, None]).astype(np.uint8)
+
+
+def _array_specs(positions, planes, packed):
+    if planes:
+        observations = ((positions, PLANES, BOARD_ROWS, BOARD_COLS),
+                        np.uint8)
+    else:
+        observations = ((positions, BOARD_ROWS, BOARD_COLS), np.int8)
+    if packed:
+        legal = ((positions, (COMPACT_ACTIONS + 7) // 8), np.uint8)
+    else:
+        legal = ((positions, COMPACT_ACTIONS), np.bool_)
+    return {
+        "observations": observations,
+        "actions": ((positions, ), np.uint16),
+        "legal": legal,
+        "outcomes": ((positions, ), np.int8),
+        "sides": ((positions, ), np.int8),
+    }
+
+
+def _open_arrays(output, mode):
+    meta = _read_meta(output)
+    return {name: np.load(os.path.join(output, name + ".npy"),
+                          mmap_mode=mode)
+            for name in meta["arrays"]}
+
+
+def _read_meta(output):
+    with open(os.path.join(output, _META)) as f:
+        return json.load(f)
+
+
+def _convert_chunk(source, output, games, start, options):
+    """
+    Convert a range of games into the rows starting at `start`.
+    """
+    arrays = _open_arrays(output, "r+")
+    row = start
+    with GameRecordReader(source) as reader:
+        for game in range(*games):
+            outcome = reader.outcome(game)
+            board, side = reader.start(game)
+            cells = board.ravel().tolist()
+            for code in reader.moves(game).tolist():
+                _write_row(arrays, row, cells, side, code, outcome, options)
+                make_move(cells, code)
+                side = -side
+                row += 1
+    for array in arrays.values():
+        array.flush()
+    return row - start
+
+
+def _write_row(arrays, row, cells, side, code, outcome, options):
+    board = np.array(cells, dtype=np.int8).reshape(BOARD_ROWS, BOARD_COLS)
+    legal = np.array(generate_actions(cells, side), dtype=np.int64)
+    action = code
+    if options["canonical"] and side == ENEMY:
+        board = transform_board(board, ROTATE)
+        legal = transform_actions(legal, ROTATE)
+        action = int(transform_actions(code, ROTATE))
+    legal %= COMPACT_ACTIONS
+
+    if options["planes"]:
+        arrays["observations"][row] = board_planes(board)
+    else:
+        arrays["observations"][row] = board
+    arrays["actions"][row] = action % COMPACT_ACTIONS
+    mask = np.zeros(COMPACT_ACTIONS, dtype=np.bool_)
+    mask[legal] = True
+    arrays["legal"][row] = np.packbits(mask) if options["packed"] else mask
+    arrays["outcomes"][row] = outcome * side
+    arrays["sides"][row] = side
+
+
+def build_dataset(source, output, workers=None,
+                  chunk_games=DEFAULT_CHUNK_GAMES, planes=False,
+                  packed=True, canonical=True, log=None):
+    """
+    Convert a game record file into memory-mapped training arrays, or
+    resume an interrupted conversion.
+
+    Parameters:
+        source (str): game record file written by GameRecordWriter
+        output (str): directory of the arrays, created if needed
+        workers (int): number of processes, one per CPU if None; 1 converts
+            in this process
+        chunk_games (int): games converted per task
+        planes (bool): store observations as one-hot planes instead of
+            piece IDs
+        packed (bool): store legal moves as packed bits instead of a bool
+            mask
+        canonical (bool): present every position from the side to move
+        log (callable): called with a line of text after every chunk
+    Return:
+        dict: the dataset's metadata, with the number of "positions" and
+        "games"
+    """
+    options = {"planes": planes, "packed": packed, "canonical": canonical,
+               "chunk_games": chunk_games}
+    with GameRecordReader(source) as reader:
+        plies = np.array([len(reader.moves(game))
+                          for game in range(len(reader))], dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(plies)])
+    chunks = [(first, min(first + chunk_games, len(plies)))
+              for first in range(0, len(plies), chunk_games)]
+
+    os.makedirs(output, exist_ok=True)
+    meta_path = os.path.join(output, _META)
+    if os.path.exists(meta_path):
+        meta = _read_meta(output)
+        if (meta["options"] != options
+                or meta["positions"] != int(starts[-1])
+                or meta["games"] != len(plies)):
+            raise ValueError(f"{output} holds a dataset built from other "
+                             "games or with other options")
+        done = np.load(os.path.join(output, _CHUNKS), mmap_mode="r+")
+    else:
+        specs = _array_specs(int(starts[-1]), planes, packed)
+        for name, (shape, dtype) in specs.items():
+            np.lib.format.open_memmap(os.path.join(output, name + ".npy"),
+                                      "w+", dtype, shape)
+        done = np.lib.format.open_memmap(os.path.join(output, _CHUNKS),
+                                         "w+", np.uint8, (len(chunks), ))
+        meta = {"version": FORMAT_VERSION, "options": options,
+                "positions": int(starts[-1]), "games": len(plies),
+                "arrays": list(specs)}
+        # The metadata is written last so that a partial setup is redone
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    source = os.path.abspath(source)
+    todo = [i for i in range(len(chunks)) if not done[i]]
+
+    def finished(i):
+        done[i] = 1
+        done.flush()
+        if log is not None:
+            log(f"chunk {i + 1}/{len(chunks)}: games {chunks[i][0]} to "
+                f"{chunks[i][1]}")
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        for i in todo:
+            _convert_chunk(source, output, chunks[i],
+                           int(starts[chunks[i][0]]), options)
+            finished(i)
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {executor.submit(_convert_chunk, source, output,
+                                       chunks[i], int(starts[chunks[i][0]]),
+                                       options): i
+                       for i in todo}
+            for future in as_completed(futures):
+                future.result()
+                finished(futures[future])
+    return meta
+
+
+def load_dataset(path):
+    """
+    Open the arrays of a complete dataset as read-only memory maps.
+
+    Parameters:
+        path (str): directory written by `build_dataset`
+    Return:
+        dict: arrays by name ("observations", "actions", "legal",
+        "outcomes" and "sides")
+    """
+    done = np.load(os.path.join(path, _CHUNKS))
+    if not done.all():
+        raise ValueError(f"dataset {path} is incomplete; run build_dataset "
+                         "again to resume it")
+    return _open_arrays(path, "r")
+
+
+def iterate_minibatches(path, batch_size=DEFAULT_BATCH_SIZE, shuffle=True,
+                        seed=None, drop_last=False, unpack=True):
+    """
+    Iterate once over a dataset in minibatches. Only the rows of the
+    current batch are read from the memory maps, in file order within the
+    batch.
+
+    Parameters:
+        path (str): directory written by `build_dataset`
+        batch_size (int): rows per batch
+        shuffle (bool): visit the rows in a random order
+        seed (int): seed of the shuffling
+        drop_last (bool): skip the last batch if it is smaller
+        unpack (bool): return packed legal moves as (B, 8100) bool masks
+    Return:
+        generator: dicts of arrays with the names of `load_dataset`
+    """
+    arrays = load_dataset(path)
+    packed = _read_meta(path)["options"]["packed"]
+    size = len(arrays["actions"])
+    order = (np.random.default_rng(seed).permutation(size) if shuffle
+             else np.arange(size))
+    for first in range(0, size, batch_size):
+        rows = order[first:first + batch_size]
+        if drop_last and len(rows) < batch_size:
+            break
+        if shuffle:
+            rows = np.sort(rows)
+        batch = {name: array[rows] for name, array in arrays.items()}
+        if packed and unpack:
+            batch["legal"] = np.unpackbits(
+                batch["legal"], axis=1, count=COMPACT_ACTIONS).astype(bool)
+        yield batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert a game record file into memory-mapped training "
+                    "arrays, resuming an interrupted conversion.")
+    parser.add_argument("records", help="game record file")
+    parser.add_argument("output", help="directory of the arrays")
+    parser.add_argument("--workers", type=int,
+                        help="converting processes (default: one per CPU)")
+    parser.add_argument("--chunk-games", type=int,
+                        default=DEFAULT_CHUNK_GAMES)
+    parser.add_argument("--planes", action="store_true",
+                        help="store one-hot planes instead of piece IDs")
+    parser.add_argument("--unpacked", action="store_true",
+                        help="store legal moves as bool masks")
+    parser.add_argument("--absolute", action="store_true",
+                        help="keep ENEMY to move positions unrotated")
+    args = parser.parse_args(argv)
+
+    meta = build_dataset(args.records, args.output, args.workers,
+                         args.chunk_games, args.planes, not args.unpacked,
+                         not args.absolute, log=print)
+    print(f"positions: {meta['positions']} from {meta['games']} game(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,19 @@ from gym.utils import seeding
 import numpy as np
 
 from gym_xiangqi.xiangqi_game import XiangQiGame
+from gym_xiangqi.cache import LegalMoveCache, get_shared_cache
+from gym_xiangqi.evaluation import material_pst, mobility, update_eval
+from gym_xiangqi.fen import from_fen, to_fen as board_to_fen
+from gym_xiangqi.profiling import PhaseProfiler
+from gym_xiangqi.rules import (
+    ZOBRIST_SIDE,
+    generate_actions, has_legal_move, legal_actions,
+    position_key, static_exchange, update_key
+)
+from gym_xiangqi.symmetry import (
+    ROTATE,
+    transform_board, transform_actions, transform_action_mask
+)
 from gym_xiangqi.utils import (
     action_space_to_move,
     move_to_action_space,
@@ -17,12 +30,52 @@ from gym_xiangqi.constants import (
     BOARD_ROWS, BOARD_COLS,
     TOTAL_POS, PIECE_CNT,
     RED, BLACK, ALIVE, DEAD,
-    ILLEGAL_MOVE, PIECE_POINTS, LOSE,
+    ILLEGAL_MOVE, PIECE_POINTS, WIN, LOSE, DRAW,
     ALLY, ENEMY, EMPTY, GENERAL, SOLDIER_1, SOLDIER_5,
     MAX_PERPETUAL_JIANG,
     RIVER_LOW, RIVER_HIGH,
 )
 
+# Methods of XiangQiEnv timed when profiling is enabled, by phase name
+PROFILED_PHASES = {
+    "step": "step",
+    "validate": "_validate",
+    "check_jiang": "check_jiang",
+    "move": "_move",
+    "get_possible_actions": "get_possible_actions",
+    "has_legal_move": "has_legal_move",
+    "adjudicate": "_adjudicate",
+    "rehash": "_rehash",
+}
+
+
+class _InitialPosition:
+    """
+    Precomputed template of the initial position shared by all environments
+    so that reset() only copies the board, restores piece objects and reuses
+    the cached legal moves, position keys, evaluation and state hash.
+    """
+
+    def __init__(self):
+        self.board = np.array(INITIAL_BOARD)
+        self.board.flags.writeable = False
+        self.state_hash = hash(str(self.board))
+
+        cells = self.board.ravel().tolist()
+        self.pieces = [(piece_id, r, c)
+                       for (r, c), piece_id in np.ndenumerate(self.board)
+                       if piece_id != EMPTY]
+
+        self.eval = material_pst(cells)
+        self.legal = {}
+        self.key = {}
+        for side in (ALLY, ENEMY):
+            for strict in (False, True):
+                legal = legal_actions(self.board, side, strict)
+                legal.flags.writeable = False
+                self.legal[side, strict] = legal
+            self.key[side] = position_key(cells, side)
+
 
 class XiangQiEnv(gym.Env):
     """
@@ -37,7 +90,41 @@ class XiangQiEnv(gym.Env):
     Reference our GitHub Wiki page for initial board illustration.
 
     Episode Termination:
-    Either the red or black general is captured by the opponent.
+    Either the red or black general is captured by the opponent, or the
+    player to move has no move that keeps its general safe (checkmate or
+    stalemate), which is a loss for that player. Optionally, the game is
+    also adjudicated when a position repeats too often or too many plies
+    pass without capture.
+
+    Parameters:
+        ally_color (int): color of the ally side, RED (0) or BLACK (1)
+
+        legal_cache (bool or LegalMoveCache):
+            Opt-in cache of legal moves keyed by position hash. True uses
+            the cache shared by all environments of the process (see
+            `gym_xiangqi/cache.py`), a LegalMoveCache instance uses that
+            cache, and False (default) disables caching.
+
+        strict_rules (bool):
+            Forbid moves that leave the player's own general attacked.
+            By default (False) such moves are legal and the game goes on
+            until a general is actually captured.
+
+        repetition_limit (int):
+            End the game when the same position with the same player to
+            move occurs this many times (e.g. 3). If one player gave check
+            with every move since the first occurrence, that player loses
+            (perpetual check); otherwise the game is a draw. None (default)
+            disables the rule.
+
+        no_capture_limit (int):
+            End the game as a draw after this many consecutive plies
+            without capture (e.g. 120). None (default) disables the rule.
+
+        profile (bool):
+            Record the time spent in each phase of step() (see
+            `enable_profiling` and `stats`). Disabled by default, in which
+            case it costs nothing.
 
     Attributes:
         observation_space (gym.spaces.Box(10, 9)):
@@ -108,6 +195,17 @@ class XiangQiEnv(gym.Env):
             Values of the array are 0 and 1 indicating legal and illegal
             actions respectively.
 
+        canonical_state (np.array):
+            Current board state seen from the player whose turn it is: the
+            current player's pieces are positive integers placed at the
+            bottom of the board. On enemy's turn this is the state rotated
+            by 180 degrees with ally and enemy swapped.
+
+        canonical_actions (np.array):
+            Legal action mask of the current player expressed in the frame
+            of canonical_state. Actions chosen from this mask have to be
+            converted with canonical_to_action() before calling step().
+
         ally_piece (list):
             List of all ally piece objects
 
@@ -127,7 +225,12 @@ class XiangQiEnv(gym.Env):
         Soldier, Soldier, Soldier, Soldier, Soldier
     ]
 
-    def __init__(self, ally_color=RED):
+    # Initial position template, built once by the first reset()
+    _initial = None
+
+    def __init__(self, ally_color=RED, legal_cache=False, strict_rules=False,
+                 repetition_limit=None, no_capture_limit=None,
+                 profile=False):
         self._ally_color = ally_color
         if ally_color == RED:
             self._enemy_color = BLACK
@@ -156,6 +259,23 @@ class XiangQiEnv(gym.Env):
         self._state = None
         self._state_hash = None
 
+        # Zobrist key of current board state with current turn to move
+        self._key = None
+
+        # Material and piece-square score from the ally's point of view
+        self._eval = 0.
+
+        # Forbid moves exposing the own general
+        self._strict_rules = strict_rules
+
+        # Optional legal move cache shared between environments
+        if legal_cache is True:
+            self._legal_cache = get_shared_cache()
+        elif isinstance(legal_cache, LegalMoveCache):
+            self._legal_cache = legal_cache
+        else:
+            self._legal_cache = None
+
         # Instantiate piece objects
         self._ally_piece = [None for _ in range(PIECE_CNT + 1)]
         self._enemy_piece = [None for _ in range(PIECE_CNT + 1)]
@@ -165,10 +285,35 @@ class XiangQiEnv(gym.Env):
         self._ally_actions = np.zeros((n, ))
         self._enemy_actions = np.zeros((n, ))
 
+        # Legal actions as compact arrays of action IDs
+        self._ally_legal = None
+        self._enemy_legal = None
+
+        # Current player's state and actions seen from the bottom side
+        self._canonical = None
+
         # History of consecutive jiangs (will be used to ban perpetual check)
         self._ally_jiang_history = None
         self._enemy_jiang_history = None
 
+        # Draw adjudication: occurrences of positions since the last capture
+        # as {key: [count, first ply]}, plies played, plies since the last
+        # capture, and last ply each player moved without giving check
+        self._repetition_limit = repetition_limit
+        self._no_capture_limit = no_capture_limit
+        self._positions = None
+        self._ply = 0
+        self._no_capture_plies = 0
+        self._last_quiet = None
+
+        # Plies played before the start position, as given by a FEN
+        self._start_plies = 0
+
+        # Per-phase timings of step(), None when profiling is disabled
+        self._profiler = None
+        if profile:
+            self.enable_profiling()
+
         # Initialize PyGame module
         self._game = XiangQiGame()
 
@@ -210,19 +355,16 @@ class XiangQiEnv(gym.Env):
 
             Soldier: 1.0 (2.0 if it has crossed the river)
 
+            Leaving the opponent without a legal move (checkmate or
+            stalemate) adds 100.0 as a win.
+
             done (bool): whether the episode has ended, in which case further
             step() calls will return undefined results
 
             info (dict): contains auxiliary diagnostic information (helpful for
             debugging, and sometimes learning)
         """
-        # Validate action input
-        error_msg = "%r (%s) invalid action" % (action, type(action))
-        assert self.action_space.contains(action), error_msg
-
-        # Validate that the environment wasn't changed between steps
-        assert hash(str(self._state)) == self._state_hash, \
-            "Error! Game state changed illegally!"
+        self._validate(action)
 
         # Warn the user for calling step() when current game has finished
         if self._done:
@@ -255,18 +397,10 @@ class XiangQiEnv(gym.Env):
         pre_jiang_actions = self.check_jiang()
 
         # Move the piece if legal move is given
-        piece, start, end = action_space_to_move(action)
-        pieces[piece].move(*end)
-
-        # Update observation space
-        self._state[start[0]][start[1]] = EMPTY
-        rm_piece_id = self._state[end[0]][end[1]]
-        self._state[end[0]][end[1]] = piece * self._turn
-
-        if rm_piece_id < 0:
-            self._enemy_piece[-rm_piece_id].state = DEAD
-        elif rm_piece_id > 0:
-            self._ally_piece[rm_piece_id].state = DEAD
+        rm_piece_id = self._move(action, pieces)
+        # Counted before any game-over check so that to_fen() numbers the
+        # final position correctly
+        self._ply += 1
 
         # Reward based on removed piece
         reward += PIECE_POINTS[abs(rm_piece_id)]
@@ -307,38 +441,189 @@ class XiangQiEnv(gym.Env):
 
         # Self-play: agent switches turn between ally and enemy side
         self._turn *= -1     # ALLY (1) to ENEMY (-1) and vice versa
+        self._key ^= ZOBRIST_SIDE
         self.get_possible_actions(self._turn)
 
-        # Update state hash.
-        self._state_hash = hash(str(self._state))
+        # The next player loses right away if it cannot escape
+        if not self._done and not self.has_legal_move(self._turn):
+            self._done = True
+            reward += WIN
+
+        # Repetition and no-capture draws
+        if not self._done:
+            outcome = self._adjudicate(rm_piece_id != EMPTY,
+                                       bool(post_jiang_actions))
+            if outcome is not None:
+                self._done = True
+                reward = outcome
+
+        self._rehash()
 
         return np.array(self._state), reward, self._done, {}
 
-    def reset(self):
+    def enable_profiling(self, enabled=True):
+        """
+        Turn the per-phase timing of step() on or off. The phases are the
+        methods listed in PROFILED_PHASES; while enabled they are replaced
+        on this instance by timed wrappers, so a disabled environment runs
+        the plain methods without any overhead. Timings are inclusive:
+        check_jiang() also counts the get_possible_actions() call it makes.
+
+        Parameters:
+            enabled (bool): True to record timings, False to stop
+        """
+        if enabled and self._profiler is None:
+            self._profiler = PhaseProfiler()
+            for phase, name in PROFILED_PHASES.items():
+                setattr(self, name,
+                        self._profiler.wrap(phase, getattr(self, name)))
+        elif not enabled and self._profiler is not None:
+            for name in PROFILED_PHASES.values():
+                del self.__dict__[name]
+            self._profiler = None
+
+    def stats(self, clear=False):
+        """
+        Timings of the phases of step() recorded since profiling was
+        enabled, in ns measured with time.perf_counter_ns
+
+        Parameters:
+            clear (bool): reset the counters after reading them
+        Return:
+            dict: for every phase called at least once, its call count,
+            total, mean, min and max time, approximate p50 and p99, and a
+            histogram with power of two buckets (see
+            `gym_xiangqi/profiling.py`); empty if profiling is disabled
+        """
+        if self._profiler is None:
+            return {}
+        result = self._profiler.stats()
+        if clear:
+            self._profiler.clear()
+        return result
+
+    def _validate(self, action):
+        """
+        Check the action and that the board was not modified from outside
+        since the last step.
+        """
+        error_msg = "%r (%s) invalid action" % (action, type(action))
+        assert self.action_space.contains(action), error_msg
+
+        # Validate that the environment wasn't changed between steps
+        assert hash(str(self._state)) == self._state_hash, \
+            "Error! Game state changed illegally!"
+
+    def _move(self, action, pieces):
+        """
+        Move a piece of the current player on the board and the piece
+        objects, updating the position key and evaluation.
+
+        Return:
+            int: signed ID of the captured piece (EMPTY if none)
+        """
+        piece, start, end = action_space_to_move(action)
+        pieces[piece].move(*end)
+
+        # Update observation space
+        self._state[start[0]][start[1]] = EMPTY
+        rm_piece_id = self._state[end[0]][end[1]]
+        self._state[end[0]][end[1]] = piece * self._turn
+        self._canonical = None
+
+        # Update position key; side to move changes at the end of the turn
+        self._key = update_key(self._key, action, piece * self._turn,
+                               int(rm_piece_id)) ^ ZOBRIST_SIDE
+        self._eval = update_eval(self._eval, action, piece * self._turn,
+                                 int(rm_piece_id))
+
+        if rm_piece_id < 0:
+            self._enemy_piece[-rm_piece_id].state = DEAD
+        elif rm_piece_id > 0:
+            self._ally_piece[rm_piece_id].state = DEAD
+
+        return rm_piece_id
+
+    def _rehash(self):
+        # Update state hash.
+        self._state_hash = hash(str(self._state))
+
+    def reset(self, options=None):
         """
-        Reset all environment components to initial state
+        Reset all environment components to initial state, or to the
+        position given by a FEN
 
+        Parameters:
+            options (dict): {"fen": FEN} starts the game from that position,
+                including the side to move and the move counters (see
+                `gym_xiangqi/fen.py`)
         Return:
             np.array: the initial state
         """
+        if XiangQiEnv._initial is None:
+            XiangQiEnv._initial = _InitialPosition()
+        initial = XiangQiEnv._initial
+
+        fen = (options or {}).get("fen")
+        red = ALLY if self._ally_color == RED else ENEMY
+        if fen is None:
+            board, turn, halfmove, fullmove = initial.board, red, 0, 1
+        else:
+            board, turn, halfmove, fullmove = from_fen(fen, self._ally_color)
+
         self._done = False
-        self._state = np.array(INITIAL_BOARD)
-        self.init_pieces()
+
+        # Restore board and pieces in place once they have been created
+        if self._state is None or self._ally_piece[GENERAL] is None:
+            self._state = np.array(board)
+            self.init_pieces()
+        else:
+            np.copyto(self._state, board)
+            if fen is None:
+                self.restore_pieces()
+        if fen is not None:
+            self.place_pieces()
 
         self._ally_jiang_history = {}
         self._enemy_jiang_history = {}
-
-        if self._ally_color == RED:
-            self._turn = ALLY
+        self._turn = turn
+
+        if fen is None:
+            # Reuse legal moves, position key and state hash of the template
+            self._key = initial.key[turn]
+            self._eval = initial.eval
+            self.set_possible_actions(
+                turn, initial.legal[turn, self._strict_rules])
+            self._state_hash = initial.state_hash
         else:
-            self._turn = ENEMY
-
-        self.get_possible_actions(self._turn)
+            cells = self._state.ravel().tolist()
+            self._key = position_key(cells, turn)
+            self._eval = material_pst(cells)
+            self.get_possible_actions(turn)
+            self._state_hash = hash(str(self._state))
+
+        self._positions = {self._key: [1, 0]}
+        self._ply = 0
+        self._no_capture_plies = halfmove
+        self._last_quiet = {ALLY: 0, ENEMY: 0}
+        self._start_plies = 2 * (fullmove - 1) + (turn != red)
+        self._canonical = None
         self._game.set_pieces(self._ally_piece, self._enemy_piece)
-        self._state_hash = hash(str(self._state))
 
         return np.array(self._state)
 
+    def to_fen(self):
+        """
+        Describe the current position as a FEN, with red as the side in
+        upper case whatever the ally's color
+
+        Return:
+            str: FEN of the position, readable by reset(options={"fen": ...})
+        """
+        return board_to_fen(self._state, self._turn, self._ally_color,
+                            self._no_capture_plies,
+                            (self._start_plies + self._ply) // 2 + 1)
+
     def render(self, mode='human'):
         """
         Render current game state with PyGame
@@ -433,6 +718,40 @@ class XiangQiEnv(gym.Env):
                 elif piece_id > 0:
                     self._ally_piece[piece_id] = init(self._ally_color, r, c)
 
+    def restore_pieces(self):
+        """
+        Move all existing ally and enemy pieces back to their initial
+        position and state without creating new piece objects
+        """
+        for piece_id, r, c in XiangQiEnv._initial.pieces:
+            if piece_id < 0:
+                piece = self._enemy_piece[-piece_id]
+            else:
+                piece = self._ally_piece[piece_id]
+            piece.row = r
+            piece.col = c
+            piece.state = ALIVE
+            piece.legal_moves = None
+
+    def place_pieces(self):
+        """
+        Move all ally and enemy pieces to their squares on the current
+        board; pieces missing from the board are marked as dead
+        """
+        for piece in self._ally_piece[1:] + self._enemy_piece[1:]:
+            piece.state = DEAD
+            piece.legal_moves = None
+        for (r, c), piece_id in np.ndenumerate(self._state):
+            if piece_id < 0:
+                piece = self._enemy_piece[-piece_id]
+            elif piece_id > 0:
+                piece = self._ally_piece[piece_id]
+            else:
+                continue
+            piece.row = r
+            piece.col = c
+            piece.state = ALIVE
+
     def get_possible_actions(self, player):
         """
         Searches all valid actions each given player's piece can perform
@@ -440,23 +759,150 @@ class XiangQiEnv(gym.Env):
         Parameters:
             player (int): -1 for ENEMY and 1 for ALLY
         """
-        # Current piece set changes depending on whose turn it is
+        cells = self._state.ravel().tolist()
+
+        # Generate compact legal action IDs, from cache if enabled
+        if self._legal_cache is not None:
+            key = self._key
+            if player != self._turn:
+                key ^= ZOBRIST_SIDE
+            legal, _ = self._legal_cache.lookup(key, cells, player,
+                                                self._strict_rules)
+        else:
+            legal = generate_actions(cells, player, self._strict_rules)
+            legal.sort()
+            legal = np.array(legal, dtype=np.int64)
+
+        self.set_possible_actions(player, legal)
+
+    def set_possible_actions(self, player, legal):
+        """
+        Store the legal actions of a player and mark them in the player's
+        possible actions array
+
+        Parameters:
+            player (int): -1 for ENEMY and 1 for ALLY
+            legal (np.array): sorted legal action IDs
+        """
+        # Possible actions set changes depending on whose turn it is
         if player == ALLY:
-            piece_set = self._ally_piece
             possible_actions = self._ally_actions
+            self._ally_legal = legal
         else:
-            piece_set = self._enemy_piece
             possible_actions = self._enemy_actions
+            self._enemy_legal = legal
 
-        # Clear previous turn's possible actions
+        # Clear previous turn's possible actions and mark the new ones
         possible_actions.fill(0)
+        possible_actions[legal] = 1
+
+    def _adjudicate(self, capture, check):
+        """
+        Record the position reached by the last move and apply the
+        repetition and no-capture rules in constant time. Must be called
+        once per move, after the turn has passed to the next player and
+        the move has been counted in `_ply`.
+
+        Parameters:
+            capture (bool): whether the last move captured a piece
+            check (bool): whether the last move gave check
+        Return:
+            float: reward of the last move if the game ends (DRAW, or WIN
+            or LOSE under the perpetual check rule), otherwise None
+        """
+        mover = -self._turn
+        if not check:
+            self._last_quiet[mover] = self._ply
+
+        if capture:
+            # Earlier positions can never occur again
+            self._no_capture_plies = 0
+            self._positions = {self._key: [1, self._ply]}
+            return None
+
+        self._no_capture_plies += 1
+        entry = self._positions.get(self._key)
+        if entry is None:
+            self._positions[self._key] = [1, self._ply]
+        else:
+            entry[0] += 1
+            if (self._repetition_limit is not None
+                    and entry[0] >= self._repetition_limit):
+                # A player checking with every move since the position
+                # first occurred loses; otherwise the game is drawn
+                first = entry[1]
+                mover_checks = self._last_quiet[mover] <= first
+                other_checks = self._last_quiet[self._turn] <= first
+                if mover_checks and not other_checks:
+                    return LOSE
+                if other_checks and not mover_checks:
+                    return WIN
+                return DRAW
+
+        if (self._no_capture_limit is not None
+                and self._no_capture_plies >= self._no_capture_limit):
+            return DRAW
+        return None
+
+    def has_legal_move(self, player):
+        """
+        Check if a player has a move that keeps its general safe, using
+        the strict rules whatever the environment's rules are
 
-        # Get possible moves for every piece in the piece set
-        for pid, piece_obj in enumerate(piece_set[1:], 1):
-            if piece_obj.state == ALIVE:
-                piece_obj.get_actions(pid * self._turn,
-                                      self._state,
-                                      possible_actions)
+        Parameters:
+            player (int): -1 for ENEMY and 1 for ALLY
+        Return:
+            bool: False if the player is checkmated or stalemated
+        """
+        legal = self._ally_legal if player == ALLY else self._enemy_legal
+        if self._strict_rules:
+            return len(legal) > 0
+        return has_legal_move(self._state.ravel().tolist(), player,
+                              legal.tolist())
+
+    def evaluate(self, player=ALLY, use_mobility=True):
+        """
+        Static evaluation of the current position with material,
+        piece-square tables and mobility (see gym_xiangqi.evaluation).
+        Material and piece-square terms are kept up to date in step().
+
+        Parameters:
+            player (int): point of view of the score, -1 for ENEMY and 1
+                for ALLY
+            use_mobility (bool): include the mobility term, which reuses
+                the legal moves of the player to move
+        Return:
+            float: score in PIECE_POINTS units, positive when `player` is
+            ahead
+        """
+        score = self._eval
+        if use_mobility:
+            # The opponent's moves are counted under the same rules as the
+            # stored moves of the player to move
+            cells = self._state.ravel().tolist()
+            opponent_moves = len(generate_actions(cells, -self._turn,
+                                                  self._strict_rules))
+            if self._turn == ALLY:
+                score += mobility(cells, len(self._ally_legal),
+                                  opponent_moves)
+            else:
+                score += mobility(cells, opponent_moves,
+                                  len(self._enemy_legal))
+        return score * player
+
+    def see(self, action):
+        """
+        Static exchange evaluation of a move in the current position: net
+        points won by the moving player if both players keep capturing on
+        the destination square (see gym_xiangqi.rules.static_exchange).
+        The board is not modified.
+
+        Parameters:
+            action (int): a valid action in Xiangqi action space
+        Return:
+            float: points won (negative if lost) by the moving player
+        """
+        return static_exchange(self._state.ravel().tolist(), action)
 
     def get_possible_actions_by_piece(self, piece_id):
         """
@@ -491,6 +937,42 @@ class XiangQiEnv(gym.Env):
             action_space_to_move(action)[1:] for action in legal_actions
         ]
 
+    def get_canonical(self):
+        """
+        Get current state and legal action mask from the perspective of the
+        player whose turn it is, so that a single policy can play both sides.
+        On ally's turn this is the state and ally_actions as they are. On
+        enemy's turn both are rotated by 180 degrees with colors swapped
+        using the precomputed symmetry tables. The result is computed once
+        per turn and cached.
+
+        Return:
+            tuple: canonical state and canonical action mask
+        """
+        if self._turn == ALLY:
+            return self._state, self._ally_actions
+
+        if self._canonical is None:
+            self._canonical = (
+                transform_board(self._state, ROTATE),
+                transform_action_mask(self._enemy_actions, ROTATE)
+            )
+        return self._canonical
+
+    def canonical_to_action(self, action):
+        """
+        Convert an action chosen in the canonical frame (see
+        get_canonical()) back to an action ID accepted by step().
+
+        Parameters:
+            action (int): action ID in the canonical frame
+        Return:
+            int: action ID in the environment's frame
+        """
+        if self._turn == ALLY:
+            return action
+        return int(transform_actions(action, ROTATE))
+
     def check_jiang(self):
         """
         Check if the general is in threat (i.e. it is check or "jiang")
@@ -503,22 +985,19 @@ class XiangQiEnv(gym.Env):
         # Get OPPONENT General
         if self._turn == ALLY:
             general = self._enemy_piece[GENERAL]
-            actions = self._ally_actions
         else:
             general = self._ally_piece[GENERAL]
-            actions = self._enemy_actions
 
         # Update current player's moves
         self.get_possible_actions(self._turn)
+        if self._turn == ALLY:
+            actions = self._ally_legal
+        else:
+            actions = self._enemy_legal
 
-        # Iterate through possible moves of current player's pieces
-        actions = np.where(actions == 1)[0]
-        jiang_actions = []
-        for action in actions:
-            _, _, (target_r, target_c) = action_space_to_move(action)
-            if target_r == general.row and target_c == general.col:
-                jiang_actions.append(action)
-        return jiang_actions
+        # Select possible moves of current player's pieces onto the general
+        target = general.row * BOARD_COLS + general.col
+        return list(actions[actions % TOTAL_POS == target])
 
     @property
     def ally_color(self):
@@ -532,10 +1011,22 @@ class XiangQiEnv(gym.Env):
     def turn(self):
         return self._turn
 
+    @property
+    def strict_rules(self):
+        return self._strict_rules
+
     @property
     def state(self):
         return self._state
 
+    @property
+    def canonical_state(self):
+        return self.get_canonical()[0]
+
+    @property
+    def canonical_actions(self):
+        return self.get_canonical()[1]
+
     @property
     def ally_piece(self):
         return self._ally_piece
@@ -0,0 +1,235 @@
+"""
+Static evaluation of Xiangqi positions.
+
+A position is scored in PIECE_POINTS units from the ally's point of view
+(positive when the ally is ahead) as the sum of three terms:
+
+- material: PIECE_POINTS of every piece except the generals
+- piece-square tables: bonus of every piece on its square, e.g. soldiers
+  gain 1 point after crossing the river as in the environment's rewards
+- mobility: MOBILITY_WEIGHT per move the ally has more than the enemy
+
+Material and piece-square terms are merged into one table indexed by
+[piece_id + PIECE_CNT][square], so that evaluating a batch of boards is a
+single NumPy gather and the score can be updated incrementally for a move
+with `update_eval`, like position keys with `rules.update_key`.
+"""
+import numpy as np
+
+from gym_xiangqi.rules import ACTIONS_PER_PIECE, generate_actions, to_cells
+from gym_xiangqi.constants import (
+    BOARD_ROWS, BOARD_COLS, TOTAL_POS, PIECE_CNT, PIECE_POINTS,
+    ALLY, ENEMY, EMPTY,
+    GENERAL, ADVISOR_1, ADVISOR_2, ELEPHANT_1, ELEPHANT_2,
+    HORSE_1, HORSE_2, CHARIOT_1, CHARIOT_2, CANNON_1, CANNON_2,
+    SOLDIER_1, SOLDIER_5,
+)
+
+# Points per extra legal move
+MOBILITY_WEIGHT = 0.02
+
+# Piece-square bonuses from the ally's point of view (ally at the bottom)
+GENERAL_TABLE = [
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., -.4, -.3, -.4, 0., 0., 0.],
+    [0., 0., 0., -.2, -.1, -.2, 0., 0., 0.],
+    [0., 0., 0., -.1, 0., -.1, 0., 0., 0.],
+]
+
+ADVISOR_TABLE = [
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., -.1, 0., -.1, 0., 0., 0.],
+    [0., 0., 0., 0., .1, 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+]
+
+ELEPHANT_TABLE = [
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., -.1, 0., 0., 0., -.1, 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [-.1, 0., 0., 0., .1, 0., 0., 0., -.1],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+]
+
+HORSE_TABLE = [
+    [0., -.1, .1, .1, -.2, .1, .1, -.1, 0.],
+    [0., .2, .4, .3, .1, .3, .4, .2, 0.],
+    [.1, .3, .4, .5, .4, .5, .4, .3, .1],
+    [.1, .3, .4, .4, .4, .4, .4, .3, .1],
+    [0., .2, .3, .3, .3, .3, .3, .2, 0.],
+    [0., .1, .2, .2, .2, .2, .2, .1, 0.],
+    [0., .1, .1, .2, .1, .2, .1, .1, 0.],
+    [0., 0., .1, .1, .1, .1, .1, 0., 0.],
+    [-.1, -.1, 0., 0., -.1, 0., 0., -.1, -.1],
+    [-.2, -.1, -.1, -.1, -.2, -.1, -.1, -.1, -.2],
+]
+
+CHARIOT_TABLE = [
+    [.1, .1, .1, .2, .2, .2, .1, .1, .1],
+    [.1, .2, .1, .3, .3, .3, .1, .2, .1],
+    [.1, .1, .1, .2, .2, .2, .1, .1, .1],
+    [.1, .1, .1, .2, .2, .2, .1, .1, .1],
+    [.1, .2, .2, .2, .2, .2, .2, .2, .1],
+    [.1, .1, .1, .1, .1, .1, .1, .1, .1],
+    [0., 0., 0., .1, .1, .1, 0., 0., 0.],
+    [0., 0., 0., .1, .1, .1, 0., 0., 0.],
+    [-.1, .1, 0., .1, 0., .1, 0., .1, -.1],
+    [-.1, .1, 0., .1, 0., .1, 0., .1, -.1],
+]
+
+CANNON_TABLE = [
+    [.1, .1, 0., -.1, -.1, -.1, 0., .1, .1],
+    [.1, .1, 0., 0., -.1, 0., 0., .1, .1],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., .1, 0., 0., 0., 0.],
+    [0., 0., 0., 0., .1, 0., 0., 0., 0.],
+    [0., 0., 0., 0., .1, 0., 0., 0., 0.],
+    [0., 0., 0., 0., .1, 0., 0., 0., 0.],
+    [0., .1, .1, .1, .3, .1, .1, .1, 0.],
+    [0., 0., 0., 0., .1, 0., 0., 0., 0.],
+    [0., 0., .1, 0., 0., 0., .1, 0., 0.],
+]
+
+# Crossing the river is worth 1 point as in the environment's rewards
+SOLDIER_TABLE = [
+    [1., 1., 1., 1.1, 1.2, 1.1, 1., 1., 1.],
+    [1.1, 1.3, 1.5, 1.7, 1.8, 1.7, 1.5, 1.3, 1.1],
+    [1.1, 1.3, 1.5, 1.6, 1.7, 1.6, 1.5, 1.3, 1.1],
+    [1.1, 1.2, 1.3, 1.4, 1.5, 1.4, 1.3, 1.2, 1.1],
+    [1., 1.1, 1.1, 1.2, 1.3, 1.2, 1.1, 1.1, 1.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+    [0., 0., 0., 0., 0., 0., 0., 0., 0.],
+]
+
+
+def _build_value_table():
+    """
+    Merge material and piece-square tables into signed values indexed by
+    [piece_id + PIECE_CNT][square]. Enemy pieces use the tables rotated by
+    180 degrees, matching the rotated initial layout.
+    """
+    tables = [None] * (PIECE_CNT + 1)
+    tables[GENERAL] = GENERAL_TABLE
+    tables[ADVISOR_1] = tables[ADVISOR_2] = ADVISOR_TABLE
+    tables[ELEPHANT_1] = tables[ELEPHANT_2] = ELEPHANT_TABLE
+    tables[HORSE_1] = tables[HORSE_2] = HORSE_TABLE
+    tables[CHARIOT_1] = tables[CHARIOT_2] = CHARIOT_TABLE
+    tables[CANNON_1] = tables[CANNON_2] = CANNON_TABLE
+    for piece_id in range(SOLDIER_1, SOLDIER_5 + 1):
+        tables[piece_id] = SOLDIER_TABLE
+
+    values = np.zeros((2 * PIECE_CNT + 1, TOTAL_POS))
+    for piece_id in range(1, PIECE_CNT + 1):
+        material = 0. if piece_id == GENERAL else PIECE_POINTS[piece_id]
+        ally = material + np.array(tables[piece_id]).ravel()
+        values[PIECE_CNT + piece_id] = ally
+        values[PIECE_CNT - piece_id] = -ally[::-1]
+    return values
+
+
+# Signed value of every piece on every square, ally's point of view
+PIECE_SQUARE_VALUES = _build_value_table()
+PIECE_SQUARE_VALUES.flags.writeable = False
+
+_SQUARES = np.arange(TOTAL_POS)
+_VALUE_ROWS = PIECE_SQUARE_VALUES.tolist()
+
+
+def material_pst(cells):
+    """
+    Material and piece-square score of flat board cells, from the ally's
+    point of view. This is the value maintained by `update_eval`.
+    """
+    return sum(_VALUE_ROWS[piece_id + PIECE_CNT][sq]
+               for sq, piece_id in enumerate(cells) if piece_id != EMPTY)
+
+
+def update_eval(score, action, piece_id, captured):
+    """
+    Update a material and piece-square score for a move in constant time.
+
+    Parameters:
+        score (float): score before the move, from the ally's point of view
+        action (int): action ID of the move
+        piece_id (int): signed ID of the moving piece
+        captured (int): signed ID of the captured piece or EMPTY
+    Return:
+        float: score after the move
+    """
+    start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+    values = _VALUE_ROWS[piece_id + PIECE_CNT]
+    return (score + values[end] - values[start]
+            - _VALUE_ROWS[captured + PIECE_CNT][end])
+
+
+def mobility(cells, ally_moves=None, enemy_moves=None):
+    """
+    Mobility term of a position. Move counts already known, e.g. from the
+    environment's legal actions, are used instead of generating moves.
+    """
+    if ally_moves is None:
+        ally_moves = len(generate_actions(cells, ALLY))
+    if enemy_moves is None:
+        enemy_moves = len(generate_actions(cells, ENEMY))
+    return MOBILITY_WEIGHT * (ally_moves - enemy_moves)
+
+
+def evaluate(board, side=ALLY, use_mobility=True):
+    """
+    Evaluate a position.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): point of view of the score, ALLY (1) or ENEMY (-1)
+        use_mobility (bool): include the mobility term, which needs move
+            generation for both sides
+    Return:
+        float: score in PIECE_POINTS units, positive when `side` is ahead
+    """
+    cells = to_cells(board)
+    score = material_pst(cells)
+    if use_mobility:
+        score += mobility(cells)
+    return score * side
+
+
+def evaluate_many(boards, sides=None, use_mobility=False):
+    """
+    Evaluate a batch of positions with NumPy gathers.
+
+    Parameters:
+        boards (np.array): (N, 10, 9) boards of signed piece IDs
+        sides (np.array): (N, ) points of view, ALLY (1) or ENEMY (-1);
+            ally for every board if None
+        use_mobility (bool): include the mobility term; it is computed by
+            move generation board by board and is much slower
+    Return:
+        np.array: (N, ) scores in PIECE_POINTS units
+    """
+    boards = np.asarray(boards).reshape(-1, BOARD_ROWS * BOARD_COLS)
+    scores = PIECE_SQUARE_VALUES[boards + PIECE_CNT, _SQUARES].sum(axis=1)
+    if use_mobility:
+        scores += [mobility(cells) for cells in boards.tolist()]
+    if sides is not None:
+        scores *= sides
+    return scores
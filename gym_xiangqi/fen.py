@@ -0,0 +1,140 @@
+"""
+Xiangqi FEN: text description of a position.
+
+A FEN lists the ranks from black's side to red's side, separated by "/",
+with red pieces in upper case and black pieces in lower case (K general,
+A advisor, B elephant, N horse, R chariot, C cannon, P soldier; E and H are
+accepted for B and N) and digits counting empty squares. It is followed by
+the side to move ("w" or "r" for red, "b" for black), two unused "-"
+fields, the number of plies since the last capture and the move number:
+
+    rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1
+
+Boards use XiangQiEnv's frame, where the ally's pieces are positive and at
+the bottom. Pieces of a kind get their IDs in the reading order of the
+board as seen by their own side (top to bottom, left to right), lowest ID
+first, which gives the initial position the IDs of INITIAL_BOARD. The IDs
+of pieces missing from the FEN are left unused.
+"""
+import numpy as np
+
+from gym_xiangqi.rules import PIECE_KIND
+from gym_xiangqi.constants import (
+    BOARD_ROWS, BOARD_COLS, PIECE_CNT, RED, ALLY, ENEMY, EMPTY, GENERAL,
+)
+
+INITIAL_FEN = ("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR"
+               " w - - 0 1")
+
+# FEN letter of each piece kind, indexed by kind - 1
+FEN_LETTERS = "KABNRCP"
+_ALIASES = {"E": "B", "H": "N"}
+
+# Piece IDs of each kind, lowest first
+_KIND_IDS = {}
+for _pid in range(1, PIECE_CNT + 1):
+    _KIND_IDS.setdefault(PIECE_KIND[_pid], []).append(_pid)
+
+
+def from_fen(fen, ally_color=RED):
+    """
+    Read a position from a FEN.
+
+    Parameters:
+        fen (str): position, the fields after the board are optional
+        ally_color (int): color of the ally side, RED (0) or BLACK (1)
+    Return:
+        tuple: (10 x 9 board of signed piece IDs, side to move, ALLY (1) or
+        ENEMY (-1), plies since the last capture, move number)
+    """
+    fields = fen.split()
+    if not fields:
+        raise ValueError("empty FEN")
+    ranks = fields[0].split("/")
+    if len(ranks) != BOARD_ROWS:
+        raise ValueError(f"FEN has {len(ranks)} ranks instead of "
+                         f"{BOARD_ROWS}: {fen!r}")
+
+    # Kinds of the pieces with red positive and at the bottom
+    kinds = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+    for row, rank in enumerate(ranks):
+        col = 0
+        for char in rank:
+            if char.isdigit():
+                col += int(char)
+                continue
+            letter = _ALIASES.get(char.upper(), char.upper())
+            if letter not in FEN_LETTERS or col >= BOARD_COLS:
+                raise ValueError(f"invalid rank {rank!r} in FEN {fen!r}")
+            kind = FEN_LETTERS.index(letter) + 1
+            kinds[row, col] = kind if char.isupper() else -kind
+            col += 1
+        if col != BOARD_COLS:
+            raise ValueError(f"rank {rank!r} of FEN {fen!r} does not have "
+                             f"{BOARD_COLS} files")
+
+    red = ALLY if ally_color == RED else ENEMY
+    if red == ENEMY:
+        kinds = -kinds[::-1, ::-1]
+    board = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+    for side in (ALLY, ENEMY):
+        free = {kind: list(ids) for kind, ids in _KIND_IDS.items()}
+        # Reading order of the board as seen from the side
+        squares = np.argwhere(kinds * side > 0)
+        for row, col in (squares if side == ALLY else squares[::-1]):
+            kind = abs(kinds[row, col])
+            if not free[kind]:
+                raise ValueError(f"FEN {fen!r} has too many "
+                                 f"{FEN_LETTERS[kind - 1]} pieces")
+            board[row, col] = side * free[kind].pop(0)
+        if free[PIECE_KIND[GENERAL]]:
+            raise ValueError(f"FEN {fen!r} lacks a general")
+
+    side_field = fields[1].lower() if len(fields) > 1 else "w"
+    if side_field not in ("w", "r", "b"):
+        raise ValueError(f"invalid side to move {fields[1]!r} in FEN")
+    side = red if side_field in ("w", "r") else -red
+    try:
+        halfmove = int(fields[4]) if len(fields) > 4 else 0
+        fullmove = int(fields[5]) if len(fields) > 5 else 1
+    except ValueError:
+        raise ValueError(f"invalid move counters in FEN {fen!r}") from None
+    return board, side, halfmove, fullmove
+
+
+def to_fen(board, side, ally_color=RED, halfmove=0, fullmove=1):
+    """
+    Write a position as a FEN.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+        ally_color (int): color of the ally side, RED (0) or BLACK (1)
+        halfmove (int): plies since the last capture
+        fullmove (int): move number
+    Return:
+        str: FEN of the position
+    """
+    board = np.asarray(board)
+    red = ALLY if ally_color == RED else ENEMY
+    if red == ENEMY:
+        board = -board[::-1, ::-1]
+
+    ranks = []
+    for row in board:
+        rank = ""
+        empty = 0
+        for piece_id in row:
+            if piece_id == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            letter = FEN_LETTERS[PIECE_KIND[abs(piece_id)] - 1]
+            rank += letter if piece_id > 0 else letter.lower()
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    return (f"{'/'.join(ranks)} {'w' if side == red else 'b'} - - "
+            f"{halfmove} {fullmove}")
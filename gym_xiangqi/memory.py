@@ -0,0 +1,128 @@
+"""
+Memory footprint of XiangQiEnv instances, to size pools of environments.
+
+`memory_report` breaks down the bytes held by an environment by component.
+NumPy arrays are counted by their buffer size and other objects by
+`sys.getsizeof` of everything they reference. Objects shared by all
+environments of the process (the initial position template and the legal
+move cache) are reported separately, since they are paid for only once.
+"""
+import gc
+import sys
+import tracemalloc
+import types
+
+import numpy as np
+import pygame
+
+from gym_xiangqi.cache import get_shared_cache
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+
+# Bytes a headless environment may hold, checked by the test suite. Most of
+# it is taken by the two float64 masks of the whole action space.
+ENV_MEMORY_BUDGET = int(2.5 * 1024 * 1024)
+
+# Attributes of Piece objects holding PyGame resources
+_PIECE_GUI_ATTRIBUTES = ("basic_image", "select_image", "mini_image",
+                         "move_sound")
+
+# Code objects are shared and not counted
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType,
+                 types.BuiltinFunctionType, types.MethodType)
+
+
+def _sizeof(obj, seen, skip=()):
+    """
+    Bytes held by an object and everything it references that has not been
+    counted yet. `seen` maps the IDs of counted objects to the objects, so
+    that temporary objects stay alive and their IDs are not reused.
+    """
+    if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+        return 0
+    seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        # Views are counted with their base array
+        size = sys.getsizeof(obj)
+        if obj.base is not None:
+            size += _sizeof(obj.base, seen)
+        return size
+    if isinstance(obj, pygame.Surface):
+        return (sys.getsizeof(obj)
+                + obj.get_width() * obj.get_height() * obj.get_bytesize())
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_sizeof(key, seen) + _sizeof(value, seen)
+                    for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+        size += sum(_sizeof(value, seen)
+                    for name, value in vars(obj).items() if name not in skip)
+    return size
+
+
+def memory_report(env=None, **env_kwargs):
+    """
+    Break down the memory held by an environment.
+
+    Parameters:
+        env (XiangQiEnv): environment to inspect; if None, a new headless
+            environment is created with `env_kwargs` and the memory
+            allocated while creating it is also measured with tracemalloc
+        env_kwargs: arguments of XiangQiEnv when `env` is None
+    Return:
+        dict: bytes held by the board ("board"), the legal action masks
+        ("masks"), the compact legal action arrays ("legal"), the piece
+        objects ("pieces"), the move and position histories ("history"),
+        the PyGame objects ("gui") and everything else ("other"), their sum
+        ("total"), the bytes shared with the other environments of the
+        process ("shared"), and the bytes allocated by XiangQiEnv() as
+        traced by tracemalloc ("traced", None if `env` was given)
+    """
+    traced = None
+    if env is None:
+        XiangQiEnv()    # build the shared initial position template first
+        gc.collect()
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            env = XiangQiEnv(**env_kwargs)
+            traced = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            if started:
+                tracemalloc.stop()
+    env = env.unwrapped
+
+    # Count shared objects first so that they are left out of the others
+    seen = {}
+    shared = _sizeof(XiangQiEnv._initial, seen)
+    shared += _sizeof(get_shared_cache(), seen)
+
+    pieces = [piece for piece in env._ally_piece + env._enemy_piece
+              if piece is not None]
+    report = {
+        "board": _sizeof([env._state, env._canonical], seen),
+        "masks": _sizeof([env._ally_actions, env._enemy_actions], seen),
+        "legal": _sizeof([env._ally_legal, env._enemy_legal], seen),
+        "history": _sizeof([env._ally_jiang_history,
+                            env._enemy_jiang_history,
+                            env._positions, env._last_quiet], seen),
+    }
+    # Pieces are counted before the game object which also references them
+    report["pieces"] = (
+        sum(_sizeof(piece, seen, _PIECE_GUI_ATTRIBUTES) for piece in pieces)
+        + _sizeof([env._ally_piece, env._enemy_piece], seen))
+    report["gui"] = _sizeof([env._game] + [getattr(piece, name)
+                                           for piece in pieces
+                                           for name in _PIECE_GUI_ATTRIBUTES],
+                            seen)
+    report["other"] = _sizeof(env, seen)
+    report["total"] = sum(report.values())
+    report["shared"] = shared
+    report["traced"] = traced
+    return report
@@ -0,0 +1,500 @@
+"""
+ICCS and WXF move notations and a streaming reader and writer for game
+databases in PGN style text.
+
+Moves are given from red's point of view, with red as ALLY at the bottom of
+the board as in XiangQiEnv's default setup:
+
+- ICCS names the start and end squares by file a-i from red's left and rank
+  0-9 from red's side, e.g. "h2e2" (also written "H2-E2")
+- WXF names the piece (K, A, E, H, R, C, P; G, B and N are accepted for K, E
+  and H), its file counted 1-9 from the mover's right, the direction (+
+  forward, - backward, = or . sideways) and the destination file or the
+  number of ranks moved, e.g. "C2=5". When two chariots, horses, cannons
+  or soldiers share a file, + (front) or - (rear) replaces the file number,
+  as in "R+=4" or "+R=4", with = for the middle one of three soldiers and
+  a to e from front to rear for four or five; when soldiers are paired on
+  two files, the marker replaces the letter, as in "+7+1". Advisors and
+  elephants always keep their file number, their direction telling two on
+  a file apart.
+
+Notated moves are resolved against the legal actions of the current
+position. A database is a text file of games, each with optional
+[Tag "value"] lines and movetext such as "1. h2e2 h9g7 2. h0g2 1-0", with
+{comments}, ; comments and (variations) skipped. The notation is taken from
+the [Format] tag or detected move by move, and games start from the
+position of the [FEN] tag if there is one.
+
+`read_games` parses a file lazily, one game at a time, and reports bad
+games through a callback instead of stopping. `read_games_parallel` splits
+the file by game and parses chunks of games in a process pool.
+"""
+import os
+import re
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gym_xiangqi.fen import from_fen
+from gym_xiangqi.rules import (
+    PIECE_KIND, KIND_GENERAL, KIND_ADVISOR, KIND_ELEPHANT, KIND_HORSE,
+    decode_action, encode_action, generate_actions, make_move, to_cells,
+)
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, BOARD_ROWS, BOARD_COLS, ALLY, ENEMY,
+)
+
+DEFAULT_CHUNK_SIZE = 100
+
+# Movetext line width used by write_game
+LINE_WIDTH = 80
+
+WXF_LETTERS = "KAEHRCP"    # indexed by piece kind - 1
+_WXF_ALIASES = {"G": "K", "B": "E", "N": "H"}
+
+_ICCS_MOVE = re.compile(r"^([a-i])([0-9])-?([a-i])([0-9])$", re.IGNORECASE)
+_WXF_MOVE = re.compile(r"^([KGAEBHNRCP])([1-9+\-=.A-E])([+\-=.])([1-9])$")
+_WXF_TANDEM_MOVE = re.compile(
+    r"^([+\-=.])([KGAEBHNRCP1-9])([+\-=.])([1-9])$")
+
+# Tandem markers of pieces sharing a file from front to rear, by count
+_TANDEM_MARKERS = {2: "+-", 3: "+=-", 4: "abcd", 5: "abcde"}
+
+_TAG = re.compile(r'^\[(\w+)\s+"(.*)"\]$')
+_COMMENT = re.compile(r"\{[^}]*\}|;[^\n]*")
+_MOVE_NUMBER = re.compile(r"^\d+\.+$")
+_MOVE_NUMBER_PREFIX = re.compile(r"^\d+\.+")
+
+RESULTS = {"1-0": ALLY, "0-1": ENEMY, "1/2-1/2": 0, "*": None}
+_RESULT_NAMES = {ALLY: "1-0", ENEMY: "0-1", 0: "1/2-1/2", None: "*"}
+
+
+class NotationError(ValueError):
+    """
+    Raised for a move or a game that cannot be parsed or is illegal.
+    """
+
+
+def to_iccs(action):
+    """
+    Write an action in ICCS notation.
+
+    Parameters:
+        action (int): action ID
+    Return:
+        str: move such as "h2e2"
+    """
+    _, start, end = decode_action(action)
+    return _iccs_square(start) + _iccs_square(end)
+
+
+def _iccs_square(sq):
+    row, col = divmod(sq, BOARD_COLS)
+    return "abcdefghi"[col] + str(BOARD_ROWS - 1 - row)
+
+
+def parse_iccs(board, side, move):
+    """
+    Resolve a move in ICCS notation.
+
+    Parameters:
+        board (np.array or list): 10 x 9 board or flat cells
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+        move (str): move such as "h2e2" or "H2-E2"
+    Return:
+        int: action ID
+    """
+    cells = _cells(board)
+    match = _ICCS_MOVE.match(move.strip())
+    if match is None:
+        raise NotationError(f"{move!r} is not an ICCS move")
+    start_file, start_rank, end_file, end_rank = match.groups()
+    start = _square(start_file, start_rank)
+    end = _square(end_file, end_rank)
+    if cells[start] * side <= 0:
+        raise NotationError(f"{move!r}: no piece of the side to move on "
+                            f"{start_file}{start_rank}")
+    action = encode_action(cells[start], start, end)
+    if action not in generate_actions(cells, side):
+        raise NotationError(f"{move!r} is not a legal move")
+    return action
+
+
+def _square(file, rank):
+    return ((BOARD_ROWS - 1 - int(rank)) * BOARD_COLS
+            + "abcdefghi".index(file.lower()))
+
+
+def _wxf_file(col, side):
+    return BOARD_COLS - col if side == ALLY else col + 1
+
+
+def _file_rows(cells, side, kind, col):
+    """
+    Rows of the side's pieces of a kind on a file, front first.
+    """
+    return sorted((row for row in range(BOARD_ROWS)
+                   if cells[row * BOARD_COLS + col] * side > 0
+                   and PIECE_KIND[abs(cells[row * BOARD_COLS + col])]
+                   == kind),
+                  key=lambda row: row * side)
+
+
+def _wxf_fields(cells, action):
+    """
+    WXF fields of a move: piece letter, file or tandem position,
+    direction and destination file or distance.
+    """
+    _, start, end = decode_action(action)
+    piece_id = cells[start]
+    side = ALLY if piece_id > 0 else ENEMY
+    kind = PIECE_KIND[abs(piece_id)]
+    start_row, col = divmod(start, BOARD_COLS)
+    end_row, end_col = divmod(end, BOARD_COLS)
+
+    forward = (start_row - end_row) * side
+    direction = "+" if forward > 0 else "-" if forward < 0 else "="
+    if direction == "=" or kind in (KIND_ADVISOR, KIND_ELEPHANT,
+                                    KIND_HORSE):
+        target = str(_wxf_file(end_col, side))
+    else:
+        target = str(abs(forward))
+
+    file = str(_wxf_file(col, side))
+    if kind in (KIND_GENERAL, KIND_ADVISOR, KIND_ELEPHANT):
+        return WXF_LETTERS[kind - 1], file, direction, target
+    rows = _file_rows(cells, side, kind, col)
+    if len(rows) < 2:
+        return WXF_LETTERS[kind - 1], file, direction, target
+    tandem = _TANDEM_MARKERS[len(rows)][rows.index(start_row)]
+    if any(len(_file_rows(cells, side, kind, other)) > 1
+           for other in range(BOARD_COLS) if other != col):
+        # Soldiers paired on two files: the file replaces the letter
+        return "", tandem + file, direction, target
+    return WXF_LETTERS[kind - 1], tandem, direction, target
+
+
+def to_wxf(board, action):
+    """
+    Write an action in WXF notation.
+
+    Parameters:
+        board (np.array or list): 10 x 9 board or flat cells of the position
+            the move is played in
+        action (int): action ID
+    Return:
+        str: move such as "C2=5", or "R+=4" for the front of two chariots
+        on a file
+    """
+    return "".join(_wxf_fields(_cells(board), action))
+
+
+def parse_wxf(board, side, move):
+    """
+    Resolve a move in WXF notation.
+
+    Parameters:
+        board (np.array or list): 10 x 9 board or flat cells
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+        move (str): move such as "C2=5", "R+=4", "+R=4" or "Pb+1"
+    Return:
+        int: action ID
+    """
+    cells = _cells(board)
+    text = move.strip().upper()
+    match = _WXF_MOVE.match(text)
+    if match is not None:
+        letter, locator, direction, target = match.groups()
+    else:
+        match = _WXF_TANDEM_MOVE.match(text)
+        if match is None:
+            raise NotationError(f"{move!r} is not a WXF move")
+        locator, letter, direction, target = match.groups()
+        if letter.isdigit():
+            locator, letter = locator + letter, ""
+    locator = locator.lower().replace(".", "=")
+    fields = (_WXF_ALIASES.get(letter, letter), locator,
+              "=" if direction == "." else direction, target)
+
+    kind = WXF_LETTERS.index(fields[0] or "P") + 1
+    actions = [action for action in generate_actions(cells, side)
+               if PIECE_KIND[decode_action(action)[0]] == kind
+               and _wxf_fields(cells, action) == fields]
+    if not actions:
+        raise NotationError(f"{move!r} is not a legal move")
+    if len(actions) > 1:
+        raise NotationError(f"{move!r} is ambiguous")
+    return actions[0]
+
+
+def parse_move(board, side, move, notation=None):
+    """
+    Resolve a move in ICCS or WXF notation.
+
+    Parameters:
+        board (np.array or list): 10 x 9 board or flat cells
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+        move (str): notated move
+        notation (str): "iccs" or "wxf", detected from the move if None
+    Return:
+        int: action ID
+    """
+    if notation is None:
+        notation = "iccs" if _ICCS_MOVE.match(move.strip()) else "wxf"
+    if notation == "iccs":
+        return parse_iccs(board, side, move)
+    if notation == "wxf":
+        return parse_wxf(board, side, move)
+    raise ValueError(f"unknown notation {notation!r}")
+
+
+def _cells(board):
+    if isinstance(board, list):
+        return board
+    return to_cells(board)
+
+
+def iter_records(source):
+    """
+    Split a database into the raw text of its games, reading it lazily.
+
+    Parameters:
+        source (str or file): path or open text file of the database
+    Return:
+        generator: (line number where the game starts, game text)
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            yield from iter_records(f)
+        return
+
+    lines = []
+    start = 1
+    in_movetext = False
+    finished = False
+    for number, line in enumerate(source, 1):
+        stripped = line.strip()
+        # A game ends at the tags of the next one or after its result
+        if (stripped.startswith("[") and in_movetext) or (stripped
+                                                          and finished):
+            yield start, "".join(lines)
+            lines = []
+            in_movetext = finished = False
+        if not lines:
+            if not stripped:
+                continue
+            start = number
+        lines.append(line)
+        if stripped and not stripped.startswith("["):
+            in_movetext = True
+            finished = stripped.split()[-1] in RESULTS
+    if lines:
+        yield start, "".join(lines)
+
+
+def _strip_variations(text):
+    result = []
+    depth = 0
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            result.append(char)
+    return "".join(result)
+
+
+def parse_game(text):
+    """
+    Parse the text of one game.
+
+    Parameters:
+        text (str): tag lines and movetext of the game
+    Return:
+        dict: "tags" (dict), start "board" and "side", "actions" (list of
+        action IDs) and "result" (ALLY (1) or ENEMY (-1) for a red or black
+        win, 0 for a draw, None if unknown)
+    """
+    tags = {}
+    movetext = []
+    for line in text.splitlines():
+        match = _TAG.match(line.strip())
+        if match is not None:
+            tags[match.group(1)] = match.group(2)
+        else:
+            movetext.append(line)
+
+    notation = tags.get("Format", "").lower() or None
+    if notation not in (None, "iccs", "wxf"):
+        raise NotationError(f"unsupported format {tags['Format']!r}")
+    if "FEN" in tags:
+        try:
+            board, side, _, _ = from_fen(tags["FEN"])
+        except ValueError as e:
+            raise NotationError(str(e)) from None
+    else:
+        board = np.array(INITIAL_BOARD)
+        side = ALLY
+    start_side = side
+
+    cells = to_cells(board)
+    actions = []
+    result = RESULTS.get(tags.get("Result"))
+    tokens = _strip_variations(_COMMENT.sub(" ", "\n".join(movetext)))
+    for token in tokens.split():
+        if _MOVE_NUMBER.match(token):
+            continue
+        if token in RESULTS:
+            result = RESULTS[token]
+            break
+        token = _MOVE_NUMBER_PREFIX.sub("", token)
+        try:
+            action = parse_move(cells, side, token, notation)
+        except NotationError as e:
+            raise NotationError(f"move {len(actions) + 1}: {e}") from None
+        make_move(cells, action)
+        actions.append(action)
+        side = -side
+    return {"tags": tags, "board": board, "side": start_side,
+            "actions": actions, "result": result}
+
+
+def _parse_record(index, line, text):
+    try:
+        game = parse_game(text)
+    except NotationError as e:
+        return None, (index, line, str(e))
+    game["index"] = index
+    game["line"] = line
+    return game, None
+
+
+def read_games(source, on_error=None):
+    """
+    Parse the games of a database lazily.
+
+    Parameters:
+        source (str or file): path or open text file of the database
+        on_error (callable): called with (game index, line number, message)
+            for every game that cannot be parsed; such games are skipped
+    Return:
+        generator: the games as returned by `parse_game`, with their
+        "index" in the file and the "line" where they start
+    """
+    for index, (line, text) in enumerate(iter_records(source)):
+        game, error = _parse_record(index, line, text)
+        if error is not None:
+            if on_error is not None:
+                on_error(*error)
+            continue
+        yield game
+
+
+def read_positions(source, on_error=None):
+    """
+    Iterate over the positions of all games of a database.
+
+    Parameters:
+        source (str or file): path or open text file of the database
+        on_error (callable): see `read_games`
+    Return:
+        generator: (game index, board, side to move, action ID) for every
+        ply, with a new board array per ply
+    """
+    for game in read_games(source, on_error):
+        cells = to_cells(game["board"])
+        side = game["side"]
+        for action in game["actions"]:
+            yield (game["index"],
+                   np.array(cells).reshape(BOARD_ROWS, BOARD_COLS), side,
+                   action)
+            make_move(cells, action)
+            side = -side
+
+
+def _parse_chunk(records):
+    return [_parse_record(*record) for record in records]
+
+
+def read_games_parallel(source, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                        on_error=None):
+    """
+    Parse the games of a database in a process pool. The main process only
+    splits the file into games; chunks of `chunk_size` games are parsed by
+    the workers, with at most two chunks per worker in flight so that memory
+    stays bounded. Games are yielded in file order, as by `read_games`.
+
+    Parameters:
+        source (str or file): path or open text file of the database
+        workers (int): number of processes, one per CPU if None
+        chunk_size (int): games sent to a worker at once
+        on_error (callable): see `read_games`
+    Return:
+        generator: the games as returned by `read_games`
+    """
+    records = ((index, line, text)
+               for index, (line, text) in enumerate(iter_records(source)))
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as executor:
+        max_pending = 2 * workers
+        pending = []
+        while True:
+            while len(pending) < max_pending:
+                chunk = [record for _, record in zip(range(chunk_size),
+                                                     records)]
+                if not chunk:
+                    break
+                pending.append(executor.submit(_parse_chunk, chunk))
+            if not pending:
+                break
+            for game, error in pending.pop(0).result():
+                if error is not None:
+                    if on_error is not None:
+                        on_error(*error)
+                    continue
+                yield game
+
+
+def write_game(file, actions, notation="iccs", tags=None, result=None,
+               fen=None):
+    """
+    Write a game in a notation read by `read_games`.
+
+    Parameters:
+        file (file): open text file
+        actions (list): action IDs of the game's moves
+        notation (str): "iccs" or "wxf"
+        tags (dict): additional tags
+        result (int): ALLY (1) or ENEMY (-1) for a red or black win, 0 for
+            a draw, None if unknown
+        fen (str): start position of the game, the initial position if None
+    """
+    if notation not in ("iccs", "wxf"):
+        raise ValueError(f"unknown notation {notation!r}")
+    tags = dict(tags or {})
+    tags["Format"] = notation.upper()
+    tags["Result"] = _RESULT_NAMES[result]
+    if fen is None:
+        board, side, fullmove = INITIAL_BOARD, ALLY, 1
+    else:
+        tags["FEN"] = fen
+        board, side, _, fullmove = from_fen(fen)
+    for name, value in tags.items():
+        file.write(f'[{name} "{value}"]\n')
+    file.write("\n")
+
+    cells = to_cells(board)
+    tokens = []
+    if side == ENEMY and actions:
+        tokens.append(f"{fullmove}...")
+    for ply, action in enumerate(actions, side == ENEMY):
+        if ply % 2 == 0:
+            tokens.append(f"{fullmove + ply // 2}.")
+        tokens.append(to_iccs(action) if notation == "iccs"
+                      else to_wxf(cells, action))
+        make_move(cells, action)
+    tokens.append(tags["Result"])
+    file.write(textwrap.fill(" ".join(tokens), LINE_WIDTH,
+                             break_on_hyphens=False) + "\n\n")
@@ -0,0 +1,200 @@
+"""
+Perft: count the leaf nodes of the game tree to a fixed depth.
+
+Perft is the standard way to prove that the move generator is correct (the
+counts of reference positions are known exactly) and to measure its speed
+(nodes per second). Run it from the command line with
+
+    python -m gym_xiangqi.perft --depth 4 [--position NAME] [--divide]
+
+which prints the node count and throughput and exits with a non-zero status
+if the count differs from the reference.
+
+Under the strict rules (see `rules.generate_actions`) the counts are those
+of standard Xiangqi. Under the environment's default rules moves may leave
+the own general attacked; capturing a general ends the game, so such moves
+are counted as leaves and not searched further.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from gym_xiangqi.rules import (
+    generate_actions, make_move, unmake_move, apply, to_cells,
+)
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, BOARD_ROWS, BOARD_COLS, ALLY, GENERAL,
+)
+
+# Reference positions with their node counts from depth 1 onwards, under
+# the strict and the default rules. The strict counts of the initial
+# position are the published Xiangqi perft results; the others were
+# cross-checked against a generator verifying every pseudo-legal move by
+# making it.
+REFERENCE_POSITIONS = {
+    "initial": {
+        "moves": (),
+        "side": ALLY,
+        "strict": (44, 1920, 79666, 3290240),
+        "default": (44, 1926, 80288, 3343042),
+    },
+    # Central cannon opening after 1. C2=5 H8+7 2. H2+3 R9=8
+    "central-cannon": {
+        "moves": (87367, 41154, 56589, 57427),
+        "side": ALLY,
+        "strict": (34, 1307, 45366, 1781238),
+        "default": (34, 1316, 45925, 1830409),
+    },
+    # Red general in check by a cannon screened by a red soldier
+    "cannon-check": {
+        "pieces": {
+            (0, 1): -9, (0, 2): -5, (0, 4): -1, (0, 5): -2, (1, 4): -3,
+            (1, 7): 10, (2, 4): -4, (2, 8): -6, (3, 0): -16, (3, 2): -7,
+            (3, 4): -14, (3, 6): -13, (3, 8): -12, (4, 1): -11,
+            (4, 2): -15, (4, 4): -10, (5, 2): 5, (5, 7): 11, (6, 0): 12,
+            (6, 2): 13, (6, 4): 14, (6, 8): 16, (7, 0): 4, (7, 6): 7,
+            (7, 7): 8, (9, 1): 6, (9, 3): 2, (9, 4): 1, (9, 5): 3,
+            (9, 7): 9,
+        },
+        "side": ALLY,
+        "strict": (5, 179, 6189, 216406),
+        "default": (34, 1216, 43410, 1557345),
+    },
+    # Red general in check by a chariot with attackers on both sides
+    "chariot-check": {
+        "pieces": {
+            (0, 1): -7, (0, 4): -1, (0, 5): -2, (0, 6): -4, (1, 4): -3,
+            (1, 8): -8, (2, 6): -10, (2, 8): -6, (3, 2): 10, (3, 4): -14,
+            (3, 6): -13, (3, 7): 11, (3, 8): -12, (4, 0): -16,
+            (4, 6): -5, (5, 0): -11, (5, 4): -9, (5, 6): 5, (6, 2): 13,
+            (6, 6): 15, (6, 8): 16, (8, 5): 7, (8, 6): 8, (9, 1): 6,
+            (9, 2): 4, (9, 3): 2, (9, 4): 1, (9, 5): 3, (9, 6): 9,
+        },
+        "side": ALLY,
+        "strict": (5, 202, 7109, 282705),
+        "default": (37, 1526, 56593, 2343053),
+    },
+}
+
+
+def reference_position(name):
+    """
+    Build the board of a reference position.
+
+    Parameters:
+        name (str): key of REFERENCE_POSITIONS
+    Return:
+        tuple: (10 x 9 board of signed piece IDs, side to move)
+    """
+    reference = REFERENCE_POSITIONS[name]
+    if "pieces" in reference:
+        board = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+        for square, piece_id in reference["pieces"].items():
+            board[square] = piece_id
+    else:
+        board = np.array(INITIAL_BOARD)
+        for action in reference["moves"]:
+            board = apply(board, action)
+    return board, reference["side"]
+
+
+def _perft(cells, side, depth, strict):
+    moves = generate_actions(cells, side, strict)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for action in moves:
+        captured = make_move(cells, action)
+        if abs(captured) == GENERAL:
+            nodes += 1
+        else:
+            nodes += _perft(cells, -side, depth - 1, strict)
+        unmake_move(cells, action, captured)
+    return nodes
+
+
+def perft(board, side, depth, strict=True):
+    """
+    Count the positions reached after `depth` moves.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+        depth (int): number of moves
+        strict (bool): forbid moves exposing the own general
+    Return:
+        int: number of leaf nodes
+    """
+    if depth <= 0:
+        return 1
+    return _perft(to_cells(board), side, depth, strict)
+
+
+def divide(board, side, depth, strict=True):
+    """
+    Split the perft count of a position by root move, to find the move
+    whose subtree differs from another move generator.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+        depth (int): number of moves, at least 1
+        strict (bool): forbid moves exposing the own general
+    Return:
+        dict: leaf nodes under each root action ID
+    """
+    cells = to_cells(board)
+    result = {}
+    for action in sorted(generate_actions(cells, side, strict)):
+        captured = make_move(cells, action)
+        if depth == 1 or abs(captured) == GENERAL:
+            result[action] = 1
+        else:
+            result[action] = _perft(cells, -side, depth - 1, strict)
+        unmake_move(cells, action, captured)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Count perft nodes of a reference position and report "
+                    "the move generator's throughput.")
+    parser.add_argument("--position", default="initial",
+                        choices=sorted(REFERENCE_POSITIONS))
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true",
+                        help="print the node count of every root move")
+    parser.add_argument("--default-rules", action="store_true",
+                        help="allow moves exposing the own general")
+    args = parser.parse_args(argv)
+
+    board, side = reference_position(args.position)
+    strict = not args.default_rules
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(board, side, args.depth, strict)
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, side, args.depth, strict)
+    elapsed = time.perf_counter() - start
+
+    if args.divide:
+        for action, count in counts.items():
+            print(f"{action}: {count}")
+    print(f"nodes  : {nodes}")
+    print(f"time   : {elapsed:.3f} s")
+    print(f"nodes/s: {nodes / elapsed if elapsed > 0 else 0.:.0f}")
+
+    expected = REFERENCE_POSITIONS[args.position][
+        "strict" if strict else "default"]
+    if 1 <= args.depth <= len(expected):
+        if nodes != expected[args.depth - 1]:
+            print(f"expected {expected[args.depth - 1]} nodes")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Low-overhead timing of the phases of a method call, e.g. the phases of
+`XiangQiEnv.step`.
+
+Every call of a wrapped function is timed with `time.perf_counter_ns` and
+added to the counters of its phase: call count, total, minimum and maximum
+time, and a histogram with power of two buckets. Timings are inclusive, so
+a phase called by another phase is also counted in the caller. Before
+Python 3.7, `time.perf_counter` scaled to ns is used instead.
+"""
+import functools
+
+try:
+    from time import perf_counter_ns
+except ImportError:
+    from time import perf_counter
+
+    def perf_counter_ns():
+        return int(perf_counter() * 1e9)
+
+# Histogram bucket i counts durations in [2 ** (i - 1), 2 ** i) ns
+HISTOGRAM_BUCKETS = 64
+
+# Phase counters
+_COUNT = 0
+_TOTAL = 1
+_MIN = 2
+_MAX = 3
+_HISTOGRAM = 4
+
+
+class PhaseProfiler:
+    """
+    Collects per-phase timings of wrapped functions.
+    """
+
+    def __init__(self):
+        self._phases = {}
+
+    def wrap(self, phase, func):
+        """
+        Time every call of a function as a phase.
+
+        Parameters:
+            phase (str): name of the phase
+            func (callable): function to time
+        Return:
+            callable: function with the same behavior recording its timings
+        """
+        counters = self._phases.get(phase)
+        if counters is None:
+            counters = self._phases[phase] = self._new_counters()
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                counters[_COUNT] += 1
+                counters[_TOTAL] += elapsed
+                if elapsed < counters[_MIN]:
+                    counters[_MIN] = elapsed
+                if elapsed > counters[_MAX]:
+                    counters[_MAX] = elapsed
+                counters[_HISTOGRAM][elapsed.bit_length()] += 1
+        return timed
+
+    @staticmethod
+    def _new_counters():
+        return [0, 0, float("inf"), 0, [0] * HISTOGRAM_BUCKETS]
+
+    def clear(self):
+        """
+        Reset the counters of all phases.
+        """
+        for counters in self._phases.values():
+            counters[:] = self._new_counters()
+
+    def stats(self):
+        """
+        Summarize the timings of every phase called at least once.
+
+        Return:
+            dict: for every phase a dict with the call count, total, mean,
+            minimum and maximum time in ns, the approximate median and 99th
+            percentile (upper bound of their histogram bucket) and the
+            histogram as {bucket upper bound in ns: count}
+        """
+        result = {}
+        for phase, counters in self._phases.items():
+            count = counters[_COUNT]
+            if count == 0:
+                continue
+            histogram = counters[_HISTOGRAM]
+            result[phase] = {
+                "count": count,
+                "total_ns": counters[_TOTAL],
+                "mean_ns": counters[_TOTAL] / count,
+                "min_ns": counters[_MIN],
+                "max_ns": counters[_MAX],
+                "p50_ns": _percentile(histogram, count, 0.5),
+                "p99_ns": _percentile(histogram, count, 0.99),
+                "histogram": {1 << bucket: n
+                              for bucket, n in enumerate(histogram) if n},
+            }
+        return result
+
+
+def _percentile(histogram, count, q):
+    """
+    Upper bound of the histogram bucket holding the q-quantile.
+    """
+    rank = q * count
+    seen = 0
+    for bucket, n in enumerate(histogram):
+        seen += n
+        if seen >= rank:
+            return 1 << bucket
+    return 1 << (len(histogram) - 1)
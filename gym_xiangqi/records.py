@@ -0,0 +1,289 @@
+"""
+Compact binary game records with memory-mapped random access.
+
+A game is stored as the key of its start position followed by one 2-byte
+move code per ply, so a game of 100 plies takes 218 bytes including its
+index entry. A move code is the action ID without its piece part,
+`start * 90 + end`; the piece is the one standing on the start square when
+the game is replayed.
+
+File layout (little endian):
+
+- header: magic b"XQGR", format version (uint16), reserved (uint16), and
+  the number of games, the number of start positions, the offset of the
+  start position table and the offset of the game index (uint64 each)
+- game records: start position key (uint64), outcome (int8, winner of the
+  game or 0), reserved (uint8) and the move codes (uint16)
+- start position table: key (uint64), side to move (int8) and board
+  (90 int8) of every start position used by the games
+- game index: offset of every game record and the end of the last one
+  (uint64, number of games + 1)
+
+`GameRecordWriter` streams games to a file, keeping only the index in
+memory. `GameRecordReader` memory-maps a file and reconstructs any game or
+any position on demand with `rules.make_move`.
+"""
+import struct
+
+import numpy as np
+
+from gym_xiangqi.rules import (
+    ACTIONS_PER_PIECE, encode_action, make_move, position_key, to_cells,
+)
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, BOARD_ROWS, BOARD_COLS, TOTAL_POS, ALLY, EMPTY,
+)
+
+MAGIC = b"XQGR"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHQQQQ")
+_GAME_HEADER = struct.Struct("<QbB")
+_POSITION_DTYPE = np.dtype([("key", "<u8"), ("side", "i1"),
+                            ("board", "i1", (TOTAL_POS, ))])
+
+
+def compact_move(action):
+    """
+    Drop the piece part of an action ID.
+
+    Parameters:
+        action (int): action ID
+    Return:
+        int: move code `start * 90 + end`, below 2 ** 16
+    """
+    return int(action) % ACTIONS_PER_PIECE
+
+
+def expand_move(cells, code):
+    """
+    Turn a move code back into an action ID.
+
+    Parameters:
+        cells (list): flat board cells of the position the move is played in
+        code (int): move code from `compact_move`
+    Return:
+        int: action ID moving the piece on the start square
+    """
+    start = int(code) // TOTAL_POS
+    if cells[start] == EMPTY:
+        raise ValueError(f"move code {code} starts from an empty square")
+    return encode_action(cells[start], start, int(code) % TOTAL_POS)
+
+
+class GameRecordWriter:
+    """
+    Write games to a record file. Use it as a context manager or call
+    `close()` to write the start position table and the index.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._file.write(bytes(_HEADER.size))
+        self._offsets = []
+        self._positions = {}
+        self.add_position(INITIAL_BOARD, ALLY)
+
+    def add_position(self, board, side):
+        """
+        Register a start position.
+
+        Parameters:
+            board (np.array): 10 x 9 board of signed piece IDs
+            side (int): side to move, ALLY (1) or ENEMY (-1)
+        Return:
+            int: key of the position, as stored in the game records
+        """
+        cells = to_cells(board)
+        key = position_key(cells, side)
+        self._positions.setdefault(key, (side, cells))
+        return key
+
+    def write(self, actions, outcome=0, board=INITIAL_BOARD, side=ALLY):
+        """
+        Append a game.
+
+        Parameters:
+            actions (list): action IDs of the game's moves
+            outcome (int): winner of the game, ALLY (1), ENEMY (-1) or 0
+            board (np.array): start position of the game
+            side (int): side to move in the start position
+        Return:
+            int: index of the game in the file
+        """
+        codes = np.asarray(actions, dtype=np.int64) % ACTIONS_PER_PIECE
+        self._offsets.append(self._file.tell())
+        self._file.write(_GAME_HEADER.pack(self.add_position(board, side),
+                                           outcome, 0))
+        self._file.write(codes.astype("<u2").tobytes())
+        return len(self._offsets) - 1
+
+    def close(self):
+        """
+        Write the start position table, the index and the header.
+        """
+        if self._file.closed:
+            return
+        end = self._file.tell()
+        table = np.zeros(len(self._positions), dtype=_POSITION_DTYPE)
+        for i, (key, (side, cells)) in enumerate(self._positions.items()):
+            table[i] = (key, side, cells)
+        positions_offset = end
+        self._file.write(table.tobytes())
+
+        # Align the index so that it can be viewed as uint64 in place
+        index_offset = -(-self._file.tell() // 8) * 8
+        self._file.write(bytes(index_offset - self._file.tell()))
+        self._file.write(np.array(self._offsets + [end], "<u8").tobytes())
+
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, len(self._offsets),
+                                      len(table), positions_offset,
+                                      index_offset))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameRecordReader:
+    """
+    Random access to the games of a record file through a memory map.
+    Only the accessed games are read from disk.
+    """
+
+    def __init__(self, path):
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        (magic, version, _, num_games, num_positions, positions_offset,
+         index_offset) = _HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        if version != VERSION:
+            raise ValueError(f"unsupported game record version {version}")
+
+        self._index = np.frombuffer(self._data, "<u8", num_games + 1,
+                                    index_offset)
+        table = np.frombuffer(self._data, _POSITION_DTYPE, num_positions,
+                              positions_offset)
+        self._positions = {int(key): (int(side), board.tolist())
+                           for key, side, board in table}
+
+    def __len__(self):
+        return len(self._index) - 1
+
+    def _record(self, game):
+        if not -len(self) <= game < len(self):
+            raise IndexError(f"game {game} out of range")
+        game %= len(self)
+        start = int(self._index[game])
+        key, outcome, _ = _GAME_HEADER.unpack_from(self._data, start)
+        move_start = start + _GAME_HEADER.size
+        codes = np.frombuffer(self._data, "<u2",
+                              (int(self._index[game + 1]) - move_start) // 2,
+                              move_start)
+        return key, outcome, codes
+
+    def moves(self, game):
+        """
+        Move codes of a game, see `compact_move`.
+
+        Parameters:
+            game (int): index of the game
+        Return:
+            np.array: read-only uint16 move codes, one per ply
+        """
+        return self._record(game)[2]
+
+    def outcome(self, game):
+        """
+        Winner of a game, ALLY (1), ENEMY (-1) or 0 for a draw.
+        """
+        return self._record(game)[1]
+
+    def start(self, game):
+        """
+        Start position of a game.
+
+        Return:
+            tuple: (10 x 9 board of signed piece IDs, side to move)
+        """
+        side, cells = self._positions[self._record(game)[0]]
+        return np.array(cells).reshape(BOARD_ROWS, BOARD_COLS), side
+
+    def actions(self, game):
+        """
+        Action IDs of a game, reconstructed by replaying its moves.
+
+        Return:
+            list: action ID of every ply
+        """
+        return [action for _, _, action in self.positions(game)]
+
+    def position(self, game, ply):
+        """
+        Position of a game before a ply.
+
+        Parameters:
+            game (int): index of the game
+            ply (int): number of moves played from the start position, up
+                to the game's length
+        Return:
+            tuple: (10 x 9 board of signed piece IDs, side to move)
+        """
+        key, _, codes = self._record(game)
+        if not 0 <= ply <= len(codes):
+            raise IndexError(f"ply {ply} out of range")
+        side, cells = self._positions[key]
+        cells = list(cells)
+        # make_move only reads the squares of an action ID
+        for code in codes[:ply].tolist():
+            make_move(cells, code)
+        side = side if ply % 2 == 0 else -side
+        return np.array(cells).reshape(BOARD_ROWS, BOARD_COLS), side
+
+    def positions(self, game):
+        """
+        Iterate over the plies of a game.
+
+        Parameters:
+            game (int): index of the game
+        Return:
+            generator: (board before the ply, side to move, action ID) of
+            every ply; boards are new arrays
+        """
+        key, _, codes = self._record(game)
+        side, cells = self._positions[key]
+        cells = list(cells)
+        for code in codes.tolist():
+            action = expand_move(cells, code)
+            yield (np.array(cells).reshape(BOARD_ROWS, BOARD_COLS), side,
+                   action)
+            make_move(cells, code)
+            side = -side
+
+    def __iter__(self):
+        """
+        Iterate over the plies of all games.
+
+        Return:
+            generator: (game index, board, side to move, action ID)
+        """
+        for game in range(len(self)):
+            for board, side, action in self.positions(game):
+                yield game, board, side, action
+
+    def close(self):
+        """
+        Release the memory map.
+        """
+        self._index = None
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
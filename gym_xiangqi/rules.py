@@ -0,0 +1,1049 @@
+"""
+Stateless implementation of the Xiangqi rules.
+
+The functions in this module work on plain boards (10 x 9 arrays of signed
+piece IDs with ally pieces positive and at the bottom, as in
+`XiangQiEnv.state`) and do not need an environment or `Piece` objects. They
+produce the same legal moves as `XiangQiEnv`, so the same rules can be used
+by search agents, data pipelines and tests, and positions can be analyzed
+in parallel across processes.
+
+Internally the board is handled as a flat list of 90 cells indexed by
+`row * 9 + col`, and piece movements are looked up in tables precomputed
+at import time.
+"""
+import numpy as np
+
+from gym_xiangqi.constants import (
+    ORTHOGONAL, DIAGONAL, ELEPHANT_MOVE, HORSE_MOVE,
+    BOARD_ROWS, BOARD_COLS, TOTAL_POS, PIECE_CNT, PIECE_POINTS,
+    PALACE_ALLY_ROW, PALACE_ENEMY_ROW, PALACE_COL,
+    RIVER_LOW, RIVER_HIGH,
+    ALLY, ENEMY, EMPTY,
+    GENERAL, ADVISOR_1, ADVISOR_2, ELEPHANT_1, ELEPHANT_2,
+    HORSE_1, HORSE_2, CHARIOT_1, CHARIOT_2, CANNON_1, CANNON_2,
+    SOLDIER_1, SOLDIER_5,
+)
+
+ACTIONS_PER_PIECE = pow(TOTAL_POS, 2)
+
+# Seed of the Zobrist hashing keys; fixed so that keys are reproducible
+ZOBRIST_SEED = 20210914
+
+# Piece types indexed by absolute piece ID
+KIND_GENERAL = 1
+KIND_ADVISOR = 2
+KIND_ELEPHANT = 3
+KIND_HORSE = 4
+KIND_CHARIOT = 5
+KIND_CANNON = 6
+KIND_SOLDIER = 7
+
+PIECE_KIND = [None] * (PIECE_CNT + 1)
+PIECE_KIND[GENERAL] = KIND_GENERAL
+PIECE_KIND[ADVISOR_1] = PIECE_KIND[ADVISOR_2] = KIND_ADVISOR
+PIECE_KIND[ELEPHANT_1] = PIECE_KIND[ELEPHANT_2] = KIND_ELEPHANT
+PIECE_KIND[HORSE_1] = PIECE_KIND[HORSE_2] = KIND_HORSE
+PIECE_KIND[CHARIOT_1] = PIECE_KIND[CHARIOT_2] = KIND_CHARIOT
+PIECE_KIND[CANNON_1] = PIECE_KIND[CANNON_2] = KIND_CANNON
+for _pid in range(SOLDIER_1, SOLDIER_5 + 1):
+    PIECE_KIND[_pid] = KIND_SOLDIER
+
+
+def _square(r, c):
+    """
+    Convert (row, col) to a flat square index, or None if off the board.
+    """
+    if 0 <= r < BOARD_ROWS and 0 <= c < BOARD_COLS:
+        return r * BOARD_COLS + c
+    return None
+
+
+def _build_tables():
+    """
+    Precompute destination squares of every piece type from every square.
+    Side dependent tables are dictionaries keyed by ALLY and ENEMY.
+    """
+    palace_rows = {ALLY: PALACE_ALLY_ROW, ENEMY: PALACE_ENEMY_ROW}
+    own_half = {ALLY: (RIVER_HIGH, BOARD_ROWS - 1), ENEMY: (0, RIVER_LOW)}
+    # After-river rows and forward direction of soldiers
+    crossed = {ALLY: (0, RIVER_LOW), ENEMY: (RIVER_HIGH, BOARD_ROWS - 1)}
+    forward = {ALLY: ORTHOGONAL[0], ENEMY: ORTHOGONAL[2]}
+
+    rays = []
+    horse = []
+    general = {ALLY: [], ENEMY: []}
+    advisor = {ALLY: [], ENEMY: []}
+    elephant = {ALLY: [], ENEMY: []}
+    soldier = {ALLY: [], ENEMY: []}
+
+    for sq in range(TOTAL_POS):
+        r, c = divmod(sq, BOARD_COLS)
+
+        sq_rays = []
+        for dr, dc in ORTHOGONAL:
+            ray = []
+            nr, nc = r + dr, c + dc
+            while _square(nr, nc) is not None:
+                ray.append(_square(nr, nc))
+                nr, nc = nr + dr, nc + dc
+            sq_rays.append(tuple(ray))
+        rays.append(tuple(sq_rays))
+
+        steps = []
+        for (lr, lc), (dr, dc) in HORSE_MOVE:
+            leg = _square(r + lr, c + lc)
+            end = _square(r + lr + dr, c + lc + dc)
+            if leg is not None and end is not None:
+                steps.append((leg, end))
+        horse.append(tuple(steps))
+
+        for side in (ALLY, ENEMY):
+            low, high = palace_rows[side]
+
+            def in_palace(nr, nc):
+                return (low <= nr <= high
+                        and PALACE_COL[0] <= nc <= PALACE_COL[1])
+
+            general[side].append(tuple(
+                _square(r + dr, c + dc) for dr, dc in ORTHOGONAL
+                if in_palace(r + dr, c + dc)))
+            advisor[side].append(tuple(
+                _square(r + dr, c + dc) for dr, dc in DIAGONAL
+                if in_palace(r + dr, c + dc)))
+
+            low, high = own_half[side]
+            elephant[side].append(tuple(
+                (_square(r + dr // 2, c + dc // 2), _square(r + dr, c + dc))
+                for dr, dc in ELEPHANT_MOVE
+                if low <= r + dr <= high and 0 <= c + dc < BOARD_COLS))
+
+            moves = [forward[side]]
+            low, high = crossed[side]
+            if low <= r <= high:
+                moves += [ORTHOGONAL[1], ORTHOGONAL[3]]
+            soldier[side].append(tuple(
+                _square(r + dr, c + dc) for dr, dc in moves
+                if _square(r + dr, c + dc) is not None))
+
+    return rays, horse, general, advisor, elephant, soldier
+
+
+def _build_attack_tables(horse, general, advisor, elephant, soldier):
+    """
+    Reverse the movement tables of step moving pieces so that attackers of
+    a square can be found by looking from the target square.
+    """
+    def reverse(steps):
+        attacks = [[] for _ in range(TOTAL_POS)]
+        for start in range(TOTAL_POS):
+            for step in steps[start]:
+                if isinstance(step, tuple):     # (blocking square, end)
+                    attacks[step[1]].append((start, step[0]))
+                else:
+                    attacks[step].append(start)
+        return attacks
+
+    return (
+        reverse(horse),
+        {side: reverse(general[side]) for side in (ALLY, ENEMY)},
+        {side: reverse(advisor[side]) for side in (ALLY, ENEMY)},
+        {side: reverse(elephant[side]) for side in (ALLY, ENEMY)},
+        {side: reverse(soldier[side]) for side in (ALLY, ENEMY)},
+    )
+
+
+def _build_zobrist():
+    """
+    Generate random 64-bit keys for every (piece ID, square) pair and for
+    the side to move, as Python integers for fast XOR updates.
+    """
+    rng = np.random.RandomState(ZOBRIST_SEED)
+    keys = rng.randint(0, 2 ** 62, size=(2 * PIECE_CNT + 2, TOTAL_POS),
+                       dtype=np.int64)
+    table = keys[:-1].tolist()
+    table[PIECE_CNT] = [0] * TOTAL_POS      # EMPTY squares do not hash
+    return table, int(keys[-1][0])
+
+
+(RAYS, HORSE_STEPS, GENERAL_STEPS,
+ ADVISOR_STEPS, ELEPHANT_STEPS, SOLDIER_STEPS) = _build_tables()
+
+(HORSE_ATTACKS, GENERAL_ATTACKS, ADVISOR_ATTACKS,
+ ELEPHANT_ATTACKS, SOLDIER_ATTACKS) = _build_attack_tables(
+    HORSE_STEPS, GENERAL_STEPS, ADVISOR_STEPS, ELEPHANT_STEPS, SOLDIER_STEPS)
+
+# Zobrist keys indexed by [piece_id + PIECE_CNT][square], and side key
+ZOBRIST, ZOBRIST_SIDE = _build_zobrist()
+
+
+def _build_exchange_values():
+    """
+    Points won by capturing each piece on each square, as rewarded by the
+    environment: PIECE_POINTS, plus 1 for soldiers across the river.
+    Indexed by [piece_id + PIECE_CNT][square].
+    """
+    table = [[0.] * TOTAL_POS for _ in range(2 * PIECE_CNT + 1)]
+    for piece_id in range(1, PIECE_CNT + 1):
+        is_soldier = PIECE_KIND[piece_id] == KIND_SOLDIER
+        for sq in range(TOTAL_POS):
+            row = sq // BOARD_COLS
+            points = PIECE_POINTS[piece_id]
+            table[PIECE_CNT + piece_id][sq] = (
+                points + (is_soldier and row <= RIVER_LOW))
+            table[PIECE_CNT - piece_id][sq] = (
+                points + (is_soldier and row >= RIVER_HIGH))
+    return table
+
+
+EXCHANGE_VALUES = _build_exchange_values()
+
+
+def to_cells(board):
+    """
+    Convert a board into the flat list of cells used by this module.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+    Return:
+        list: 90 signed piece IDs indexed by `row * 9 + col`
+    """
+    return np.asarray(board).ravel().tolist()
+
+
+def encode_action(piece_id, start, end):
+    """
+    Encode a move given with flat square indices into an action ID.
+    Equivalent to `utils.move_to_action_space`.
+    """
+    return (abs(piece_id) - 1) * ACTIONS_PER_PIECE + start * TOTAL_POS + end
+
+
+def decode_action(action):
+    """
+    Decode an action ID into (piece ID, start square, end square) with flat
+    square indices. Equivalent to `utils.action_space_to_move`.
+    """
+    piece_idx, rest = divmod(int(action), ACTIONS_PER_PIECE)
+    start, end = divmod(rest, TOTAL_POS)
+    return piece_idx + 1, start, end
+
+
+def find_general(cells, side):
+    """
+    Find the square of the given side's general.
+
+    Return:
+        int: flat square index or -1 if the general is not on the board
+    """
+    try:
+        return cells.index(GENERAL * side)
+    except ValueError:
+        return -1
+
+
+def position_key(cells, side):
+    """
+    Compute the Zobrist hash key of a position. Keys of successive
+    positions can be maintained incrementally with `update_key`.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): side to move, ALLY (1) or ENEMY (-1)
+    Return:
+        int: 62-bit position key
+    """
+    key = ZOBRIST_SIDE if side == ENEMY else 0
+    for sq, piece_id in enumerate(cells):
+        if piece_id != EMPTY:
+            key ^= ZOBRIST[piece_id + PIECE_CNT][sq]
+    return key
+
+
+def update_key(key, action, piece_id, captured):
+    """
+    Update a position key for a move, including the change of side to move.
+
+    Parameters:
+        key (int): position key before the move
+        action (int): action ID of the move
+        piece_id (int): signed ID of the moving piece
+        captured (int): signed ID of the captured piece or EMPTY
+    Return:
+        int: position key after the move
+    """
+    start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+    zobrist = ZOBRIST[piece_id + PIECE_CNT]
+    key ^= zobrist[start] ^ zobrist[end] ^ ZOBRIST_SIDE
+    if captured != EMPTY:
+        key ^= ZOBRIST[captured + PIECE_CNT][end]
+    return key
+
+
+def attackers(cells, sq, side):
+    """
+    Find all pieces of a side attacking a square, i.e. pieces that could
+    move to (or capture on) the square by their movement rules.
+
+    Parameters:
+        cells (list): flat board cells
+        sq (int): flat square index of the target
+        side (int): attacking side, ALLY (1) or ENEMY (-1)
+    Return:
+        list: flat square indices of the attacking pieces
+    """
+    result = []
+
+    # Chariots on the first occupied square and cannons on the second one
+    for ray in RAYS[sq]:
+        screen = False
+        for start in ray:
+            piece_id = cells[start] * side
+            if piece_id == EMPTY:
+                continue
+            if piece_id > 0:
+                kind = PIECE_KIND[piece_id]
+                if kind == (KIND_CANNON if screen else KIND_CHARIOT):
+                    result.append(start)
+            if screen:
+                break
+            screen = True
+
+    for start, leg in HORSE_ATTACKS[sq]:
+        piece_id = cells[start] * side
+        if (piece_id > 0 and PIECE_KIND[piece_id] == KIND_HORSE
+                and cells[leg] == EMPTY):
+            result.append(start)
+
+    for start in SOLDIER_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if piece_id > 0 and PIECE_KIND[piece_id] == KIND_SOLDIER:
+            result.append(start)
+
+    for start in GENERAL_ATTACKS[side][sq]:
+        if cells[start] * side == GENERAL:
+            result.append(start)
+
+    for start, eye in ELEPHANT_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if (piece_id > 0 and PIECE_KIND[piece_id] == KIND_ELEPHANT
+                and cells[eye] == EMPTY):
+            result.append(start)
+
+    for start in ADVISOR_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if piece_id > 0 and PIECE_KIND[piece_id] == KIND_ADVISOR:
+            result.append(start)
+
+    return result
+
+
+def in_check(cells, side):
+    """
+    Check if the general of a side is attacked by the opponent (i.e. it is
+    check or "jiang").
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): side whose general is tested, ALLY (1) or ENEMY (-1)
+    Return:
+        bool: True if the general is attacked
+    """
+    general = find_general(cells, side)
+    if general < 0:
+        return False
+    return len(attackers(cells, general, -side)) > 0
+
+
+def piece_targets(cells, side, start):
+    """
+    List pseudo-legal destination squares of the piece on `start`, i.e.
+    every destination allowed by the piece's movement rules without taking
+    the flying general rule into account.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): ALLY (1) or ENEMY (-1), owner of the piece
+        start (int): flat square index of the piece
+    Return:
+        list: flat square indices the piece can move to
+    """
+    kind = PIECE_KIND[cells[start] * side]
+    targets = []
+
+    if kind == KIND_CHARIOT:
+        for ray in RAYS[start]:
+            for end in ray:
+                target = cells[end]
+                if target == EMPTY:
+                    targets.append(end)
+                    continue
+                if target * side < 0:
+                    targets.append(end)
+                break
+    elif kind == KIND_CANNON:
+        for ray in RAYS[start]:
+            screen = False
+            for end in ray:
+                target = cells[end]
+                if not screen:
+                    if target == EMPTY:
+                        targets.append(end)
+                    else:
+                        screen = True
+                elif target != EMPTY:
+                    if target * side < 0:
+                        targets.append(end)
+                    break
+    elif kind == KIND_HORSE:
+        for leg, end in HORSE_STEPS[start]:
+            if cells[leg] == EMPTY and cells[end] * side <= 0:
+                targets.append(end)
+    elif kind == KIND_ELEPHANT:
+        for eye, end in ELEPHANT_STEPS[side][start]:
+            if cells[eye] == EMPTY and cells[end] * side <= 0:
+                targets.append(end)
+    else:
+        if kind == KIND_SOLDIER:
+            steps = SOLDIER_STEPS[side][start]
+        elif kind == KIND_ADVISOR:
+            steps = ADVISOR_STEPS[side][start]
+        else:
+            steps = GENERAL_STEPS[side][start]
+        for end in steps:
+            if cells[end] * side <= 0:
+                targets.append(end)
+
+    return targets
+
+
+def _pieces_between(cells, a, b, skip=-1):
+    """
+    Count pieces strictly between two squares of the same column,
+    ignoring the square `skip`.
+    """
+    lo, hi = min(a, b), max(a, b)
+    return sum(1 for sq in range(lo + BOARD_COLS, hi, BOARD_COLS)
+               if cells[sq] != EMPTY and sq != skip)
+
+
+class _FlyingGeneral:
+    """
+    Detects moves resulting in the two generals facing each other on an
+    open column (flying general), computed once per position so that each
+    candidate move is checked in constant time without making the move.
+    """
+
+    def __init__(self, cells, side):
+        self.cells = cells
+        self.own = find_general(cells, side)
+        self.opp = find_general(cells, -side)
+        self.facing = False
+        if self.own >= 0 and self.opp >= 0:
+            self.col = self.opp % BOARD_COLS
+            if self.own % BOARD_COLS == self.col:
+                self.facing = True
+                self.lo = min(self.own, self.opp)
+                self.hi = max(self.own, self.opp)
+                self.count = _pieces_between(cells, self.own, self.opp)
+
+    def between(self, sq):
+        return sq % BOARD_COLS == self.col and self.lo < sq < self.hi
+
+    def is_flying(self, start, end):
+        """
+        Return True if moving the piece on `start` to `end` leaves the
+        generals facing each other.
+        """
+        if self.opp < 0:
+            return False
+        if abs(self.cells[end]) == GENERAL:
+            # Capturing a general can never result in flying general
+            return False
+        if start == self.own:
+            if end % BOARD_COLS != self.col:
+                return False
+            return _pieces_between(self.cells, end, self.opp, start) == 0
+        if not self.facing:
+            return False
+        count = self.count
+        if self.between(start):
+            count -= 1
+        if self.between(end) and self.cells[end] == EMPTY:
+            count += 1
+        return count == 0
+
+
+def generate_actions(cells, side, strict=False):
+    """
+    Generate legal actions of a side on a flat board. This is the internal
+    counterpart of `legal_actions` for callers already holding flat cells.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): ALLY (1) or ENEMY (-1)
+        strict (bool): also forbid moves leaving the side's own general
+            attacked (see `strict_filter`)
+    Return:
+        list: unsorted legal action IDs
+    """
+    if strict:
+        general = find_general(cells, side)
+        if general >= 0:
+            checkers = attackers(cells, general, -side)
+            if checkers:
+                return generate_evasions(cells, side, general, checkers)
+
+    flying = _FlyingGeneral(cells, side)
+    actions = []
+    for start in range(TOTAL_POS):
+        piece_id = cells[start] * side
+        if piece_id <= 0:
+            continue
+        base = (piece_id - 1) * ACTIONS_PER_PIECE + start * TOTAL_POS
+        for end in piece_targets(cells, side, start):
+            if not flying.is_flying(start, end):
+                actions.append(base + end)
+
+    if strict and general >= 0:
+        actions = strict_filter(cells, side, actions, general)
+    return actions
+
+
+_SLIDERS = (KIND_CHARIOT, KIND_CANNON)
+
+
+def _movers(cells, sq, side):
+    """
+    Find all pieces of a side that can make a quiet move to the empty
+    square `sq`; unlike `attackers`, cannons move without a screen.
+    """
+    result = []
+    for ray in RAYS[sq]:
+        for start in ray:
+            piece_id = cells[start] * side
+            if piece_id == EMPTY:
+                continue
+            if piece_id > 0 and PIECE_KIND[piece_id] in _SLIDERS:
+                result.append(start)
+            break
+
+    for start, leg in HORSE_ATTACKS[sq]:
+        piece_id = cells[start] * side
+        if (piece_id > 0 and PIECE_KIND[piece_id] == KIND_HORSE
+                and cells[leg] == EMPTY):
+            result.append(start)
+
+    for start in SOLDIER_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if piece_id > 0 and PIECE_KIND[piece_id] == KIND_SOLDIER:
+            result.append(start)
+
+    for start, eye in ELEPHANT_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if (piece_id > 0 and PIECE_KIND[piece_id] == KIND_ELEPHANT
+                and cells[eye] == EMPTY):
+            result.append(start)
+
+    for start in ADVISOR_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if piece_id > 0 and PIECE_KIND[piece_id] == KIND_ADVISOR:
+            result.append(start)
+
+    return result
+
+
+def generate_captures(cells, side):
+    """
+    Generate the legal actions of a side capturing an opponent piece, e.g.
+    for quiescence search. Only capture destinations are looked at: the
+    first piece on a chariot ray, the piece behind a cannon screen and the
+    occupied steps of the other pieces.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): ALLY (1) or ENEMY (-1)
+    Return:
+        list: unsorted legal capturing action IDs
+    """
+    flying = _FlyingGeneral(cells, side)
+    actions = []
+    for start in range(TOTAL_POS):
+        piece_id = cells[start] * side
+        if piece_id <= 0:
+            continue
+        kind = PIECE_KIND[piece_id]
+        base = (piece_id - 1) * ACTIONS_PER_PIECE + start * TOTAL_POS
+        targets = []
+
+        if kind in _SLIDERS:
+            # Chariots capture the first piece, cannons the second one
+            skip = 1 if kind == KIND_CANNON else 0
+            for ray in RAYS[start]:
+                seen = 0
+                for end in ray:
+                    if cells[end] == EMPTY:
+                        continue
+                    if seen == skip:
+                        targets.append(end)
+                        break
+                    seen += 1
+        elif kind == KIND_HORSE:
+            targets = [end for leg, end in HORSE_STEPS[start]
+                       if cells[leg] == EMPTY]
+        elif kind == KIND_ELEPHANT:
+            targets = [end for eye, end in ELEPHANT_STEPS[side][start]
+                       if cells[eye] == EMPTY]
+        elif kind == KIND_SOLDIER:
+            targets = SOLDIER_STEPS[side][start]
+        elif kind == KIND_ADVISOR:
+            targets = ADVISOR_STEPS[side][start]
+        else:
+            targets = GENERAL_STEPS[side][start]
+
+        for end in targets:
+            if cells[end] * side < 0 and not flying.is_flying(start, end):
+                actions.append(base + end)
+    return actions
+
+
+def _line_between(a, b):
+    """
+    Squares strictly between two squares of the same row or column.
+    """
+    if a // BOARD_COLS == b // BOARD_COLS:
+        step = 1
+    else:
+        step = BOARD_COLS
+    lo, hi = min(a, b), max(a, b)
+    return range(lo + step, hi, step)
+
+
+def generate_evasions(cells, side, general=None, checkers=None):
+    """
+    Generate the legal actions of a side in check that leave its general
+    unattacked: moving the general, capturing the checking piece, blocking
+    the check, or moving away the screen of a checking cannon. Only the
+    pieces that can do so are considered. Captures of the opponent's
+    general are included since they end the game.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): ALLY (1) or ENEMY (-1), side in check
+        general (int): square of the side's general, if already known
+        checkers (list): squares of the checking pieces, if already known
+    Return:
+        list: unsorted evading action IDs, empty if the side is not in
+        check or has no way to escape it
+    """
+    if general is None:
+        general = find_general(cells, side)
+        if general < 0:
+            return []
+    if checkers is None:
+        checkers = attackers(cells, general, -side)
+    if not checkers:
+        return []
+
+    # Candidate moves as start square -> destinations (None for any)
+    candidates = {general: None}
+
+    def add(starts, end):
+        for start in starts:
+            ends = candidates.setdefault(start, set())
+            if ends is not None:
+                ends.add(end)
+
+    # Capturing the opponent's general ends the game and is always allowed
+    opp_general = find_general(cells, -side)
+    if opp_general >= 0:
+        add(attackers(cells, opp_general, side), opp_general)
+
+    for checker in checkers:
+        add(attackers(cells, checker, side), checker)
+        kind = PIECE_KIND[-cells[checker] * side]
+        if kind == KIND_HORSE:
+            for start, leg in HORSE_ATTACKS[general]:
+                if start == checker:
+                    add(_movers(cells, leg, side), leg)
+        elif kind in _SLIDERS:
+            for sq in _line_between(general, checker):
+                if cells[sq] == EMPTY:
+                    add(_movers(cells, sq, side), sq)
+                elif kind == KIND_CANNON and cells[sq] * side > 0:
+                    candidates[sq] = None   # moving the screen away
+
+    flying = _FlyingGeneral(cells, side)
+    actions = []
+    for start, ends in candidates.items():
+        piece_id = cells[start] * side
+        base = (piece_id - 1) * ACTIONS_PER_PIECE + start * TOTAL_POS
+        targets = piece_targets(cells, side, start)
+        for end in targets if ends is None else ends.intersection(targets):
+            if flying.is_flying(start, end):
+                continue
+            action = base + end
+            if abs(cells[end]) == GENERAL:
+                actions.append(action)      # capturing the general wins
+                continue
+            captured = make_move(cells, action)
+            king = end if start == general else general
+            if not attackers(cells, king, -side):
+                actions.append(action)
+            unmake_move(cells, action, captured)
+    return actions
+
+
+def legal_actions(board, side, strict=False):
+    """
+    Find all legal actions of a side for an arbitrary board position.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): ALLY (1) or ENEMY (-1)
+        strict (bool): also forbid moves leaving the side's own general
+            attacked; by default such moves are allowed as in XiangQiEnv
+    Return:
+        np.array: sorted legal action IDs (int64)
+    """
+    actions = generate_actions(to_cells(board), side, strict)
+    actions.sort()
+    return np.array(actions, dtype=np.int64)
+
+
+def _exposing_squares(cells, side, general):
+    """
+    Find the squares through which a move of a side not in check can expose
+    its general, computed once per position:
+
+    - starts: pieces pinned on a line by a chariot (one piece between), the
+      two pieces between a cannon and the general, and pieces blocking the
+      leg of an attacking horse
+    - ends: empty squares between the general and a cannon with nothing in
+      between, where a piece would become the cannon's screen
+
+    Return:
+        tuple: (set of start squares, set of end squares)
+    """
+    starts = set()
+    ends = set()
+    for ray in RAYS[general]:
+        empty = []
+        between = []
+        for sq in ray:
+            piece_id = cells[sq]
+            if piece_id == EMPTY:
+                if not between:
+                    empty.append(sq)
+                continue
+            if piece_id * side < 0:
+                kind = PIECE_KIND[-piece_id * side]
+                if kind == KIND_CANNON and not between:
+                    ends.update(empty)
+                elif ((kind == KIND_CHARIOT and len(between) == 1)
+                        or (kind == KIND_CANNON and len(between) == 2)):
+                    starts.update(sq for sq in between
+                                  if cells[sq] * side > 0)
+            if len(between) == 2:
+                break
+            between.append(sq)
+
+    for start, leg in HORSE_ATTACKS[general]:
+        if (cells[start] * side < 0
+                and PIECE_KIND[-cells[start] * side] == KIND_HORSE
+                and cells[leg] * side > 0):
+            starts.add(leg)
+    return starts, ends
+
+
+def strict_filter(cells, side, actions, general=None):
+    """
+    Remove the actions leaving the side's own general attacked from actions
+    of a side that is not in check. Pins and discovered attacks are found
+    once per position, so only moves of the general and moves through the
+    exposing squares are verified by making them; capturing the opponent's
+    general is always allowed as it ends the game.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): ALLY (1) or ENEMY (-1)
+        actions (list): pseudo-legal action IDs of the side
+        general (int): square of the side's general, if already known
+    Return:
+        list: the actions that keep the general safe
+    """
+    if general is None:
+        general = find_general(cells, side)
+        if general < 0:
+            return actions
+    starts, ends = _exposing_squares(cells, side, general)
+    starts.add(general)
+
+    result = []
+    for action in actions:
+        start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+        if ((start in starts or end in ends)
+                and abs(cells[end]) != GENERAL):
+            captured = make_move(cells, action)
+            safe = not attackers(cells, end if start == general else general,
+                                 -side)
+            unmake_move(cells, action, captured)
+            if not safe:
+                continue
+        result.append(action)
+    return result
+
+
+def has_legal_move(cells, side, actions=None):
+    """
+    Check if a side has at least one move that does not leave its general
+    attacked, i.e. whether it is neither checkmated nor stalemated. Both
+    are losses for the side to move in Xiangqi.
+
+    Parameters:
+        cells (list): flat board cells
+        side (int): ALLY (1) or ENEMY (-1)
+        actions (list): legal actions of the side under the default rules,
+            if already generated
+    Return:
+        bool: True if the side can still move
+    """
+    general = find_general(cells, side)
+    if general < 0:
+        return False
+    checkers = attackers(cells, general, -side)
+    if checkers:
+        return len(generate_evasions(cells, side, general, checkers)) > 0
+    if actions is None:
+        actions = generate_actions(cells, side)
+
+    # Stop at the first safe move instead of filtering all of them
+    starts, ends = _exposing_squares(cells, side, general)
+    starts.add(general)
+    for action in actions:
+        start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+        if ((start not in starts and end not in ends)
+                or abs(cells[end]) == GENERAL):
+            return True
+        captured = make_move(cells, action)
+        safe = not attackers(cells, end if start == general else general,
+                             -side)
+        unmake_move(cells, action, captured)
+        if safe:
+            return True
+    return False
+
+
+def _least_attacker(cells, sq, side, gone):
+    """
+    Find the least valuable piece of a side attacking a square, treating
+    the squares in `gone` as empty. Like `attackers`, but pieces removed
+    from the board during an exchange may uncover chariots and cannons
+    behind them, free horse legs and elephant eyes, and take away cannon
+    screens.
+
+    Return:
+        tuple: (square, signed piece ID) of the attacker, or None
+    """
+    best = None
+    best_value = None
+
+    def consider(start):
+        nonlocal best, best_value
+        value = EXCHANGE_VALUES[cells[start] + PIECE_CNT][sq]
+        if best is None or value < best_value:
+            best = start
+            best_value = value
+
+    for ray in RAYS[sq]:
+        screen = False
+        for start in ray:
+            if cells[start] == EMPTY or start in gone:
+                continue
+            piece_id = cells[start] * side
+            if piece_id > 0:
+                kind = PIECE_KIND[piece_id]
+                if kind == (KIND_CANNON if screen else KIND_CHARIOT):
+                    consider(start)
+            if screen:
+                break
+            screen = True
+
+    for start, leg in HORSE_ATTACKS[sq]:
+        piece_id = cells[start] * side
+        if (piece_id > 0 and PIECE_KIND[piece_id] == KIND_HORSE
+                and start not in gone
+                and (cells[leg] == EMPTY or leg in gone)):
+            consider(start)
+
+    for start, eye in ELEPHANT_ATTACKS[side][sq]:
+        piece_id = cells[start] * side
+        if (piece_id > 0 and PIECE_KIND[piece_id] == KIND_ELEPHANT
+                and start not in gone
+                and (cells[eye] == EMPTY or eye in gone)):
+            consider(start)
+
+    for attacks, kind in ((SOLDIER_ATTACKS, KIND_SOLDIER),
+                          (ADVISOR_ATTACKS, KIND_ADVISOR),
+                          (GENERAL_ATTACKS, KIND_GENERAL)):
+        for start in attacks[side][sq]:
+            piece_id = cells[start] * side
+            if (piece_id > 0 and PIECE_KIND[piece_id] == kind
+                    and start not in gone):
+                consider(start)
+
+    if best is None:
+        return None
+    return best, cells[best]
+
+
+def static_exchange(cells, action):
+    """
+    Static exchange evaluation (SEE): net points won by the moving side
+    when both sides keep capturing on the destination square of a move
+    with their least valuable attacker, and either side may stop whenever
+    continuing would lose points. Attackers are found from the attack
+    tables without making any move. This is the internal counterpart of
+    `see` for callers already holding flat cells.
+
+    Pinned pieces and the flying general rule are not taken into account,
+    and the exchange stops once a general is captured.
+
+    Parameters:
+        cells (list): flat board cells
+        action (int): action ID of a capture or a quiet move
+    Return:
+        float: points won (negative if lost) in PIECE_POINTS units, with
+        soldiers across the river worth 1 more point as in the rewards
+    """
+    start, end = divmod(action % ACTIONS_PER_PIECE, TOTAL_POS)
+    piece_id = cells[start]
+    side = ALLY if piece_id > 0 else ENEMY
+    values = EXCHANGE_VALUES
+    target = cells[end]
+
+    gain = [values[target + PIECE_CNT][end] if target != EMPTY else 0.]
+    if abs(target) == GENERAL:
+        return gain[0]
+    gone = {start}
+    on_square = piece_id
+    turn = -side
+    while True:
+        attacker = _least_attacker(cells, end, turn, gone)
+        if attacker is None:
+            break
+        # Speculative gain of capturing the piece on the square
+        gain.append(values[on_square + PIECE_CNT][end] - gain[-1])
+        if abs(on_square) == GENERAL:
+            break
+        gone.add(attacker[0])
+        on_square = attacker[1]
+        turn = -turn
+
+    # Either side may decline to capture: minimax back to the first move
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+    return gain[0]
+
+
+def capture_actions(board, side):
+    """
+    Find the legal capturing actions of a side, e.g. for quiescence search.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): ALLY (1) or ENEMY (-1)
+    Return:
+        np.array: sorted capturing action IDs (int64)
+    """
+    actions = generate_captures(to_cells(board), side)
+    actions.sort()
+    return np.array(actions, dtype=np.int64)
+
+
+def evasion_actions(board, side):
+    """
+    Find the actions of a side in check that get its general out of check.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        side (int): ALLY (1) or ENEMY (-1)
+    Return:
+        np.array: sorted evading action IDs (int64), empty if not in check
+    """
+    actions = generate_evasions(to_cells(board), side)
+    actions.sort()
+    return np.array(actions, dtype=np.int64)
+
+
+def see(board, action):
+    """
+    Static exchange evaluation of a move: net points won by the moving side
+    from the sequence of captures on its destination square, with every
+    attacker and defender of the square including cannon screens and
+    blocked horse legs. No move is made. See `static_exchange`.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        action (int): action ID of a capture or a quiet move
+    Return:
+        float: points won (negative if lost) in PIECE_POINTS units
+    """
+    return static_exchange(to_cells(board), action)
+
+
+def make_move(cells, action):
+    """
+    Make a move on a flat board in place without any legality check.
+
+    Parameters:
+        cells (list): flat board cells
+        action (int): action ID
+    Return:
+        int: signed ID of the captured piece (EMPTY if nothing captured)
+    """
+    rest = action % ACTIONS_PER_PIECE
+    start, end = divmod(rest, TOTAL_POS)
+    captured = cells[end]
+    cells[end] = cells[start]
+    cells[start] = EMPTY
+    return captured
+
+
+def unmake_move(cells, action, captured):
+    """
+    Revert a move made with `make_move`.
+
+    Parameters:
+        cells (list): flat board cells
+        action (int): action ID
+        captured (int): value returned by `make_move`
+    """
+    rest = action % ACTIONS_PER_PIECE
+    start, end = divmod(rest, TOTAL_POS)
+    cells[start] = cells[end]
+    cells[end] = captured
+
+
+def apply(board, action):
+    """
+    Apply an action to a board and return the resulting board. The input
+    board is not modified. The action is not checked for legality, but it
+    must move an existing piece.
+
+    Parameters:
+        board (np.array): 10 x 9 board of signed piece IDs
+        action (int): action ID
+    Return:
+        np.array: new board after the move
+    """
+    board = np.array(board)
+    piece_id, start, end = decode_action(action)
+    start = divmod(start, BOARD_COLS)
+    end = divmod(end, BOARD_COLS)
+    if abs(board[start]) != piece_id:
+        raise ValueError("action %r does not move piece %d from %s"
+                         % (action, piece_id, start))
+    board[end] = board[start]
+    board[start] = EMPTY
+    return board
@@ -0,0 +1,348 @@
+"""
+Parallel self-play: generate training games with a pair of agents on a pool
+of worker processes and store them as compressed shards.
+
+Every worker plays its share of the games with its own XiangQiEnv and puts
+each finished game on a bounded queue. A writer process takes the games
+from the queue, groups them into shards of `shard_size` games and writes
+every shard with `np.savez_compressed`, so neither compression nor disk
+writes run in the main process, and workers wait instead of piling games up
+in memory when the writer falls behind. Run it from the command line with
+
+    python -m gym_xiangqi.selfplay --games 1000 --output games \\
+        --ally random --enemy alphabeta:max_depth=2
+
+Shards hold the plies of all their games in order:
+
+- boards (int8, (P, 10, 9)): board before every ply
+- sides (int8, (P, )): side to move, ALLY (1) or ENEMY (-1)
+- actions (int32, (P, )): action played
+- legal_counts (int16, (P, )): number of legal actions of the side to move
+- rewards (float32, (P, )): reward returned by env.step()
+- offsets (int64, (G + 1, )): plies of game i are offsets[i]:offsets[i + 1]
+- outcomes (int8, (G, )): winner of every game, 0 for a draw
+
+Games are deterministic for a given seed and number of workers; their order
+in the shards depends on the scheduling of the workers. For that reason the
+alpha-beta agent searches to a fixed depth (DEFAULT_ALPHABETA_DEPTH) with
+no time limit unless options say otherwise; a `time_limit_ms` makes its
+moves depend on the speed and load of the machine.
+"""
+import argparse
+import ast
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import sys
+import time
+import traceback
+
+import numpy as np
+
+from gym_xiangqi.agents import RandomAgent, AlphaBetaAgent, MCTSAgent
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.constants import ALLY, ENEMY, WIN, LOSE
+
+DEFAULT_SHARD_SIZE = 1000
+DEFAULT_QUEUE_SIZE = 64
+
+# Plies after which a game is stopped and scored as a draw
+DEFAULT_MAX_PLIES = 300
+
+# Search depth of the alpha-beta agent when none is given
+DEFAULT_ALPHABETA_DEPTH = 2
+
+AGENTS = {
+    "random": RandomAgent,
+    "alphabeta": AlphaBetaAgent,
+    "mcts": MCTSAgent,
+}
+
+SHARD_PATTERN = "shard-{:05d}.npz"
+
+
+def parse_agent(spec):
+    """
+    Parse an agent specification of the form "name" or
+    "name:key=value,key=value", e.g. "mcts:num_simulations=200".
+
+    Parameters:
+        spec (str): agent specification; names are keys of AGENTS and
+            values are Python literals
+    Return:
+        tuple: (agent name, dict of constructor arguments)
+    """
+    name, _, options = spec.partition(":")
+    if name not in AGENTS:
+        raise ValueError(f"unknown agent {name!r}, expected one of "
+                         f"{', '.join(AGENTS)}")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, sep, value = option.partition("=")
+        if not sep:
+            raise ValueError(f"option {option!r} of agent {name!r} is not "
+                             "of the form key=value")
+        try:
+            kwargs[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            kwargs[key.strip()] = value.strip()
+    return name, kwargs
+
+
+def _make_agent(spec, seed):
+    name, kwargs = parse_agent(spec) if isinstance(spec, str) else spec
+    kwargs = dict(kwargs)
+    if name == "mcts":
+        kwargs.setdefault("seed", seed)
+    elif name == "alphabeta":
+        kwargs.setdefault("max_depth", DEFAULT_ALPHABETA_DEPTH)
+        kwargs.setdefault("time_limit_ms", None)
+    return AGENTS[name](**kwargs)
+
+
+def play_game(env, agents, max_plies=DEFAULT_MAX_PLIES):
+    """
+    Play one game from the environment's initial position. An agent
+    playing an illegal action raises a ValueError.
+
+    Parameters:
+        env (XiangQiEnv): environment, reset before the game
+        agents (dict): agent of each side, keyed by ALLY and ENEMY
+        max_plies (int): plies after which the game is a draw
+    Return:
+        dict: the game's boards, sides, actions, legal_counts and rewards
+        as in the shards, and its "outcome"
+    """
+    env.reset()
+    for agent in agents.values():
+        if hasattr(agent, "reset"):
+            agent.reset()
+
+    boards, sides, actions, legal_counts, rewards = [], [], [], [], []
+    outcome = 0
+    for _ in range(max_plies):
+        side = env.turn
+        mask = env.ally_actions if side == ALLY else env.enemy_actions
+        action = int(agents[side].move(env))
+        if not mask[action]:
+            # The environment would leave the board unchanged, so the
+            # action could not be recorded with the board it was played in
+            raise ValueError(f"agent {type(agents[side]).__name__} played "
+                             f"illegal action {action}")
+        boards.append(env.state.astype(np.int8))
+        sides.append(side)
+        actions.append(action)
+        legal_counts.append(np.count_nonzero(mask))
+
+        _, reward, done, _ = env.step(action)
+        rewards.append(reward)
+        if done:
+            if reward >= WIN:
+                outcome = side
+            elif reward == LOSE:
+                outcome = -side
+            break
+
+    return {
+        "boards": np.array(boards, dtype=np.int8),
+        "sides": np.array(sides, dtype=np.int8),
+        "actions": np.array(actions, dtype=np.int32),
+        "legal_counts": np.array(legal_counts, dtype=np.int16),
+        "rewards": np.array(rewards, dtype=np.float32),
+        "outcome": outcome,
+    }
+
+
+def _worker(games, ally, enemy, seed, max_plies, env_kwargs, queue):
+    try:
+        random.seed(seed)
+        np.random.seed(seed)
+        env = XiangQiEnv(**env_kwargs)
+        agents = {ALLY: _make_agent(ally, seed),
+                  ENEMY: _make_agent(enemy, seed + 1)}
+        for _ in range(games):
+            queue.put(play_game(env, agents, max_plies))
+    except Exception:
+        queue.put(traceback.format_exc())
+    finally:
+        queue.put(None)
+
+
+def _write_shard(output, index, games):
+    plies = [len(game["actions"]) for game in games]
+    shard = {name: np.concatenate([game[name] for game in games])
+             for name in ("boards", "sides", "actions", "legal_counts",
+                          "rewards")}
+    shard["offsets"] = np.concatenate([[0], np.cumsum(plies)]).astype(
+        np.int64)
+    shard["outcomes"] = np.array([game["outcome"] for game in games],
+                                 dtype=np.int8)
+
+    # Write to a temporary file first so that readers never see a partial
+    # shard
+    path = os.path.join(output, SHARD_PATTERN.format(index))
+    with open(path + ".tmp", "wb") as f:
+        np.savez_compressed(f, **shard)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _writer(output, shard_size, workers, queue, results, log):
+    start = time.perf_counter()
+    stats = {"games": 0, "plies": 0, "shards": 0, "outcomes": {},
+             "errors": []}
+    pending = []
+    running = workers
+    while running:
+        game = queue.get()
+        if game is None:
+            running -= 1
+            continue
+        if isinstance(game, str):
+            stats["errors"].append(game)
+            continue
+
+        pending.append(game)
+        stats["games"] += 1
+        stats["plies"] += len(game["actions"])
+        outcome = stats["outcomes"]
+        outcome[game["outcome"]] = outcome.get(game["outcome"], 0) + 1
+        if len(pending) == shard_size:
+            _write_shard(output, stats["shards"], pending)
+            stats["shards"] += 1
+            pending = []
+            if log is not None:
+                elapsed = time.perf_counter() - start
+                log(f"shard {stats['shards']:>5}: {stats['games']} games, "
+                    f"{stats['games'] / elapsed:.1f} games/s")
+    if pending:
+        _write_shard(output, stats["shards"], pending)
+        stats["shards"] += 1
+    results.put(stats)
+
+
+def selfplay(games, output, ally="random", enemy="random", workers=None,
+             shard_size=DEFAULT_SHARD_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+             max_plies=DEFAULT_MAX_PLIES, seed=0, env_kwargs=None,
+             log=None):
+    """
+    Generate games on a pool of worker processes and write them as shards.
+
+    Parameters:
+        games (int): number of games
+        output (str): directory of the shards, created if needed
+        ally (str): specification of the ALLY agent, see `parse_agent`
+        enemy (str): specification of the ENEMY agent
+        workers (int): number of game playing processes, one per CPU if
+            None
+        shard_size (int): games per shard
+        queue_size (int): finished games waiting for the writer before the
+            workers block
+        max_plies (int): plies after which a game is a draw
+        seed (int): seed of the workers' agents
+        env_kwargs (dict): arguments of XiangQiEnv
+        log (callable): called with a line of text after every shard
+    Return:
+        dict: number of games, plies and shards written, count of every
+        outcome, elapsed seconds, games and plies per second
+    """
+    workers = workers or os.cpu_count()
+    # Check the specifications before starting any process
+    agent_specs = parse_agent(ally), parse_agent(enemy)
+    os.makedirs(output, exist_ok=True)
+
+    context = multiprocessing.get_context()
+    queue = context.Queue(queue_size)
+    results = context.Queue()
+    seeds = np.random.SeedSequence(seed).generate_state(workers)
+
+    start = time.perf_counter()
+    writer = context.Process(
+        target=_writer,
+        args=(output, shard_size, workers, queue, results, log))
+    writer.start()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(games // workers + (i < games % workers), *agent_specs,
+                  int(seeds[i]), max_plies, env_kwargs or {}, queue))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    while True:
+        try:
+            stats = results.get(timeout=1)
+            break
+        except queue_module.Empty:
+            if not writer.is_alive():
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError("the shard writer stopped with exit code "
+                                   f"{writer.exitcode}")
+    for process in processes + [writer]:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    errors = stats.pop("errors")
+    if errors:
+        raise RuntimeError(f"{len(errors)} worker(s) failed:\n{errors[0]}")
+    stats["seconds"] = elapsed
+    stats["games_per_sec"] = stats["games"] / elapsed
+    stats["plies_per_sec"] = stats["plies"] / elapsed
+    return stats
+
+
+def load_shard(path):
+    """
+    Read a shard written by `selfplay`.
+
+    Parameters:
+        path (str): path of the shard
+    Return:
+        dict: the shard's arrays, see the module documentation
+    """
+    with np.load(path) as shard:
+        return {name: shard[name] for name in shard.files}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate self-play games on a pool of worker processes "
+                    "and write them as compressed shards.")
+    parser.add_argument("--games", type=int, required=True)
+    parser.add_argument("--output", required=True,
+                        help="directory of the shards")
+    parser.add_argument("--ally", default="random",
+                        help="ALLY agent, e.g. 'mcts:num_simulations=200' "
+                             f"({', '.join(AGENTS)})")
+    parser.add_argument("--enemy", default="random", help="ENEMY agent")
+    parser.add_argument("--workers", type=int,
+                        help="game playing processes (default: one per CPU)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument("--repetition-limit", type=int)
+    parser.add_argument("--no-capture-limit", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env_kwargs = {"repetition_limit": args.repetition_limit,
+                  "no_capture_limit": args.no_capture_limit}
+    stats = selfplay(args.games, args.output, args.ally, args.enemy,
+                     args.workers, args.shard_size, args.queue_size,
+                     args.max_plies, args.seed, env_kwargs, log=print)
+    print(f"games  : {stats['games']} in {stats['shards']} shard(s)")
+    print(f"results: {stats['outcomes'].get(ALLY, 0)} ally wins, "
+          f"{stats['outcomes'].get(ENEMY, 0)} enemy wins, "
+          f"{stats['outcomes'].get(0, 0)} draws")
+    print(f"time   : {stats['seconds']:.1f} s")
+    print(f"games/s: {stats['games_per_sec']:.2f}")
+    print(f"plies/s: {stats['plies_per_sec']:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Board symmetries of Xiangqi used to augment training data.
+
+The game is symmetric under two transformations:
+
+- MIRROR: left-right mirroring of the board. Pieces keep their side but the
+  numbered piece IDs swap (ADVISOR_1 <-> ADVISOR_2, SOLDIER_1 <-> SOLDIER_5,
+  ...) so that the initial board mirrors onto itself.
+- ROTATE: 180 degree rotation of the board combined with a color swap.
+  Ally pieces become enemy pieces and vice versa, which also means the side
+  to move is swapped. The enemy's initial layout is exactly the rotated
+  ally layout, so piece IDs do not need relabeling.
+
+Both transformations and their composition are involutions: applying one
+twice gives back the original position. Every transform is backed by a
+permutation array precomputed at import time, so remapping actions,
+action masks or batches of boards is a single NumPy gather.
+"""
+import numpy as np
+
+from gym_xiangqi.constants import (
+    BOARD_ROWS, BOARD_COLS,
+    TOTAL_POS, PIECE_CNT,
+)
+
+# Symmetry IDs
+IDENTITY = 0
+MIRROR = 1
+ROTATE = 2
+ROTATE_MIRROR = 3
+
+SYMMETRIES = (IDENTITY, MIRROR, ROTATE, ROTATE_MIRROR)
+
+# Piece ID relabeling for a left-right mirror, indexed by absolute piece ID
+MIRROR_PIECE_ID = [
+    0,                      # EMPTY
+    1,                      # GENERAL
+    3, 2,                   # ADVISOR_1 <-> ADVISOR_2
+    5, 4,                   # ELEPHANT_1 <-> ELEPHANT_2
+    7, 6,                   # HORSE_1 <-> HORSE_2
+    9, 8,                   # CHARIOT_1 <-> CHARIOT_2
+    11, 10,                 # CANNON_1 <-> CANNON_2
+    16, 15, 14, 13, 12,     # SOLDIER_1 <-> SOLDIER_5, SOLDIER_2 <-> SOLDIER_4
+]
+
+
+def _build_piece_tables():
+    """
+    Build signed piece ID lookup tables for every symmetry.
+
+    Return:
+        np.array of shape (4, 2 * PIECE_CNT + 1) indexed by
+        [symmetry, piece_id + PIECE_CNT]
+    """
+    ids = np.arange(-PIECE_CNT, PIECE_CNT + 1)
+    mirrored = np.sign(ids) * np.array(MIRROR_PIECE_ID)[np.abs(ids)]
+    return np.stack([ids, mirrored, -ids, -mirrored])
+
+
+def _build_square_tables():
+    """
+    Build flat square index lookup tables for every symmetry.
+
+    Return:
+        np.array of shape (4, TOTAL_POS) indexed by [symmetry, square]
+    """
+    rows, cols = np.divmod(np.arange(TOTAL_POS), BOARD_COLS)
+    identity = rows * BOARD_COLS + cols
+    mirror = rows * BOARD_COLS + (BOARD_COLS - 1 - cols)
+    rotate = (TOTAL_POS - 1) - identity
+    rotate_mirror = (BOARD_ROWS - 1 - rows) * BOARD_COLS + cols
+    return np.stack([identity, mirror, rotate, rotate_mirror])
+
+
+def _build_action_tables(piece_tables, square_tables):
+    """
+    Build action ID permutations for every symmetry.
+
+    Return:
+        np.array of shape (4, PIECE_CNT * TOTAL_POS ** 2) indexed by
+        [symmetry, action]
+    """
+    actions = np.arange(PIECE_CNT * pow(TOTAL_POS, 2))
+    piece_idx, rest = np.divmod(actions, pow(TOTAL_POS, 2))
+    start, end = np.divmod(rest, TOTAL_POS)
+
+    tables = []
+    for sym in SYMMETRIES:
+        # Action IDs use absolute piece IDs (1 to 16)
+        pid = np.abs(piece_tables[sym][piece_idx + 1 + PIECE_CNT])
+        tables.append((pid - 1) * pow(TOTAL_POS, 2)
+                      + square_tables[sym][start] * TOTAL_POS
+                      + square_tables[sym][end])
+    return np.stack(tables)
+
+
+PIECE_ID_TABLES = _build_piece_tables()
+SQUARE_TABLES = _build_square_tables()
+ACTION_TABLES = _build_action_tables(PIECE_ID_TABLES, SQUARE_TABLES)
+
+
+def transform_board(boards, symmetry):
+    """
+    Apply a symmetry to a board or a batch of boards.
+
+    Parameters:
+        boards (np.array): array of shape (..., 10, 9) with signed piece IDs
+        symmetry (int): one of IDENTITY, MIRROR, ROTATE or ROTATE_MIRROR
+    Return:
+        np.array: transformed board(s) with the same shape and dtype
+    """
+    boards = np.asarray(boards)
+    table = PIECE_ID_TABLES[symmetry].astype(boards.dtype)
+    result = table[boards + PIECE_CNT]
+    if symmetry in (MIRROR, ROTATE):
+        result = result[..., ::-1]
+    if symmetry in (ROTATE, ROTATE_MIRROR):
+        result = result[..., ::-1, :]
+    return np.ascontiguousarray(result)
+
+
+def transform_actions(actions, symmetry):
+    """
+    Apply a symmetry to an action ID or an array of action IDs.
+
+    Parameters:
+        actions (int or np.array): action ID(s) within the action space
+        symmetry (int): one of IDENTITY, MIRROR, ROTATE or ROTATE_MIRROR
+    Return:
+        int or np.array: transformed action ID(s)
+    """
+    return ACTION_TABLES[symmetry][actions]
+
+
+def transform_action_mask(masks, symmetry):
+    """
+    Apply a symmetry to an action mask or a batch of action masks such as
+    `XiangQiEnv.ally_actions`. Since every symmetry is an involution, its
+    action permutation is also its own inverse.
+
+    Parameters:
+        masks (np.array): array of shape (..., 16 * 90 * 90)
+        symmetry (int): one of IDENTITY, MIRROR, ROTATE or ROTATE_MIRROR
+    Return:
+        np.array: transformed mask(s) with the same shape and dtype
+    """
+    return np.take(masks, ACTION_TABLES[symmetry], axis=-1)
+
+
+def augment(boards, actions=None, masks=None):
+    """
+    Expand a batch of training samples with all board symmetries.
+
+    The result of each symmetry is concatenated along the first axis in the
+    order of SYMMETRIES, i.e. sample i of symmetry s is found at index
+    s * N + i. Note that samples produced by ROTATE and ROTATE_MIRROR have
+    the side to move swapped.
+
+    Parameters:
+        boards (np.array): array of shape (N, 10, 9)
+        actions (np.array): optional array of N action IDs
+        masks (np.array): optional array of shape (N, 16 * 90 * 90)
+    Return:
+        tuple: augmented boards, actions and masks (None if not given)
+    """
+    boards = np.concatenate([transform_board(boards, sym)
+                             for sym in SYMMETRIES])
+    if actions is not None:
+        actions = ACTION_TABLES[:, np.asarray(actions)].reshape(-1)
+    if masks is not None:
+        masks = np.concatenate([transform_action_mask(masks, sym)
+                                for sym in SYMMETRIES])
+    return boards, actions, masks
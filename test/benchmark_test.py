@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from gym_xiangqi.benchmark import (
+    SCENARIOS, run, compare, save_results, load_results,
+)
+from gym_xiangqi.benchmark.__main__ import main
+
+
+def _results(**medians):
+    return {"results": {
+        name: {"unit": SCENARIOS[name].unit,
+               "higher_is_better": SCENARIOS[name].higher_is_better,
+               "median": median}
+        for name, median in medians.items()}}
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        results = run(["reset", "get-possible-actions"], repeat=2, warmup=1)
+        self.assertEqual(set(results["results"]),
+                         {"reset", "get-possible-actions"})
+        for result in results["results"].values():
+            self.assertEqual(len(result["samples"]), 2)
+            self.assertGreater(result["median"], 0)
+            self.assertLessEqual(result["min"], result["max"])
+
+    def test_compare(self):
+        baseline = _results(**{"reset": 40., "random-playout": 1000.})
+        current = _results(**{"reset": 50., "random-playout": 1050.})
+        rows = {row[0]: row for row in compare(baseline, current, 0.1)}
+        # Latency grew by 25%, throughput improved by 5%
+        self.assertAlmostEqual(rows["reset"][3], -0.25)
+        self.assertTrue(rows["reset"][4])
+        self.assertAlmostEqual(rows["random-playout"][3], 0.05)
+        self.assertFalse(rows["random-playout"][4])
+        self.assertFalse(compare(baseline, current, 0.3)[0][4])
+
+    def test_compare_mode_exit_status(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            self.assertEqual(main(["-s", "reset", "--repeat", "2",
+                                   "--output", path]), 0)
+            baseline = load_results(path)
+            self.assertIn("reset", baseline["results"])
+
+            # A baseline 1000 times faster than this run must fail
+            baseline["results"]["reset"]["median"] /= 1000
+            faster = os.path.join(tmp, "faster.json")
+            save_results(baseline, faster)
+            self.assertEqual(main(["-s", "reset", "--repeat", "2",
+                                   "--compare", faster]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
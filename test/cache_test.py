@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.cache import LegalMoveCache, get_shared_cache
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.rules import (
+    legal_actions, make_move, position_key, to_cells,
+)
+from gym_xiangqi.constants import INITIAL_BOARD, ALLY, ENEMY
+
+
+class TestLegalMoveCache(unittest.TestCase):
+
+    def test_lookup_hit_and_miss(self):
+        cache = LegalMoveCache(capacity=4)
+        cells = to_cells(INITIAL_BOARD)
+        key = position_key(cells, ALLY)
+
+        actions, check = cache.lookup(key, cells, ALLY)
+        self.assertTrue(np.array_equal(
+            actions, legal_actions(np.array(INITIAL_BOARD), ALLY)))
+        self.assertFalse(check)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        cached, _ = cache.lookup(key, cells, ALLY)
+        self.assertIs(cached, actions)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertFalse(actions.flags.writeable)
+
+        # The side to move is part of the key
+        self.assertNotIn(position_key(cells, ENEMY), cache)
+
+    def test_lru_eviction(self):
+        cache = LegalMoveCache(capacity=2)
+        cache.put(1, np.array([1]), False)
+        cache.put(2, np.array([2]), False)
+        cache.get(1)
+        cache.put(3, np.array([3]), True)
+
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
+        self.assertEqual(cache.evictions, 1)
+
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(3, cache)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+        with self.assertRaises(ValueError):
+            LegalMoveCache(capacity=0)
+
+    def test_strict_entries(self):
+        """
+        Legacy and strict legal moves of a position are cached separately
+        78727, 75172, 78961: red cannon gives jiang over the black cannon
+        """
+        cache = LegalMoveCache()
+        board = np.array(INITIAL_BOARD)
+        cells = to_cells(board)
+        for action in [78727, 75172, 78961]:
+            make_move(cells, action)
+        key = position_key(cells, ENEMY)
+
+        legacy, check = cache.lookup(key, cells, ENEMY)
+        strict, strict_check = cache.lookup(key, cells, ENEMY, strict=True)
+        self.assertTrue(check and strict_check)
+        self.assertEqual(len(cache), 2)
+        self.assertLess(len(strict), len(legacy))
+        self.assertTrue(np.isin(strict, legacy).all())
+
+    def test_env_with_cache(self):
+        """
+        Two environments sharing a cache replay the same moves and produce
+        the same legal moves as an environment without cache.
+        78727: Ally CANNON_1 (7, 1) -> (7, 4)
+        75172: Enemy CANNON_1 (2, 7) -> (2, 4)
+        78961: Ally CANNON_1 (7, 4) -> (3, 4)
+        """
+        cache = LegalMoveCache()
+        envs = [XiangQiEnv(legal_cache=cache), XiangQiEnv(legal_cache=cache),
+                XiangQiEnv()]
+        for action in [78727, 75172, 78961]:
+            for env in envs:
+                env.step(action)
+            for env in envs[1:]:
+                self.assertTrue(np.array_equal(env.ally_actions,
+                                               envs[0].ally_actions))
+                self.assertTrue(np.array_equal(env.enemy_actions,
+                                               envs[0].enemy_actions))
+
+        self.assertGreater(cache.hits, cache.misses)
+        self.assertIs(XiangQiEnv(legal_cache=True)._legal_cache,
+                      get_shared_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
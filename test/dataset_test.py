@@ -0,0 +1,145 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.dataset import (
+    build_dataset, load_dataset, iterate_minibatches, board_planes,
+)
+from gym_xiangqi.records import GameRecordWriter, compact_move
+from gym_xiangqi.rules import generate_actions, make_move, to_cells
+from gym_xiangqi.symmetry import ROTATE, transform_board
+from gym_xiangqi.constants import INITIAL_BOARD, ALLY, ENEMY, GENERAL
+
+
+def _random_game(plies, seed):
+    rng = random.Random(seed)
+    cells = to_cells(INITIAL_BOARD)
+    side = ALLY
+    actions = []
+    for _ in range(plies):
+        action = rng.choice(generate_actions(cells, side))
+        actions.append(action)
+        if abs(make_move(cells, action)) == GENERAL:
+            break
+        side = -side
+    return actions
+
+
+class TestDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.records = os.path.join(self.tmp.name, "games.xqr")
+        self.games = [_random_game(20 + seed, seed) for seed in range(5)]
+        with GameRecordWriter(self.records) as writer:
+            for i, actions in enumerate(self.games):
+                writer.write(actions, (ALLY, ENEMY, 0)[i % 3])
+        self.positions = sum(len(actions) for actions in self.games)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_build(self):
+        output = os.path.join(self.tmp.name, "absolute")
+        meta = build_dataset(self.records, output, workers=1, chunk_games=2,
+                             canonical=False)
+        self.assertEqual((meta["positions"], meta["games"]),
+                         (self.positions, 5))
+        arrays = load_dataset(output)
+        self.assertEqual(arrays["observations"].shape,
+                         (self.positions, 10, 9))
+        self.assertEqual(arrays["legal"].shape, (self.positions, 1013))
+
+        # Second position of the first game
+        actions = self.games[0]
+        cells = to_cells(INITIAL_BOARD)
+        make_move(cells, actions[0])
+        np.testing.assert_array_equal(arrays["observations"][1],
+                                      np.reshape(cells, (10, 9)))
+        self.assertEqual(arrays["actions"][1], compact_move(actions[1]))
+        self.assertEqual(arrays["sides"][1], ENEMY)
+        self.assertEqual(arrays["outcomes"][1], -1)
+        legal = np.unpackbits(arrays["legal"][1], count=8100)
+        self.assertEqual(sorted(np.flatnonzero(legal)),
+                         sorted(compact_move(action) for action
+                                in generate_actions(cells, ENEMY)))
+
+        # Every move played is legal, and draws have no outcome
+        batch, = iterate_minibatches(output, self.positions, shuffle=False)
+        self.assertTrue(batch["legal"][np.arange(self.positions),
+                                       batch["actions"]].all())
+        third = sum(len(actions) for actions in self.games[:2])
+        self.assertFalse(batch["outcomes"][third:third + 3].any())
+
+    def test_canonical_planes(self):
+        output = os.path.join(self.tmp.name, "canonical")
+        build_dataset(self.records, output, workers=2, chunk_games=2,
+                      planes=True, packed=False)
+        arrays = load_dataset(output)
+        self.assertEqual(arrays["observations"].shape,
+                         (self.positions, 14, 10, 9))
+        self.assertEqual(arrays["legal"].dtype, np.bool_)
+
+        cells = to_cells(INITIAL_BOARD)
+        make_move(cells, self.games[0][0])
+        rotated = transform_board(np.reshape(cells, (10, 9)), ROTATE)
+        np.testing.assert_array_equal(arrays["observations"][1],
+                                      board_planes(rotated))
+        self.assertEqual(arrays["outcomes"][1], -1)
+        self.assertTrue(arrays["legal"][np.arange(self.positions),
+                                        arrays["actions"]].all())
+        # The general of the side to move is always in the bottom palace
+        self.assertTrue(arrays["observations"][:, 0, 7:].any(axis=(1, 2))
+                        .all())
+
+    def test_resume(self):
+        output = os.path.join(self.tmp.name, "resume")
+        build_dataset(self.records, output, workers=1, chunk_games=2)
+        expected = {name: np.array(array)
+                    for name, array in load_dataset(output).items()}
+
+        # Forget the last chunk and clear its rows
+        done = np.load(os.path.join(output, "chunks.npy"), mmap_mode="r+")
+        done[-1] = 0
+        done.flush()
+        del done
+        last = self.positions - len(self.games[-1])
+        observations = np.load(os.path.join(output, "observations.npy"),
+                               mmap_mode="r+")
+        observations[last:] = 0
+        observations.flush()
+        del observations
+        with self.assertRaises(ValueError):
+            load_dataset(output)
+        lines = []
+        build_dataset(self.records, output, workers=1, chunk_games=2,
+                      log=lines.append)
+        self.assertEqual(len(lines), 1)
+        for name, array in load_dataset(output).items():
+            np.testing.assert_array_equal(array, expected[name])
+
+        with self.assertRaises(ValueError):
+            build_dataset(self.records, output, chunk_games=2, planes=True)
+
+    def test_minibatches(self):
+        output = os.path.join(self.tmp.name, "batches")
+        build_dataset(self.records, output, workers=1)
+        batches = list(iterate_minibatches(output, 16, seed=3))
+        self.assertEqual(sum(len(batch["actions"]) for batch in batches),
+                         self.positions)
+        self.assertEqual(batches[0]["legal"].shape, (16, 8100))
+        again = list(iterate_minibatches(output, 16, seed=3))
+        np.testing.assert_array_equal(batches[0]["actions"],
+                                      again[0]["actions"])
+
+        dropped = list(iterate_minibatches(output, 16, seed=3,
+                                           drop_last=True, unpack=False))
+        self.assertEqual(len(dropped), self.positions // 16)
+        self.assertEqual(dropped[0]["legal"].shape, (16, 1013))
+
+
+if __name__ == '__main__':
+    unittest.main()
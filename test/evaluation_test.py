@@ -0,0 +1,97 @@
+import random
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.evaluation import (
+    MOBILITY_WEIGHT, PIECE_SQUARE_VALUES,
+    evaluate, evaluate_many, material_pst, update_eval,
+)
+from gym_xiangqi.rules import ACTIONS_PER_PIECE, legal_actions, to_cells
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, TOTAL_POS, PIECE_CNT, ALLY, ENEMY, EMPTY, SOLDIER_1,
+)
+
+MAX_ROUNDS = 200
+
+
+class TestEvaluation(unittest.TestCase):
+
+    def test_initial_position_is_balanced(self):
+        board = np.array(INITIAL_BOARD)
+        self.assertAlmostEqual(evaluate(board), 0.)
+        self.assertAlmostEqual(evaluate(board, ENEMY), 0.)
+        self.assertAlmostEqual(evaluate_many(board[None])[0], 0.)
+
+    def test_tables_are_rotated_for_enemy(self):
+        for piece_id in range(1, PIECE_CNT + 1):
+            ally = PIECE_SQUARE_VALUES[PIECE_CNT + piece_id]
+            enemy = PIECE_SQUARE_VALUES[PIECE_CNT - piece_id]
+            self.assertTrue(np.allclose(enemy, -ally[::-1]))
+        self.assertTrue(np.all(PIECE_SQUARE_VALUES[PIECE_CNT] == 0))
+
+    def test_soldier_crossing_river(self):
+        board = np.array(INITIAL_BOARD)
+        row, col = np.argwhere(board == SOLDIER_1)[0]
+        before = evaluate(board, use_mobility=False)
+        board[row][col] = EMPTY
+        board[row - 2][col] = SOLDIER_1
+        # One point for crossing the river plus a positional bonus
+        self.assertGreaterEqual(evaluate(board, use_mobility=False),
+                                before + 1)
+
+    def test_incremental_matches_full_evaluation(self):
+        env = XiangQiEnv()
+        rng = random.Random(0)
+        boards = []
+        sides = []
+        expected = []
+        for _ in range(MAX_ROUNDS):
+            cells = to_cells(env.state)
+            player = env.turn
+            mask = env.ally_actions if player == ALLY else env.enemy_actions
+            action = int(rng.choice(np.where(mask == 1)[0]))
+            piece_id = cells[action % ACTIONS_PER_PIECE // TOTAL_POS]
+            captured = cells[action % TOTAL_POS]
+            score = update_eval(env.evaluate(use_mobility=False), action,
+                                piece_id, captured)
+            _, _, done, _ = env.step(action)
+            self.assertAlmostEqual(score, material_pst(to_cells(env.state)))
+            self.assertAlmostEqual(env.evaluate(use_mobility=False), score)
+            self.assertAlmostEqual(env.evaluate(), evaluate(env.state))
+            self.assertAlmostEqual(env.evaluate(ENEMY),
+                                   evaluate(env.state, ENEMY))
+            boards.append(np.array(env.state))
+            sides.append(player)
+            expected.append(evaluate(env.state, player))
+            if done:
+                break
+
+        result = evaluate_many(np.array(boards), np.array(sides),
+                               use_mobility=True)
+        self.assertTrue(np.allclose(result, expected))
+
+    def test_strict_mobility(self):
+        # The black chariot is pinned to its general by the red chariot, so
+        # both sides' moves must be counted under the strict rules
+        env = XiangQiEnv(strict_rules=True)
+        env.reset(options={"fen": "4k4/9/4r4/9/9/9/9/9/4R4/3K5 w"})
+        state = env.state
+        ally_moves = len(legal_actions(state, ALLY, strict=True))
+        enemy_moves = len(legal_actions(state, ENEMY, strict=True))
+        self.assertLess(enemy_moves, len(legal_actions(state, ENEMY)))
+        self.assertAlmostEqual(
+            env.evaluate(),
+            material_pst(to_cells(state))
+            + MOBILITY_WEIGHT * (ally_moves - enemy_moves))
+
+    def test_reset_restores_evaluation(self):
+        env = XiangQiEnv()
+        env.step(int(np.where(env.ally_actions == 1)[0][0]))
+        env.reset()
+        self.assertAlmostEqual(env.evaluate(), 0.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import io
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.fen import INITIAL_FEN, from_fen, to_fen
+from gym_xiangqi.notation import parse_iccs, read_games, write_game
+from gym_xiangqi.rules import legal_actions
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, RED, BLACK, ALLY, ENEMY, ALIVE, DEAD,
+)
+
+# Red chariot and advisors against a black general and advisor, black to
+# move at move 40
+ENDGAME_FEN = "3k5/4a4/9/9/9/9/9/9/4A4/3AK1R2 b - - 12 40"
+
+
+class TestFen(unittest.TestCase):
+
+    def test_initial_position(self):
+        for ally_color in (RED, BLACK):
+            board, side, halfmove, fullmove = from_fen(INITIAL_FEN,
+                                                       ally_color)
+            np.testing.assert_array_equal(board, INITIAL_BOARD)
+            self.assertEqual(side, ALLY if ally_color == RED else ENEMY)
+            self.assertEqual((halfmove, fullmove), (0, 1))
+            self.assertEqual(to_fen(board, side, ally_color), INITIAL_FEN)
+
+    def test_endgame(self):
+        board, side, halfmove, fullmove = from_fen(ENDGAME_FEN)
+        self.assertEqual((side, halfmove, fullmove), (ENEMY, 12, 40))
+        self.assertEqual(board[0, 3], -1)
+        self.assertEqual(board[1, 4], -2)
+        self.assertEqual(board[9, 6], 8)
+        self.assertEqual(sorted(board[board > 0]), [1, 2, 3, 8])
+        self.assertEqual(to_fen(board, side, halfmove=12, fullmove=40),
+                         ENDGAME_FEN)
+
+        # Seen from black, the black pieces are the ally's
+        black, black_side, _, _ = from_fen(ENDGAME_FEN, BLACK)
+        self.assertEqual(black_side, ALLY)
+        self.assertEqual(black[9, 5], 1)
+        self.assertEqual(sorted(black[black < 0]), [-8, -3, -2, -1])
+
+        # Board only, with horse and elephant letters
+        board, side, _, _ = from_fen("4k4/9/9/9/9/9/9/9/4H4/2E1K4")
+        self.assertEqual(side, ALLY)
+        self.assertEqual((board[8, 4], board[9, 2]), (6, 4))
+
+    def test_invalid(self):
+        for fen in ("", "9/9/9", "4k4/9/9/9/9/9/9/9/9/4K5",
+                    "4k4/9/9/9/9/9/9/9/9/4X4", "9/9/9/9/9/9/9/9/9/4K4",
+                    "4k4/9/9/9/9/9/9/9/RRR6/4K4",
+                    "4k4/9/9/9/9/9/9/9/9/4K4 x"):
+            with self.assertRaises(ValueError):
+                from_fen(fen)
+
+    def test_env_reset(self):
+        env = XiangQiEnv()
+        self.assertEqual(env.to_fen(), INITIAL_FEN)
+
+        state = env.reset(options={"fen": ENDGAME_FEN})
+        board, side, _, _ = from_fen(ENDGAME_FEN)
+        np.testing.assert_array_equal(state, board)
+        self.assertEqual(env.turn, ENEMY)
+        self.assertEqual(env.to_fen(), ENDGAME_FEN)
+        np.testing.assert_array_equal(
+            np.flatnonzero(env.enemy_actions),
+            legal_actions(board, ENEMY))
+        self.assertEqual(env.ally_piece[9].state, DEAD)
+        self.assertEqual((env.ally_piece[8].row, env.ally_piece[8].col),
+                         (9, 6))
+        self.assertEqual(env.ally_piece[8].state, ALIVE)
+
+        # Move counters continue from the FEN
+        action = int(np.flatnonzero(env.enemy_actions)[0])
+        _, _, done, _ = env.step(action)
+        self.assertFalse(done)
+        self.assertTrue(env.to_fen().endswith(" w - - 13 41"))
+
+        # Back to the initial position with all pieces
+        env.reset()
+        self.assertEqual(env.to_fen(), INITIAL_FEN)
+        self.assertTrue(all(piece.state == ALIVE
+                            for piece in env.ally_piece[1:]
+                            + env.enemy_piece[1:]))
+
+        black = XiangQiEnv(ally_color=BLACK)
+        black.reset(options={"fen": ENDGAME_FEN})
+        self.assertEqual(black.turn, ALLY)
+        self.assertEqual(black.to_fen(), ENDGAME_FEN)
+
+    def test_move_number_after_game_end(self):
+        # Black's chariot takes the red general at move 1
+        env = XiangQiEnv()
+        board = env.reset(options={"fen": "4k4/9/9/9/9/9/9/9/4r4/4K4 b"})
+        _, _, done, _ = env.step(parse_iccs(board, ENEMY, "e1e0"))
+        self.assertTrue(done)
+        self.assertTrue(env.to_fen().endswith(" 2"))
+
+    def test_notation(self):
+        board, side, _, _ = from_fen(ENDGAME_FEN)
+        actions = [int(legal_actions(board, side)[0])]
+        for notation in ("iccs", "wxf"):
+            text = io.StringIO()
+            write_game(text, actions, notation, fen=ENDGAME_FEN)
+            self.assertIn("40...", text.getvalue())
+            game, = read_games(io.StringIO(text.getvalue()))
+            np.testing.assert_array_equal(game["board"], board)
+            self.assertEqual(game["side"], ENEMY)
+            self.assertEqual(game["actions"], actions)
+
+
+if __name__ == '__main__':
+    unittest.main()
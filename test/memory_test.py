@@ -0,0 +1,31 @@
+import unittest
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.memory import ENV_MEMORY_BUDGET, memory_report
+
+COMPONENTS = ("board", "masks", "legal", "history", "pieces", "gui", "other")
+
+
+class TestMemory(unittest.TestCase):
+
+    def test_headless_env_budget(self):
+        report = memory_report()
+        self.assertLessEqual(report["traced"], ENV_MEMORY_BUDGET)
+        self.assertLessEqual(report["total"], ENV_MEMORY_BUDGET)
+
+    def test_breakdown(self):
+        env = XiangQiEnv()
+        report = memory_report(env)
+        self.assertIsNone(report["traced"])
+        self.assertEqual(report["total"],
+                         sum(report[name] for name in COMPONENTS))
+        self.assertGreaterEqual(report["masks"],
+                                env.ally_actions.nbytes
+                                + env.enemy_actions.nbytes)
+        self.assertGreaterEqual(report["board"], env.state.nbytes)
+        self.assertGreater(report["pieces"], 0)
+        self.assertGreater(report["shared"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
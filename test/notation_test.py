@@ -0,0 +1,197 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.notation import (
+    NotationError, to_iccs, parse_iccs, to_wxf, parse_wxf, parse_move,
+    read_games, read_positions, read_games_parallel, write_game,
+)
+from gym_xiangqi.rules import generate_actions, make_move, apply, to_cells
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, BOARD_ROWS, BOARD_COLS, ALLY, ENEMY, GENERAL,
+)
+
+DATABASE = """\
+[Event "Central cannon"]
+[Result "1-0"]
+
+1. h2e2 h9g7 2. h0g2 i9h9 {main line} 3. i0h0 (3. g3g4) b9c7 1-0
+
+[Event "Illegal move"]
+
+1. h2e2 h2e2 *
+
+[Event "WXF"]
+[Format "WXF"]
+
+1. C2=5 H8+7 2. H2+3 R9=8 ; comment
+3. R1=2 1/2-1/2
+
+1. b2e2 b9c7 0-1
+"""
+
+
+def _random_game(seed, plies):
+    rng = random.Random(seed)
+    cells = to_cells(INITIAL_BOARD)
+    side = ALLY
+    actions = []
+    for _ in range(plies):
+        action = rng.choice(generate_actions(cells, side))
+        actions.append(action)
+        if abs(make_move(cells, action)) == GENERAL:
+            break
+        side = -side
+    return actions
+
+
+class TestNotation(unittest.TestCase):
+
+    def test_moves(self):
+        board = np.array(INITIAL_BOARD)
+        cannon = parse_iccs(board, ALLY, "h2e2")
+        self.assertEqual(parse_iccs(board, ALLY, "H2-E2"), cannon)
+        self.assertEqual(parse_wxf(board, ALLY, "C2=5"), cannon)
+        self.assertEqual(parse_move(board, ALLY, "c2.5"), cannon)
+        self.assertEqual(to_iccs(cannon), "h2e2")
+        self.assertEqual(to_wxf(board, cannon), "C2=5")
+
+        board = apply(board, cannon)
+        horse = parse_iccs(board, ENEMY, "h9g7")
+        self.assertEqual(parse_wxf(board, ENEMY, "H8+7"), horse)
+        self.assertEqual(to_wxf(board, horse), "H8+7")
+
+        for move in ("h2e2", "i9i5", "z1a1", "C5=4", "X2=5"):
+            with self.assertRaises(NotationError):
+                parse_move(board, ENEMY, move)
+
+    def test_tandem_pieces(self):
+        board = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+        board[9, 4] = 1
+        board[0, 3] = -1
+        board[5, 0] = 8
+        board[7, 0] = 9
+        front = parse_wxf(board, ALLY, "R+=4")
+        self.assertEqual(parse_wxf(board, ALLY, "+R=4"), front)
+        self.assertEqual(to_iccs(front), "a4f4")
+        self.assertEqual(to_wxf(board, parse_iccs(board, ALLY, "a2a3")),
+                         "R-+1")
+
+        # Soldiers paired on two files
+        board[3, 2], board[4, 2], board[3, 6], board[4, 6] = 12, 13, 14, 15
+        front = parse_wxf(board, ALLY, "+7+1")
+        self.assertEqual(to_iccs(front), "c6c7")
+        self.assertEqual(to_wxf(board, front), "+7+1")
+        with self.assertRaises(NotationError):
+            parse_wxf(board, ALLY, "P++1")
+
+    def test_advisors_and_elephants_on_a_file(self):
+        board = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+        board[9, 4] = 1
+        board[0, 3] = -1
+        board[9, 3], board[7, 3] = 2, 3         # advisors on file 6
+        board[9, 6], board[5, 6] = 4, 5         # elephants on file 3
+        moves = {"A6+5": "d0e1", "A6-5": "d2e1", "E3+5": "g0e2",
+                 "E3+1": "g0i2", "E3-5": "g4e2", "E3-1": "g4i2"}
+        for wxf, iccs in moves.items():
+            action = parse_wxf(board, ALLY, wxf)
+            self.assertEqual(to_iccs(action), iccs)
+            self.assertEqual(to_wxf(board, action), wxf)
+        for wxf in ("A-+5", "E-+5"):
+            with self.assertRaises(NotationError):
+                parse_wxf(board, ALLY, wxf)
+
+    def test_three_soldiers_on_a_file(self):
+        board = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+        board[9, 4] = 1
+        board[0, 3] = -1
+        board[2, 0], board[3, 0], board[4, 0] = 12, 13, 14     # file 9
+        moves = {"P++1": "a7a8", "P+=8": "a7b7", "P=.8": "a6b6",
+                 "P-=8": "a5b5"}
+        for wxf, iccs in moves.items():
+            action = parse_wxf(board, ALLY, wxf)
+            self.assertEqual(to_iccs(action), iccs)
+            self.assertEqual(to_wxf(board, action), wxf.replace(".", "="))
+        self.assertEqual(parse_wxf(board, ALLY, "=P=8"),
+                         parse_wxf(board, ALLY, "P=.8"))
+        with self.assertRaises(NotationError):
+            parse_wxf(board, ALLY, "P9+1")
+
+        # Four soldiers: a to d from front to rear
+        board[1, 0] = 15
+        self.assertEqual(to_iccs(parse_wxf(board, ALLY, "Pc=8")), "a6b6")
+        self.assertEqual(to_wxf(board, parse_iccs(board, ALLY, "a5b5")),
+                         "Pd=8")
+        self.assertEqual(to_wxf(board, parse_iccs(board, ALLY, "a8a9")),
+                         "Pa+1")
+
+    def test_round_trip(self):
+        for seed in range(3):
+            cells = to_cells(INITIAL_BOARD)
+            side = ALLY
+            for action in _random_game(seed, 100):
+                for other in generate_actions(cells, side):
+                    self.assertEqual(
+                        parse_wxf(cells, side, to_wxf(cells, other)), other)
+                    self.assertEqual(
+                        parse_iccs(cells, side, to_iccs(other)), other)
+                make_move(cells, action)
+                side = -side
+
+    def test_read_games(self):
+        errors = []
+        games = list(read_games(io.StringIO(DATABASE),
+                                lambda *error: errors.append(error)))
+        self.assertEqual([game["index"] for game in games], [0, 2, 3])
+        self.assertEqual([game["line"] for game in games], [1, 10, 16])
+        self.assertEqual([game["result"] for game in games], [ALLY, 0, ENEMY])
+        self.assertEqual(len(games[0]["actions"]), 6)
+        self.assertEqual(games[0]["tags"]["Event"], "Central cannon")
+        self.assertEqual(games[1]["actions"], games[0]["actions"][:5])
+
+        self.assertEqual(len(errors), 1)
+        index, line, message = errors[0]
+        self.assertEqual((index, line), (1, 6))
+        self.assertIn("move 2", message)
+
+        positions = list(read_positions(io.StringIO(DATABASE)))
+        self.assertEqual(len(positions), 6 + 5 + 2)
+        game, board, side, action = positions[1]
+        self.assertEqual((game, side), (0, ENEMY))
+        np.testing.assert_array_equal(
+            board, apply(INITIAL_BOARD, games[0]["actions"][0]))
+
+    def test_write_game(self):
+        games = [_random_game(seed, 100) for seed in (0, 123, 230, 239)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.pgn")
+            with open(path, "w") as f:
+                for i, actions in enumerate(games):
+                    write_game(f, actions, ("iccs", "wxf")[i % 2],
+                               {"Round": i}, (ALLY, ENEMY, 0, None)[i])
+
+            parsed = list(read_games(path))
+            self.assertEqual([game["actions"] for game in parsed], games)
+            self.assertEqual([game["result"] for game in parsed],
+                             [ALLY, ENEMY, 0, None])
+            self.assertEqual(parsed[1]["tags"]["Format"], "WXF")
+
+            parallel = list(read_games_parallel(path, workers=2,
+                                                chunk_size=1))
+            self.assertEqual([game["actions"] for game in parallel], games)
+
+    def test_read_games_parallel_errors(self):
+        errors = []
+        games = list(read_games_parallel(io.StringIO(DATABASE), workers=2,
+                                         chunk_size=2,
+                                         on_error=lambda *e: errors.append(e)))
+        self.assertEqual([game["index"] for game in games], [0, 2, 3])
+        self.assertEqual([error[:2] for error in errors], [(1, 6)])
+
+
+if __name__ == '__main__':
+    unittest.main()
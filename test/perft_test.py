@@ -0,0 +1,43 @@
+import unittest
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.perft import (
+    REFERENCE_POSITIONS, reference_position, perft, divide, main,
+)
+
+# Deeper counts are checked by the benchmark: python -m gym_xiangqi.perft
+MAX_TEST_DEPTH = 3
+
+
+class TestPerft(unittest.TestCase):
+
+    def test_reference_positions(self):
+        for name, reference in REFERENCE_POSITIONS.items():
+            board, side = reference_position(name)
+            for rules in ("strict", "default"):
+                strict = rules == "strict"
+                for depth in range(1, MAX_TEST_DEPTH + 1):
+                    with self.subTest(name=name, rules=rules, depth=depth):
+                        self.assertEqual(
+                            perft(board, side, depth, strict),
+                            reference[rules][depth - 1])
+
+    def test_divide(self):
+        board, side = reference_position("cannon-check")
+        counts = divide(board, side, 2)
+        self.assertEqual(len(counts), perft(board, side, 1))
+        self.assertEqual(sum(counts.values()), perft(board, side, 2))
+
+    def test_env_position(self):
+        env = XiangQiEnv()
+        self.assertEqual(perft(env.state, env.turn, 0), 1)
+        self.assertEqual(perft(env.state, env.turn, 1, strict=False),
+                         env.ally_actions.sum())
+
+    def test_main(self):
+        self.assertEqual(main(["--position", "chariot-check",
+                               "--depth", "2"]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import random
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.playout import playout, playout_many, rollout_evaluator
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, BOARD_ROWS, BOARD_COLS, ALLY, ENEMY,
+)
+
+
+def _checkmated_board():
+    """
+    Red general on its last row, held by black chariots on rows 8 and 9.
+    """
+    board = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+    board[9, 4] = 1
+    board[0, 3] = -1
+    board[9, 0] = -8
+    board[8, 8] = -9
+    return board
+
+
+class TestPlayout(unittest.TestCase):
+
+    def test_deterministic(self):
+        board = np.array(INITIAL_BOARD)
+        results = [playout(board, ALLY, seed) for seed in (1, 1, 2)]
+        self.assertEqual(results[0], results[1])
+        self.assertIn(results[0][0], (ALLY, ENEMY, 0))
+        self.assertGreater(results[0][1], 0)
+        np.testing.assert_array_equal(board, INITIAL_BOARD)
+
+    def test_game_end(self):
+        board = _checkmated_board()
+        self.assertEqual(playout(board, ALLY), (ENEMY, 0))
+        self.assertEqual(playout(board, ALLY, strict=True), (ENEMY, 0))
+        # The same position with colors swapped
+        self.assertEqual(playout(-board[::-1], ENEMY), (ALLY, 0))
+        self.assertEqual(playout(INITIAL_BOARD, ALLY, max_plies=1), (0, 1))
+
+    def test_playout_many(self):
+        boards = np.array([INITIAL_BOARD] * 3)
+        sides = np.array([ALLY, ENEMY, ALLY])
+        winners, plies = playout_many(boards, sides, 7)
+        rng = random.Random(7)
+        for i in range(len(boards)):
+            self.assertEqual((winners[i], plies[i]),
+                             playout(boards[i], sides[i], rng))
+
+    def test_rollout_evaluator(self):
+        evaluator = rollout_evaluator(rollouts=4, seed=3)
+        boards = np.array([_checkmated_board(), INITIAL_BOARD])
+        values, priors = evaluator(boards, np.array([ALLY, ENEMY]), None)
+        self.assertIsNone(priors)
+        self.assertEqual(values.shape, (2, ))
+        self.assertEqual(values[0], -1)
+        self.assertTrue(-1 <= values[1] <= 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.records import (
+    GameRecordWriter, GameRecordReader, compact_move, expand_move,
+)
+from gym_xiangqi.rules import generate_actions, apply, to_cells
+from gym_xiangqi.perft import reference_position
+from gym_xiangqi.constants import INITIAL_BOARD, ALLY, ENEMY, GENERAL
+
+
+def _random_game(board, side, plies, seed):
+    rng = random.Random(seed)
+    boards, actions = [], []
+    for _ in range(plies):
+        moves = generate_actions(to_cells(board), side)
+        if not moves:
+            break
+        action = rng.choice(moves)
+        boards.append(board)
+        actions.append(action)
+        board = apply(board, action)
+        if GENERAL not in np.abs(board):
+            break
+        side = -side
+    return boards, actions
+
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "games.xqr")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compact_move(self):
+        cells = to_cells(INITIAL_BOARD)
+        for action in generate_actions(cells, ALLY):
+            self.assertLess(compact_move(action), 1 << 16)
+            self.assertEqual(expand_move(cells, compact_move(action)),
+                             action)
+        with self.assertRaises(ValueError):
+            expand_move(cells, 45 * 90 + 36)
+
+    def test_round_trip(self):
+        check_board, check_side = reference_position("cannon-check")
+        starts = [(np.array(INITIAL_BOARD), ALLY),
+                  (check_board, check_side),
+                  (-np.array(INITIAL_BOARD)[::-1], ENEMY)]
+        games = []
+        with GameRecordWriter(self.path) as writer:
+            for i in range(6):
+                board, side = starts[i % len(starts)]
+                boards, actions = _random_game(board, side, 100, i)
+                outcome = (ALLY, ENEMY, 0)[i % 3]
+                writer.write(actions, outcome, board, side)
+                games.append((board, side, boards, actions, outcome))
+            writer.write([])
+
+        # A 100 ply game takes about 200 bytes
+        self.assertLess(os.path.getsize(self.path),
+                        sum(10 + 8 + 2 * len(game[3]) for game in games)
+                        + 3 * 99 + 100)
+
+        with GameRecordReader(self.path) as reader:
+            self.assertEqual(len(reader), 7)
+            self.assertEqual(len(reader.moves(6)), 0)
+            for i, (board, side, boards, actions, outcome) in enumerate(
+                    games):
+                self.assertEqual(reader.outcome(i), outcome)
+                start_board, start_side = reader.start(i)
+                np.testing.assert_array_equal(start_board, board)
+                self.assertEqual(start_side, side)
+                self.assertEqual(reader.actions(i), actions)
+
+                for ply, (ply_board, ply_side, action) in enumerate(
+                        reader.positions(i)):
+                    np.testing.assert_array_equal(ply_board, boards[ply])
+                    self.assertEqual(ply_side, side if ply % 2 == 0
+                                     else -side)
+                    self.assertEqual(action, actions[ply])
+
+                ply = len(actions) // 2
+                ply_board, ply_side = reader.position(i, ply)
+                np.testing.assert_array_equal(ply_board, boards[ply])
+
+            self.assertEqual(sum(1 for _ in reader),
+                             sum(len(game[3]) for game in games))
+            self.assertEqual(reader.actions(-2), games[-1][3])
+            with self.assertRaises(IndexError):
+                reader.moves(7)
+            with self.assertRaises(IndexError):
+                reader.position(0, len(games[0][3]) + 1)
+
+    def test_not_a_record_file(self):
+        with open(self.path, "wb") as f:
+            f.write(bytes(64))
+        with self.assertRaises(ValueError):
+            GameRecordReader(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
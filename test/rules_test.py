@@ -0,0 +1,246 @@
+import random
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.rules import (
+    legal_actions, capture_actions, evasion_actions, see,
+    apply, to_cells, attackers, in_check,
+    position_key, update_key, make_move,
+)
+from gym_xiangqi.utils import move_to_action_space
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, ALLY, ENEMY, EMPTY,
+    GENERAL, ADVISOR_1, HORSE_1, CHARIOT_1, CANNON_1, SOLDIER_1,
+)
+
+MAX_ROUNDS = 200
+
+
+class TestRules(unittest.TestCase):
+
+    def assertMatchesEnv(self, env):
+        mask = env.ally_actions if env.turn == ALLY else env.enemy_actions
+        expected = np.where(mask == 1)[0]
+        result = legal_actions(env.state, env.turn)
+        self.assertTrue(np.array_equal(result, expected))
+
+    def test_initial_legal_actions(self):
+        board = np.array(INITIAL_BOARD)
+        self.assertEqual(len(legal_actions(board, ALLY)), 44)
+        self.assertEqual(len(legal_actions(board, ENEMY)), 44)
+
+    def test_flying_general_is_illegal(self):
+        """
+        Replay the moves from the env's flying general test. After the last
+        move, only the black cannon stands between the two generals.
+        """
+        env = XiangQiEnv()
+        for action in [78727, 75172, 78961, 74938, 75720]:
+            env.step(action)
+            self.assertMatchesEnv(env)
+
+        # The black cannon on (6, 4) may not leave the column
+        legal = legal_actions(env.state, ENEMY)
+        self.assertNotIn(move_to_action_space(CANNON_1, (6, 4), (6, 3)),
+                         legal)
+        self.assertIn(move_to_action_space(CANNON_1, (6, 4), (5, 4)), legal)
+
+    def test_apply(self):
+        board = np.array(INITIAL_BOARD)
+        action = move_to_action_space(HORSE_1, (9, 1), (7, 2))
+        new_board = apply(board, action)
+
+        self.assertEqual(new_board[9][1], EMPTY)
+        self.assertEqual(new_board[7][2], HORSE_1)
+        self.assertTrue(np.array_equal(board, np.array(INITIAL_BOARD)))
+
+        with self.assertRaises(ValueError):
+            apply(board, move_to_action_space(HORSE_1, (8, 1), (7, 3)))
+
+    def test_position_key_update(self):
+        cells = to_cells(INITIAL_BOARD)
+        key = position_key(cells, ALLY)
+        self.assertNotEqual(key, position_key(cells, ENEMY))
+
+        for action in [78727, 75172, 78961]:
+            piece_id = cells[action % 8100 // 90]
+            captured = make_move(cells, action)
+            key = update_key(key, action, piece_id, captured)
+            side = ENEMY if piece_id > 0 else ALLY
+            self.assertEqual(key, position_key(cells, side))
+
+    def test_attackers(self):
+        """
+        78727: Ally CANNON_1 (7, 1) -> (7, 4)
+        75172: Enemy CANNON_1 (2, 7) -> (2, 4)
+        78961: Ally CANNON_1 (7, 4) -> (3, 4) -- jiang
+        """
+        cells = to_cells(INITIAL_BOARD)
+        self.assertFalse(in_check(cells, ENEMY))
+
+        # Black horse on (0, 1) is guarded by the chariot and attacked by
+        # the red cannon over the black cannon
+        self.assertEqual(sorted(attackers(cells, 1, ENEMY)), [0])
+        self.assertEqual(sorted(attackers(cells, 1, ALLY)), [64])
+
+        for action in [78727, 75172, 78961]:
+            make_move(cells, action)
+        self.assertTrue(in_check(cells, ENEMY))
+        self.assertEqual(attackers(cells, 4, ALLY), [31])
+        self.assertFalse(in_check(cells, ALLY))
+
+    def test_random_games_match_env(self):
+        rng = random.Random(0)
+        env = XiangQiEnv()
+
+        for _ in range(3):
+            env.reset()
+            done = False
+            for _ in range(MAX_ROUNDS):
+                self.assertMatchesEnv(env)
+                action = int(rng.choice(legal_actions(env.state, env.turn)))
+                expected = apply(env.state, action)
+                _, _, done, _ = env.step(action)
+                if done:
+                    break
+                self.assertTrue(np.array_equal(env.state, expected))
+
+    def test_captures_and_evasions(self):
+        """
+        Compare the specialized generators with filtering all legal actions
+        over random games.
+        """
+        rng = random.Random(1)
+        checks = 0
+        for _ in range(20):
+            board = np.array(INITIAL_BOARD)
+            side = ALLY
+            for _ in range(MAX_ROUNDS):
+                actions = legal_actions(board, side)
+                if len(actions) == 0:
+                    break
+                captures = [action for action in actions
+                            if board.flat[action % 90] != EMPTY]
+                self.assertEqual(list(capture_actions(board, side)),
+                                 captures)
+
+                if in_check(to_cells(board), side):
+                    checks += 1
+                    evasions = [
+                        action for action in actions
+                        if abs(board.flat[action % 90]) == GENERAL
+                        or not in_check(to_cells(apply(board, action)), side)
+                    ]
+                    self.assertEqual(list(evasion_actions(board, side)),
+                                     evasions)
+                else:
+                    self.assertEqual(len(evasion_actions(board, side)), 0)
+
+                action = int(rng.choice(actions))
+                if abs(board.flat[action % 90]) == GENERAL:
+                    break
+                board = apply(board, action)
+                side = -side
+        self.assertGreater(checks, 0)
+
+    def test_strict_legal_actions(self):
+        """
+        Strict rules keep exactly the actions after which the general is
+        not attacked (or which capture the opponent's general).
+        """
+        rng = random.Random(2)
+        filtered = 0
+        for _ in range(20):
+            board = np.array(INITIAL_BOARD)
+            side = ALLY
+            for _ in range(MAX_ROUNDS):
+                actions = legal_actions(board, side)
+                if len(actions) == 0:
+                    break
+                expected = [
+                    action for action in actions
+                    if abs(board.flat[action % 90]) == GENERAL
+                    or not in_check(to_cells(apply(board, action)), side)
+                ]
+                strict = legal_actions(board, side, strict=True)
+                self.assertEqual(list(strict), expected)
+                filtered += len(actions) - len(strict)
+
+                action = int(rng.choice(strict if len(strict) else actions))
+                if abs(board.flat[action % 90]) == GENERAL:
+                    break
+                board = apply(board, action)
+                side = -side
+        self.assertGreater(filtered, 0)
+
+    def test_strict_pins(self):
+        """
+        Pinned pieces and horse leg blockers may not expose the general,
+        and no piece may become the screen of a cannon facing it.
+        Red general (9, 4), red horse (8, 4) pinned by the black chariot
+        (5, 4), red advisor (8, 3) blocking the leg of the black horse
+        (7, 3), and the black cannon (9, 0) facing the red general.
+        """
+        board = np.zeros((10, 9), dtype=int)
+        board[9][4] = GENERAL
+        board[8][4] = HORSE_1
+        board[5][4] = -CHARIOT_1
+        board[0][3] = -GENERAL
+        board[8][3] = ADVISOR_1
+        board[7][3] = -HORSE_1
+        board[9][0] = -CANNON_1
+        board[7][2] = CHARIOT_1
+
+        legacy = set(legal_actions(board, ALLY))
+        strict = set(legal_actions(board, ALLY, strict=True))
+        horse = move_to_action_space(HORSE_1, (8, 4), (6, 3))
+        advisor = move_to_action_space(ADVISOR_1, (8, 3), (7, 4))
+        # Red chariot entering (9, 1)-(9, 3) becomes the black cannon's screen
+        screen = move_to_action_space(CHARIOT_1, (7, 2), (9, 2))
+        for action in (horse, advisor, screen):
+            self.assertIn(action, legacy)
+            self.assertNotIn(action, strict)
+        self.assertIn(move_to_action_space(CHARIOT_1, (7, 2), (7, 1)), strict)
+
+    def test_static_exchange(self):
+        """
+        Red chariot (6, 4) takes the black cannon (3, 4) defended by the
+        black chariot (0, 4). The red cannon (7, 4) loses its screen when
+        the red chariot leaves, and the red horse (5, 3) can only recapture
+        while its leg (4, 3) is free.
+        """
+        board = np.zeros((10, 9), dtype=int)
+        board[9][5] = GENERAL
+        board[0][3] = -GENERAL
+        board[6][4] = CHARIOT_1
+        board[7][4] = CANNON_1
+        board[5][3] = HORSE_1
+        board[3][4] = -CANNON_1
+        board[0][4] = -CHARIOT_1
+        board[4][3] = -SOLDIER_1
+        capture = move_to_action_space(CHARIOT_1, (6, 4), (3, 4))
+        self.assertEqual(see(board, capture), 4.5 - 9)
+
+        board[4][3] = EMPTY
+        self.assertEqual(see(board, capture), 4.5)
+        # Moving the chariot elsewhere loses nothing
+        quiet = move_to_action_space(CHARIOT_1, (6, 4), (6, 0))
+        self.assertEqual(see(board, quiet), 0)
+
+    def test_static_exchange_in_env(self):
+        """
+        The red cannon takes the black horse and is recaptured by the black
+        chariot; the board is left unchanged.
+        """
+        env = XiangQiEnv()
+        capture = move_to_action_space(CANNON_1, (7, 1), (0, 1))
+        state = np.array(env.state)
+        self.assertEqual(env.see(capture), 4 - 4.5)
+        self.assertEqual(see(env.state, capture), env.see(capture))
+        self.assertTrue(np.array_equal(env.state, state))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.selfplay import (
+    DEFAULT_ALPHABETA_DEPTH, parse_agent, play_game, selfplay, load_shard,
+    main, _make_agent,
+)
+from gym_xiangqi.agents import RandomAgent
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.rules import apply
+from gym_xiangqi.constants import INITIAL_BOARD, ALLY, ENEMY
+
+
+class TestSelfPlay(unittest.TestCase):
+
+    def test_parse_agent(self):
+        self.assertEqual(parse_agent("random"), ("random", {}))
+        self.assertEqual(
+            parse_agent("mcts:num_simulations=20,temperature=1.0"),
+            ("mcts", {"num_simulations": 20, "temperature": 1.0}))
+        with self.assertRaises(ValueError):
+            parse_agent("minimax")
+        with self.assertRaises(ValueError):
+            parse_agent("alphabeta:max_depth")
+
+    def test_alphabeta_fixed_depth(self):
+        # A time budget would make games depend on the machine's speed
+        agent = _make_agent("alphabeta", 0)
+        self.assertIsNone(agent.time_limit_ms)
+        self.assertEqual(agent.max_depth, DEFAULT_ALPHABETA_DEPTH)
+        agent = _make_agent("alphabeta:time_limit_ms=100", 0)
+        self.assertEqual(agent.time_limit_ms, 100)
+
+    def test_illegal_move(self):
+        class Illegal:
+            def move(self, env):
+                return 0
+
+        with self.assertRaises(ValueError):
+            play_game(XiangQiEnv(), {ALLY: RandomAgent(), ENEMY: Illegal()})
+
+    def test_selfplay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stats = selfplay(5, tmp, enemy="alphabeta:max_depth=1",
+                             workers=2, shard_size=2, max_plies=30)
+            self.assertEqual(stats["games"], 5)
+            self.assertEqual(stats["shards"], 3)
+            self.assertGreater(stats["games_per_sec"], 0)
+
+            paths = sorted(glob.glob(os.path.join(tmp, "shard-*.npz")))
+            self.assertEqual(len(paths), 3)
+            shards = [load_shard(path) for path in paths]
+            self.assertEqual(sum(len(shard["outcomes"]) for shard in shards),
+                             5)
+            self.assertEqual(sum(len(shard["actions"]) for shard in shards),
+                             stats["plies"])
+
+            for shard in shards:
+                offsets = shard["offsets"]
+                self.assertEqual(offsets[-1], len(shard["boards"]))
+                for i, outcome in enumerate(shard["outcomes"]):
+                    self.assertIn(outcome, (ALLY, ENEMY, 0))
+                    first, last = offsets[i], offsets[i + 1]
+                    np.testing.assert_array_equal(shard["boards"][first],
+                                                  INITIAL_BOARD)
+                    self.assertEqual(shard["legal_counts"][first], 44)
+                    # Every board follows from the previous action
+                    for ply in range(first + 1, last):
+                        np.testing.assert_array_equal(
+                            shard["boards"][ply],
+                            apply(shard["boards"][ply - 1],
+                                  shard["actions"][ply - 1]))
+                        self.assertEqual(shard["sides"][ply],
+                                         -shard["sides"][ply - 1])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(main(["--games", "2", "--output", tmp,
+                                   "--workers", "1", "--max-plies", "10"]),
+                             0)
+            shard = load_shard(os.path.join(tmp, "shard-00000.npz"))
+            self.assertEqual(len(shard["outcomes"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
+from gym_xiangqi.symmetry import (
+    SYMMETRIES, IDENTITY, MIRROR, ROTATE, ROTATE_MIRROR,
+    ACTION_TABLES,
+    transform_board, transform_actions, transform_action_mask, augment,
+)
+from gym_xiangqi.utils import move_to_action_space
+from gym_xiangqi.constants import (
+    INITIAL_BOARD, BLACK,
+    CHARIOT_1, CHARIOT_2, SOLDIER_1, SOLDIER_5, CANNON_2,
+)
+
+
+class TestSymmetry(unittest.TestCase):
+
+    def test_action_tables_are_involutions(self):
+        n = ACTION_TABLES.shape[1]
+        for sym in SYMMETRIES:
+            table = ACTION_TABLES[sym]
+            self.assertTrue(np.array_equal(np.sort(table), np.arange(n)))
+            self.assertTrue(np.array_equal(table[table], np.arange(n)))
+
+    def test_initial_board_is_symmetric(self):
+        board = np.array(INITIAL_BOARD)
+        self.assertTrue(np.array_equal(transform_board(board, MIRROR), board))
+        self.assertTrue(np.array_equal(transform_board(board, ROTATE), board))
+
+    def test_transform_actions(self):
+        # CHARIOT_1 (9, 0) -> (8, 0) mirrors to CHARIOT_2 (9, 8) -> (8, 8)
+        action = move_to_action_space(CHARIOT_1, (9, 0), (8, 0))
+        self.assertEqual(transform_actions(action, MIRROR),
+                         move_to_action_space(CHARIOT_2, (9, 8), (8, 8)))
+
+        # SOLDIER_1 (6, 0) -> (5, 0) rotates to the enemy's SOLDIER_1 move
+        action = move_to_action_space(SOLDIER_1, (6, 0), (5, 0))
+        self.assertEqual(transform_actions(action, ROTATE),
+                         move_to_action_space(SOLDIER_1, (3, 8), (4, 8)))
+        self.assertEqual(transform_actions(action, ROTATE_MIRROR),
+                         move_to_action_space(SOLDIER_5, (3, 0), (4, 0)))
+        self.assertEqual(transform_actions(action, IDENTITY), action)
+
+    def test_transform_action_mask(self):
+        ally_actions = XiangQiEnv().ally_actions
+        enemy_actions = XiangQiEnv(ally_color=BLACK).enemy_actions
+
+        self.assertTrue(np.array_equal(
+            transform_action_mask(ally_actions, MIRROR), ally_actions))
+        self.assertTrue(np.array_equal(
+            transform_action_mask(ally_actions, ROTATE), enemy_actions))
+
+    def test_augment_batch(self):
+        env = XiangQiEnv()
+        action = move_to_action_space(CANNON_2, (7, 7), (7, 4))
+        env.step(action)
+
+        boards = np.stack([np.array(INITIAL_BOARD), env.state])
+        masks = np.stack([env.ally_actions, env.enemy_actions])
+        actions = np.array([action, action])
+
+        aug_boards, aug_actions, aug_masks = augment(boards, actions, masks)
+        self.assertEqual(aug_boards.shape, (8, 10, 9))
+        self.assertEqual(aug_actions.shape, (8, ))
+        self.assertEqual(aug_masks.shape, (8, masks.shape[1]))
+
+        for sym in SYMMETRIES:
+            for i in range(2):
+                self.assertTrue(np.array_equal(
+                    aug_boards[sym * 2 + i], transform_board(boards[i], sym)))
+                self.assertEqual(aug_actions[sym * 2 + i],
+                                 transform_actions(actions[i], sym))
+                self.assertTrue(np.array_equal(
+                    aug_masks[sym * 2 + i],
+                    transform_action_mask(masks[i], sym)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,9 +7,9 @@ from gym_xiangqi.envs.xiangqi_env import XiangQiEnv
 from gym_xiangqi.xiangqi_game import XiangQiGame
 from gym_xiangqi.constants import (
     BOARD_ROWS, BOARD_COLS,
-    RED, BLACK, DEAD,
-    ILLEGAL_MOVE, PIECE_POINTS, LOSE,
-    EMPTY, GENERAL, CANNON_1, HORSE_2, SOLDIER_1, SOLDIER_5,
+    RED, BLACK, ALIVE, DEAD,
+    ILLEGAL_MOVE, PIECE_POINTS, WIN, LOSE, DRAW,
+    EMPTY, GENERAL, ELEPHANT_1, CANNON_1, HORSE_2, SOLDIER_1, SOLDIER_5,
     ALLY, ENEMY,
     INITIAL_BOARD,
 )
@@ -155,6 +155,34 @@ class TestXiangQiEnv(unittest.TestCase):
         self.assertEqual(reward, PIECE_POINTS[GENERAL])
         self.assertEqual(self.env.enemy_piece[GENERAL].state, DEAD)
 
+    def test_checkmate(self):
+        """
+        verify that the episode ends as soon as black has no legal move
+        94005: Ally SOLDIER_1 (6, 0) -> (5, 0)
+        8563: Enemy ADVISOR_1 (0, 5) -> (1, 4)
+        78723: Ally CANNON_1 (7, 1) -> (7, 0)
+        92294: Enemy SOLDIER_1 (3, 8) -> (4, 8)
+        93186: Ally SOLDIER_1 (5, 0) -> (4, 0)
+        123966: Enemy SOLDIER_5 (3, 0) -> (4, 0)
+        78570: Ally CANNON_1 (7, 0) -> (0, 0)
+        75171: Enemy CANNON_1 (2, 7) -> (2, 3)
+        72902: Ally CANNON_1 (0, 0) -> (0, 2) -- checkmate
+        """
+        actions = [94005, 8563, 78723, 92294, 93186, 123966, 78570, 75171]
+        for strict in (False, True):
+            env = XiangQiEnv(strict_rules=strict)
+            for action in actions:
+                _, _, done, _ = env.step(action)
+                self.assertFalse(done)
+                self.assertTrue(env.has_legal_move(env.turn))
+
+            _, reward, done, _ = env.step(72902)
+            self.assertTrue(done)
+            self.assertEqual(reward, PIECE_POINTS[ELEPHANT_1] + WIN)
+            self.assertFalse(env.has_legal_move(ENEMY))
+            self.assertEqual(env.enemy_piece[GENERAL].state, ALIVE)
+            env.close()
+
     def test_env_reset(self):
         """
         verify environment properly resets after an episode has terminated
@@ -175,10 +203,20 @@ class TestXiangQiEnv(unittest.TestCase):
         self.assertEqual(reward, PIECE_POINTS[GENERAL])
         self.assertEqual(self.env.enemy_piece[GENERAL].state, DEAD)
 
+        state = self.env.state
+        ally_piece = self.env.ally_piece[CANNON_1]
         obs = self.env.reset()
         self.assertFalse(self.env._done)
         self.assertStateEqual(INITIAL_BOARD, obs)
 
+        # The board and pieces are restored in place from the template
+        self.assertIs(self.env.state, state)
+        self.assertIs(self.env.ally_piece[CANNON_1], ally_piece)
+        self.assertEqual((ally_piece.row, ally_piece.col), (7, 1))
+        self.assertEqual(self.env.enemy_piece[GENERAL].state, ALIVE)
+        self.assertEqual(self.env.ally_actions.tolist(),
+                         XiangQiEnv().ally_actions.tolist())
+
     def test_perpetual_check(self):
         """
         simulate a perpetual checking situation
@@ -204,6 +242,113 @@ class TestXiangQiEnv(unittest.TestCase):
         self.assertEqual(reward, LOSE)
         self.assertTrue(done)
 
+    def test_strict_rules(self):
+        """
+        With strict rules a player in check may only get out of check
+        78727: Ally CANNON_1 (7, 1) -> (7, 4)
+        75172: Enemy CANNON_1 (2, 7) -> (2, 4)
+        78961: Ally CANNON_1 (7, 4) -> (3, 4) -- jiang over black cannon
+        123966: Enemy SOLDIER_5 (3, 0) -> (4, 0) -- ignores the jiang
+        """
+        strict_env = XiangQiEnv(strict_rules=True)
+        self.assertTrue(strict_env.strict_rules)
+        self.assertEqual(strict_env.ally_actions.sum(),
+                         self.env.ally_actions.sum())
+
+        for action in [78727, 75172, 78961]:
+            self.env.step(action)
+            strict_env.step(action)
+        self.assertLess(strict_env.enemy_actions.sum(),
+                        self.env.enemy_actions.sum())
+
+        _, reward, _, _ = strict_env.step(123966)
+        self.assertEqual(reward, ILLEGAL_MOVE)
+        _, reward, _, _ = self.env.step(123966)
+        self.assertEqual(reward, 0)
+
+        # Moving the black cannon away from the column is not allowed either
+        self.assertEqual(strict_env.enemy_actions[75173], 0)
+        strict_env.close()
+
+    def test_repetition_draw(self):
+        """
+        verify that the third occurrence of a position ends in a draw
+        47945: Ally HORSE_1 (9, 1) -> (7, 2)
+        41154: Enemy HORSE_1 (0, 7) -> (2, 6)
+        46432: Ally HORSE_1 (7, 2) -> (9, 1)
+        42667: Enemy HORSE_1 (2, 6) -> (0, 7)
+        """
+        env = XiangQiEnv(repetition_limit=3)
+        actions = [47945, 41154, 46432, 42667] * 2
+        for action in actions[:-1]:
+            _, _, done, _ = env.step(action)
+            self.assertFalse(done)
+        _, reward, done, _ = env.step(actions[-1])
+        self.assertTrue(done)
+        self.assertEqual(reward, DRAW)
+
+        # The count starts over after reset
+        env.reset()
+        _, _, done, _ = env.step(actions[0])
+        self.assertFalse(done)
+        env.close()
+
+    def test_repetition_perpetual_check(self):
+        """
+        verify that the repeating player who checks on every move loses
+        (same moves as test_perpetual_check)
+        """
+        env = XiangQiEnv(repetition_limit=3)
+        for action in [64062, 57437, 63255, 373, 63462]:
+            env.step(action)
+        cycles = [1192, 57801, 1993, 58602] * 2
+        for action in cycles[:-1]:
+            _, _, done, _ = env.step(action)
+            self.assertFalse(done)
+        _, reward, done, _ = env.step(cycles[-1])
+        self.assertTrue(done)
+        self.assertEqual(reward, LOSE)
+        env.close()
+
+    def test_no_capture_limit(self):
+        env = XiangQiEnv(no_capture_limit=10)
+        actions = [47945, 41154, 46432, 42667] * 3
+        for action in actions[:9]:
+            _, _, done, _ = env.step(action)
+            self.assertFalse(done)
+        _, reward, done, _ = env.step(actions[9])
+        self.assertTrue(done)
+        self.assertEqual(reward, DRAW)
+        env.close()
+
+    def test_canonical_observation(self):
+        """
+        verify that the canonical view always shows the current player at
+        the bottom and that canonical actions map back to env actions
+        78727: Ally CANNON_1 (7, 1) -> (7, 4)
+        """
+        state, actions = self.env.get_canonical()
+        self.assertIs(state, self.env.state)
+        self.assertIs(actions, self.env.ally_actions)
+
+        self.env.step(78727)
+        state, actions = self.env.get_canonical()
+        self.assertIs(state, self.env.canonical_state)
+
+        # Enemy pieces appear as positive IDs at the bottom of the board
+        self.assertEqual(state[7][1], CANNON_1)
+        self.assertEqual(state[2][4], -CANNON_1)
+        self.assertEqual(actions.sum(), self.env.enemy_actions.sum())
+
+        # Enemy CANNON_1 (2, 7) -> (2, 4) is seen as (7, 1) -> (7, 4)
+        action = self.env.canonical_to_action(78727)
+        self.assertEqual(action, 75172)
+        self.assertEqual(self.env.enemy_actions[action], 1)
+        self.assertEqual(actions[78727], 1)
+
+        self.env.step(action)
+        self.assertIs(self.env.canonical_state, self.env.state)
+
     def test_env_close(self):
         self.env.render()
         self.env.close()
@@ -234,6 +379,32 @@ class TestXiangQiEnv(unittest.TestCase):
         self.assertEqual(reward, PIECE_POINTS[HORSE_2])
         self.assertFalse(done)
 
+    def test_profiling(self):
+        self.assertEqual(self.env.stats(), {})
+        self.env.enable_profiling()
+        # Two quiet moves: red CANNON_1 (7, 1) -> (7, 0), then black
+        # SOLDIER_5 (3, 0) -> (4, 0)
+        for action in (78723, 123966):
+            self.env.step(action)
+
+        stats = self.env.stats(clear=True)
+        self.assertEqual(stats["step"]["count"], 2)
+        self.assertEqual(stats["check_jiang"]["count"], 4)
+        self.assertEqual(stats["move"]["count"], 2)
+        for phase in stats.values():
+            self.assertLessEqual(phase["min_ns"], phase["mean_ns"])
+            self.assertLessEqual(phase["mean_ns"], phase["max_ns"])
+            self.assertEqual(sum(phase["histogram"].values()),
+                             phase["count"])
+        self.assertGreaterEqual(stats["step"]["total_ns"],
+                                stats["move"]["total_ns"])
+        self.assertEqual(self.env.stats(), {})
+
+        self.env.enable_profiling(False)
+        self.env.step(int(self.env.ally_actions.argmax()))
+        self.assertEqual(self.env.stats(), {})
+        self.assertNotIn("step", vars(self.env))
+
 
 if __name__ == "__main__":
     unittest.main()